@@ -6,7 +6,7 @@ from collections import OrderedDict
 import json
 
 from aserializer.fields import *
-from aserializer.utils import registry, options
+from aserializer.utils import registry, options, encoders, tracking
 
 
 logger = logging.getLogger(__name__)
@@ -112,6 +112,16 @@ class Serializer(py2to3.with_metaclass(SerializerBase)):
                                    u'{}.{}'.format(map_field_name, nested_map_field_name)))
         return OrderedDict(result)
 
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, exclude=None, extra_fields=None):
+        """
+        Returns the django queryset with the select_related and prefetch_related lookups for the relations,
+        which are serialized with the fields/exclude projection. With a projection only the read columns
+        and the extra fields are fetched.
+        """
+        from aserializer.django.optimization import optimize_queryset
+        return optimize_queryset(cls, queryset, fields=fields, exclude=exclude, extra_fields=extra_fields)
+
     @property
     def obj(self):
         return self.parser.obj
@@ -131,18 +141,18 @@ class Serializer(py2to3.with_metaclass(SerializerBase)):
         if self.parser.obj is None:
             return
         source_attr = self.parser.attributes_for_serializer
+        path = tracking.get_path_stack()
         for field_name, field in self.fields.items():
-            if field_name in source_attr:
-                _name = field_name
-            elif field.map_field and field.map_field in source_attr:
-                _name = field.map_field
-            else:
+            _name = field.get_source_name(field_name, source_attr)
+            if _name is None:
                 continue
             if isinstance(field, SerializerObjectField):
                 only_fields, exclude =  self.get_fields_and_exclude_for_nested(field_name)
                 field.pre_value(fields=only_fields,
                                 exclude=exclude,
                                 unknown_error=self._handle_unknown_error, **self._extras)
+            if path is not None:
+                path.append(field_name)
             try:
                 value = self.parser.get_value(_name)
                 field.set_value(self.clean_field_value(field_name, value))
@@ -150,6 +160,9 @@ class Serializer(py2to3.with_metaclass(SerializerBase)):
                 field.ignore = True
             else:
                 field.ignore = False
+            finally:
+                if path is not None:
+                    path.pop()
 
     def get_fields_and_exclude_for_nested(self, field_name):
         field_prefix = '{}.'.format(field_name)
@@ -225,6 +238,13 @@ class Serializer(py2to3.with_metaclass(SerializerBase)):
             if attr not in self.get_fieldnames():
                 self._errors[attr] = self.error_messages['unknown']
 
+    def collect_batch_values(self, batch):
+        """
+        Adds the values of the fields with batch validators to the validation batch.
+        """
+        for field in self.fields.values():
+            field.collect_batch_values(batch)
+
     def _custom_field_validation(self, field):
         for name in field.names:
             method_name = '{}_validate'.format(name)
@@ -320,7 +340,7 @@ class Serializer(py2to3.with_metaclass(SerializerBase)):
 
     def to_json(self, indent=None):
         dump = self.dump()
-        return json.dumps(dump, indent=indent)
+        return encoders.dumps(dump, indent=indent)
 
     def _field_to_python(self, field_name, field):
         """
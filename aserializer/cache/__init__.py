@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+from .base import FragmentCache
+from .backends import (
+    BaseCacheBackend,
+    LocMemCacheBackend,
+    SQLiteCacheBackend,
+    MemcachedCacheBackend,
+)
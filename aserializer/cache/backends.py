@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+
+from aserializer.utils import py2to3
+
+
+class BaseCacheBackend(object):
+    """
+    A cache backend stores already json encoded fragments as text by a string key.
+    """
+
+    def get(self, key):
+        raise NotImplementedError()
+
+    def set(self, key, value, timeout=None):
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+    @staticmethod
+    def get_expire_time(timeout):
+        if timeout is None:
+            return None
+        return time.time() + timeout
+
+
+class LocMemCacheBackend(BaseCacheBackend):
+    """
+    In-process cache backend. The entries are only shared by the threads of one process.
+    """
+
+    def __init__(self, max_entries=None):
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def get(self, key):
+        entry = self._cache.get(key, None)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires is not None and expires <= time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            if self.max_entries and key not in self._cache and len(self._cache) >= self.max_entries:
+                self._cache.clear()
+            self._cache[key] = (self.get_expire_time(timeout), value)
+
+    def delete(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+class SQLiteCacheBackend(BaseCacheBackend):
+    """
+    File based cache backend which can be shared by several worker processes on one host.
+    Every process (and thread) opens its own connection to the database file.
+    """
+
+    def __init__(self, path, table='aserializer_cache', timeout=5.0):
+        if not re.match(r'^\w+$', table):
+            raise ValueError('Invalid table name {}.'.format(table))
+        self.path = path
+        self.table = table
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('CREATE TABLE IF NOT EXISTS {} '
+                               '(key TEXT PRIMARY KEY, value TEXT, expires REAL)'.format(self.table))
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        row = self.get_connection().execute(
+            'SELECT value, expires FROM {} WHERE key = ?'.format(self.table), (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        if expires is not None and expires <= time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.get_connection().execute(
+            'INSERT OR REPLACE INTO {} (key, value, expires) VALUES (?, ?, ?)'.format(self.table),
+            (key, value, self.get_expire_time(timeout)))
+
+    def delete(self, key):
+        self.get_connection().execute('DELETE FROM {} WHERE key = ?'.format(self.table), (key,))
+
+    def clear(self):
+        self.get_connection().execute('DELETE FROM {}'.format(self.table))
+
+
+class MemcachedCacheBackend(BaseCacheBackend):
+    """
+    Cache backend for a memcached compatible client object (i.e. python-memcached or pymemcache).
+    The client needs the methods get(key), set(key, value, expire), delete(key) and flush_all().
+    """
+    MAX_KEY_LENGTH = 250
+    RE_INVALID_KEY = re.compile(r'[\s\x00-\x1f\x7f]')
+
+    def __init__(self, client):
+        self.client = client
+
+    def make_key(self, key):
+        if len(key) > self.MAX_KEY_LENGTH or self.RE_INVALID_KEY.search(key):
+            return hashlib.md5(key.encode('utf-8')).hexdigest()
+        return key
+
+    def get(self, key):
+        value = self.client.get(self.make_key(key))
+        if isinstance(value, py2to3.binary) and not isinstance(value, py2to3.text):
+            value = value.decode('utf-8')
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.make_key(key), value, int(timeout or 0))
+
+    def delete(self, key):
+        self.client.delete(self.make_key(key))
+
+    def clear(self):
+        self.client.flush_all()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import json
+import hashlib
+
+from aserializer.utils import py2to3
+from aserializer.utils import encoders
+from aserializer.utils.encoders import RawJSON
+from aserializer.fields import TypeField, IgnoreField, SerializerFieldValueError
+from aserializer.fields.validators import VALIDATORS_EMPTY_VALUES
+from aserializer.cache.backends import LocMemCacheBackend
+
+
+class FragmentCache(object):
+    """
+    A cache-aside helper for the dump of nested serializers.
+    The key of a fragment is build by the name of the serializer class, the identity field values and the
+    fields/exclude projection. The version is part of every key, so increasing the version invalidates all
+    previous entries of this cache.
+    With raw=True the dump is returned as an encoded RawJSON fragment, which is spliced into the output of to_json.
+    i.g. address = SerializerField(Address, cache=FragmentCache(backend=LocMemCacheBackend()))
+    """
+
+    def __init__(self, backend=None, version=1, prefix='aserializer', timeout=None, raw=False):
+        self.backend = backend if backend is not None else LocMemCacheBackend()
+        self.version = version
+        self.prefix = prefix
+        self.timeout = timeout
+        self.raw = raw
+
+    def __deepcopy__(self, memo):
+        # The serializer fields are copied for every serializer instance, but they all share one cache.
+        return self
+
+    @staticmethod
+    def get_identity_values(serializer):
+        values = []
+        for field_name, field in serializer.fields.items():
+            if not field.identity or isinstance(field, TypeField):
+                continue
+            try:
+                value = field.to_native()
+            except (IgnoreField, SerializerFieldValueError):
+                return None
+            if value in VALIDATORS_EMPTY_VALUES:
+                return None
+            values.append(py2to3._unicode(value))
+        return values or None
+
+    @staticmethod
+    def get_projection(fields=None, exclude=None):
+        if not fields and not exclude:
+            return None
+        projection = u'{}|{}'.format(u','.join(sorted(fields or [])), u','.join(sorted(exclude or [])))
+        return hashlib.md5(projection.encode('utf-8')).hexdigest()[:12]
+
+    @staticmethod
+    def get_class_name(serializer_cls):
+        """
+        Returns the name of the serializer class in the key by its module and qualified name. The generated classes
+        of a model (i.g. the nested serializers of DjangoModelSerializer, which share one name) are told apart by
+        the model and their field names.
+        """
+        name = u'{}.{}'.format(serializer_cls.__module__,
+                               getattr(serializer_cls, '__qualname__', serializer_cls.__name__))
+        model = getattr(getattr(serializer_cls, '_meta', None), 'model', None)
+        if model is not None:
+            field_names = u','.join(sorted(serializer_cls._base_fields.keys()))
+            name = u'{}[{}.{}:{}]'.format(name, model.__module__, model.__name__,
+                                          hashlib.md5(field_names.encode('utf-8')).hexdigest()[:12])
+        return name
+
+    def make_key(self, serializer_cls, identity, fields=None, exclude=None, version=None):
+        if not isinstance(identity, (list, tuple)):
+            identity = [identity]
+        key = u'{}:{}:{}:{}'.format(self.prefix,
+                                    self.version if version is None else version,
+                                    self.get_class_name(serializer_cls),
+                                    u','.join([py2to3._unicode(value) for value in identity]))
+        projection = self.get_projection(fields=fields, exclude=exclude)
+        if projection:
+            key = u'{}:{}'.format(key, projection)
+        return key
+
+    def get_key(self, serializer, fields=None, exclude=None):
+        """
+        Returns the cache key for a serializer instance or None if the serializer got no identity value.
+        """
+        identity = self.get_identity_values(serializer)
+        if identity is None:
+            return None
+        return self.make_key(serializer.__class__, identity, fields=fields, exclude=exclude)
+
+    def get(self, key, raw=False):
+        value = self.backend.get(key)
+        if value is None:
+            return None
+        if raw:
+            return RawJSON(value)
+        return json.loads(value)
+
+    def set(self, key, value):
+        # The dump can contain the RawJSON fragments of nested raw caches.
+        encoded = encoders.dumps(value)
+        self.backend.set(key, encoded, timeout=self.timeout)
+        return encoded
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def invalidate(self, serializer_cls, identity, fields=None, exclude=None):
+        """
+        Removes the fragment of one object, i.g. cache.invalidate(Address, 1)
+        """
+        self.delete(self.make_key(serializer_cls, identity, fields=fields, exclude=exclude))
+
+    def clear(self):
+        self.backend.clear()
+
+    def dump(self, serializer, fields=None, exclude=None, raw=None):
+        """
+        Returns the dump of the serializer from the cache or dumps the serializer and stores the result.
+        """
+        if raw is None:
+            raw = self.raw
+        key = self.get_key(serializer, fields=fields, exclude=exclude)
+        if key is None:
+            return serializer.dump()
+        value = self.get(key, raw=raw)
+        if value is None:
+            value = serializer.dump()
+            encoded = self.set(key, value)
+            if raw:
+                return RawJSON(encoded)
+        return value
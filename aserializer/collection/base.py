@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 
+import os
 import json
+import math
+import atexit
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
-from aserializer.utils import py2to3, registry, options
+from aserializer.utils import py2to3, registry, options, encoders, cursors
 from aserializer.base import Serializer
+from aserializer.fields import validators
+from aserializer.collection import sorting, counting
 
 
 class CollectionBase(type):
@@ -14,7 +22,9 @@ class CollectionBase(type):
         else:
             meta = None
         new_class = super(CollectionBase, cls).__new__(cls, name, bases, attrs)
-        setattr(new_class, '_meta', options.CollectionMetaOptions(meta))
+        _meta = options.CollectionMetaOptions(meta)
+        _meta.count_strategy = counting.get_count_strategy(_meta.count_strategy)
+        setattr(new_class, '_meta', _meta)
         return new_class
 
 
@@ -32,7 +42,8 @@ class CollectionSerializer(py2to3.with_metaclass(CollectionBase)):
         limit_key = 'limit'
         total_count_key = 'totalCount'
 
-    def __init__(self, objects, fields=None, exclude=None, sort=None, limit=None, offset=None, **extras):
+    def __init__(self, objects, fields=None, exclude=None, sort=None, limit=None, offset=None,
+                 after=None, index_version=None, **extras):
         self.pre_initial(objects)
         self.ITEM_SERIALIZER_CLS = self._meta.serializer or self.ITEM_SERIALIZER_CLS
         self._serializer_cls = registry.get_serializer(self.ITEM_SERIALIZER_CLS)
@@ -44,6 +55,13 @@ class CollectionSerializer(py2to3.with_metaclass(CollectionBase)):
         self._sort = sort or self._meta.sort
         self._limit = limit or 10
         self._offset = offset or 0
+        self._after = after
+        self._index_version = index_version
+        self._sorted_index = None
+        self._workers = None
+        self._executor = 'thread'
+        self._chunk_size = None
+        self._has_more = None
         self.with_metadata = self._meta.with_metadata
         self._extras = extras
         self.handle_extras(extras=self._extras)
@@ -51,29 +69,116 @@ class CollectionSerializer(py2to3.with_metaclass(CollectionBase)):
     def __len__(self):
         return len(self.objects)
 
+    def __getstate__(self):
+        # Only the state to serialize the items is send to the worker processes.
+        state = self.__dict__.copy()
+        for name in ('objects', 'result', '_sorted_index', '_executor'):
+            state.pop(name, None)
+        return state
+
     def pre_initial(self, objects):
         pass
 
     def handle_extras(self, extras):
         pass
 
+    def get_total_count(self, objects):
+        return len(objects)
+
+    def get_count_key(self, objects):
+        """
+        Returns the key of the objects for the cached count strategy or None if the count is not cached.
+        """
+        return None
+
+    def get_estimated_count(self, objects):
+        """
+        Returns the estimated count for the estimated count strategy or None to use the exact count.
+        """
+        return len(objects)
+
+    def count(self, objects):
+        return self._meta.count_strategy.count(self, objects)
+
+    def add_count_metadata(self, _metadata, total_count):
+        if total_count is not None:
+            _metadata[self._meta.total_count_key] = total_count
+        if self._has_more is not None:
+            _metadata[self._meta.has_more_key] = self._has_more
+
+    def defer_metadata(self):
+        """
+        Returns True if the page has to be fetched before the metadata is created.
+        """
+        return self._meta.count_strategy.deferred
+
     def metadata(self, objects):
-        total_count = len(objects)
-        if self._offset > total_count:
-            self._offset = total_count
-        if self._offset >= total_count:
-            self._limit = 0
+        total_count = self.count(objects)
+        if total_count is not None:
+            if self._offset > total_count:
+                self._offset = total_count
+            if self._offset >= total_count:
+                self._limit = 0
         _metadata = {}
         _metadata[self._meta.offset_key] = self._offset or 0
         _metadata[self._meta.limit_key] = self._limit or total_count
-        _metadata[self._meta.total_count_key] = total_count
+        self.add_count_metadata(_metadata, total_count)
+        index = self.get_sorted_index(objects, sorting.parse_sort(self._sort))
+        if index is not None and self._limit and 0 <= self._offset and self._offset + self._limit < len(index):
+            cursor_values = index.get_cursor_values(objects, self._offset + self._limit - 1)
+            _metadata[self._meta.next_key] = cursors.encode_cursor(cursor_values)
         return _metadata
 
+    def get_sorted_index(self, objects, sort):
+        """
+        Returns the sorted index of an in-memory collection, if an index cache is set, the Meta option
+        keyset_pagination requests the cursors or a cursor is given.
+        """
+        if self._meta.index_cache is None and not self._meta.keyset_pagination and self._after is None:
+            return None
+        if not isinstance(objects, (list, tuple)):
+            return None
+        if self._sorted_index is None or self._sorted_index.sort != sort:
+            if self._meta.index_cache is not None:
+                self._sorted_index = self._meta.index_cache.get(objects, sort, version=self._index_version)
+            else:
+                self._sorted_index = sorting.SortedIndex(objects, sort)
+        return self._sorted_index
+
+    def seek(self, objects):
+        """
+        Sets the offset to the first object after the cursor. An invalid cursor is ignored.
+        """
+        if self._after is None:
+            return
+        index = self.get_sorted_index(objects, sorting.parse_sort(self._sort))
+        if index is None:
+            return
+        try:
+            self._offset = index.seek(cursors.decode_cursor(self._after))
+        except (ValueError, TypeError):
+            pass
+
+    def get_item_serializer(self, obj):
+        return self._serializer_cls(source=obj, fields=self._fields, exclude=self._exclude, **self._extras)
+
     def item(self, obj):
-        _serializer = self._serializer_cls(source=obj, fields=self._fields, exclude=self._exclude, **self._extras)
+        return self.dump_item(self.get_item_serializer(obj))
+
+    def validated_items(self, objects):
+        """
+        Returns the dumps of the objects, which are validated in one validation batch.
+        """
+        serializers = [self.get_item_serializer(obj) for obj in objects]
+        with validators.validation_batch(serializers):
+            return [self.dump_item(_serializer) for _serializer in serializers]
+
+    def dump_item(self, _serializer):
         if self._meta.validation:
             if not _serializer.is_valid():
                 return {}
+        if self._meta.cache is not None:
+            return self._meta.cache.dump(_serializer, fields=self._fields, exclude=self._exclude)
         return _serializer.dump()
 
     def _pre(self, objects, limit=None, offset=None, sort=None):
@@ -84,19 +189,16 @@ class CollectionSerializer(py2to3.with_metaclass(CollectionBase)):
             limit = int(limit)
         except Exception:
             limit = None
+        sort = sorting.parse_sort(sort)
+        index = self.get_sorted_index(objects, sort)
+        if index is not None:
+            if limit:
+                return index.page(objects, offset, limit)
+            return index.page(objects, 0)
         if sort:
-            if not isinstance(sort, list):
-                sort = [py2to3._unicode(sort)]
-            def get_key(item, k):
-                if isinstance(item, dict):
-                    return item.get(k, None)
-                return getattr(item, k, None)
-            for s in reversed(sort):
-                reverse = False
-                if s.startswith('-'):
-                    reverse = True
-                    s = s[1:]
-                objects = list(sorted(objects, key=lambda item:get_key(item, s), reverse=reverse))
+            # Only the objects up to the end of the requested page have to be sorted.
+            top = offset + limit if limit and offset >= 0 else None
+            objects = sorting.sort_objects(objects, sort, limit=top)
         try:
             if limit:
                 objects = objects[offset:(offset + limit)]
@@ -105,24 +207,167 @@ class CollectionSerializer(py2to3.with_metaclass(CollectionBase)):
         else:
             return objects
 
+    def _page(self, objects):
+        """
+        Returns the sorted objects of the requested page.
+        """
+        count_strategy = self._meta.count_strategy
+        objects = count_strategy.prepare(self, objects)
+        page = self._pre(objects=objects, limit=count_strategy.get_limit(self._limit), offset=self._offset,
+                         sort=self._sort)
+        return count_strategy.handle_page(self, page)
+
     def _items(self, objects):
-        objects = self._pre(objects=objects, limit=self._limit, offset=self._offset, sort=self._sort)
+        objects = self._page(objects)
+        if self._workers and self._workers > 1:
+            objects = list(objects)
+            if len(objects) >= self._meta.parallel_threshold:
+                return self._parallel_items(objects)
+        if self._meta.validation:
+            return self.validated_items(objects)
         return list(map(lambda o: self.item(obj=o), objects))
 
+    def _parallel_items(self, objects):
+        """
+        Serializes the items in chunks by a pool of workers. The order of the items is kept.
+        The executor is 'thread', 'process' or a pool object with a map method (i.g. a pool of the application),
+        by the dump argument or the Meta option executor. The 'thread' and 'process' pools are shared by get_pool().
+        For processes the collection (without the objects), the chunks of source objects and the items are pickled:
+        the collection and serializer classes have to be defined on module level, the source objects have to be
+        picklable, a lazy relation of an object is loaded by the worker and the caches of the collection are not
+        shared with the workers.
+        """
+        chunk_size = self._chunk_size or int(math.ceil(len(objects) / float(self._workers * 4)))
+        chunks = [(self, objects[i:(i + chunk_size)]) for i in range(0, len(objects), chunk_size)]
+        if hasattr(self._executor, 'map'):
+            pool = self._executor
+        else:
+            pool = get_pool(self._executor, self._workers)
+        results = pool.map(dump_items, chunks)
+        return [item for chunk in results for item in chunk]
+
+    def iterate_objects(self, objects):
+        """
+        Returns an iterator over the objects of a page, without caching them.
+        """
+        return iter(objects)
+
+    def _iter_items(self, objects, page=None):
+        if page is None:
+            page = self._page(objects)
+        if self._meta.validation:
+            for item in self.validated_items(self.iterate_objects(page)):
+                yield item
+            return
+        for obj in self.iterate_objects(page):
+            yield self.item(obj=obj)
+
+    def iter_dump(self):
+        """
+        Yields the serialized items of the page one by one, without building the result list.
+        """
+        self.seek(self.objects)
+        for item in self._iter_items(self.objects):
+            yield item
+
+    def _iter_json(self):
+        self.seek(self.objects)
+        page = None
+        if self.with_metadata:
+            if self.defer_metadata():
+                page = self._page(self.objects)
+            yield u'{{{}: {}, {}: ['.format(json.dumps(self._meta.metadata_key),
+                                           encoders.dumps(self.metadata(self.objects)),
+                                           json.dumps(self._meta.items_key))
+        else:
+            yield u'['
+        separator = u''
+        for item in self._iter_items(self.objects, page=page):
+            yield separator + encoders.dumps(item)
+            separator = u', '
+        yield u']}' if self.with_metadata else u']'
+
+    def iter_json(self, encoding=None):
+        """
+        Yields the json of the collection in chunks: the metadata first and then every item on its own.
+        The iterator can be used as the body of a streaming (WSGI) response, with an encoding it yields bytes.
+        """
+        for chunk in self._iter_json():
+            if encoding:
+                chunk = chunk.encode(encoding)
+            yield chunk
+
+    def write_json(self, fp, encoding=None):
+        for chunk in self.iter_json(encoding=encoding):
+            fp.write(chunk)
+
     def _generate(self, objects):
         if hasattr(self, 'result'):
             return self.result
+        self.seek(objects)
         if self.with_metadata:
             self.result = dict()
-            self.result[self._meta.metadata_key] = self.metadata(objects)
-            self.result[self._meta.items_key] = self._items(objects)
+            if self.defer_metadata():
+                items = self._items(objects)
+                self.result[self._meta.metadata_key] = self.metadata(objects)
+                self.result[self._meta.items_key] = items
+            else:
+                self.result[self._meta.metadata_key] = self.metadata(objects)
+                self.result[self._meta.items_key] = self._items(objects)
         else:
             self.result = self._items(objects)
 
-    def dump(self):
+    def dump(self, workers=None, executor=None, chunk_size=None):
+        """
+        Returns the collection result. With workers > 1 the items of a page are serialized in parallel,
+        if the page got at least Meta.parallel_threshold items.
+        """
+        self._workers = workers
+        self._executor = executor or self._meta.executor
+        self._chunk_size = chunk_size
         self._generate(self.objects)
         return self.result
 
     def to_json(self, indent=None):
         dump = self.dump()
-        return json.dumps(dump, indent=indent)
+        return encoders.dumps(dump, indent=indent)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(executor, workers):
+    """
+    Returns the pool of the executor ('thread' or 'process') with the number of workers. The pools are created on
+    first use and kept per process, so the workers are not started again for every dump.
+    """
+    key = (os.getpid(), executor, workers)
+    with _pools_lock:
+        pool = _pools.get(key, None)
+        if pool is None:
+            if executor == 'thread':
+                pool = ThreadPool(workers)
+            elif executor == 'process':
+                pool = multiprocessing.Pool(workers)
+            else:
+                raise ValueError('Unknown executor {}.'.format(executor))
+            _pools[key] = pool
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for (pid, executor, workers), pool in list(_pools.items()):
+            if pid == os.getpid():
+                pool.terminate()
+                pool.join()
+        _pools.clear()
+
+
+atexit.register(close_pools)
+
+
+def dump_items(args):
+    collection, objects = args
+    return [collection.item(obj=obj) for obj in objects]
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+from aserializer.utils import py2to3
+
+
+class CountStrategy(object):
+    """
+    A count strategy computes the total count of a collection for the metadata.
+    The strategies are set by the collection Meta option count_strategy, by name or as instance.
+    If deferred is True, the page is fetched before the metadata is created.
+    """
+    deferred = False
+
+    def count(self, collection, objects):
+        raise NotImplementedError()
+
+    def prepare(self, collection, objects):
+        """
+        Returns the objects to fetch the page from.
+        """
+        return objects
+
+    def get_limit(self, limit):
+        """
+        Returns the number of objects to fetch for a page.
+        """
+        return limit
+
+    def handle_page(self, collection, page):
+        return page
+
+
+class ExactCount(CountStrategy):
+
+    def count(self, collection, objects):
+        return collection.get_total_count(objects)
+
+
+class CachedCount(ExactCount):
+    """
+    Memoizes the exact count by the query signature of the collection for ttl seconds.
+    """
+
+    def __init__(self, ttl=60, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def count(self, collection, objects):
+        key = collection.get_count_key(objects)
+        if key is None:
+            return super(CachedCount, self).count(collection, objects)
+        entry = self._counts.get(key, None)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        total_count = super(CachedCount, self).count(collection, objects)
+        with self._lock:
+            if len(self._counts) >= self.max_entries:
+                self._counts.clear()
+            self._counts[key] = (time.time() + self.ttl, total_count)
+        return total_count
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._counts.clear()
+            else:
+                self._counts.pop(key, None)
+
+
+class EstimatedCount(ExactCount):
+    """
+    Uses the statistics of the database for an unfiltered collection and the exact count otherwise.
+    """
+
+    def count(self, collection, objects):
+        total_count = collection.get_estimated_count(objects)
+        if total_count is None:
+            return super(EstimatedCount, self).count(collection, objects)
+        return total_count
+
+
+class HasMoreCount(CountStrategy):
+    """
+    Does not count the collection. One more object than the limit is fetched to know if there is a next page.
+    """
+    deferred = True
+
+    def count(self, collection, objects):
+        return None
+
+    def get_limit(self, limit):
+        if not limit:
+            return limit
+        return limit + 1
+
+    def handle_page(self, collection, page):
+        if not collection._limit:
+            collection._has_more = False
+            return page
+        page = list(page)
+        collection._has_more = len(page) > collection._limit
+        return page[:collection._limit]
+
+
+COUNT_STRATEGIES = {
+    'exact': ExactCount,
+    'cached': CachedCount,
+    'estimated': EstimatedCount,
+    'has_more': HasMoreCount,
+}
+
+
+def get_count_strategy(strategy):
+    if strategy is None:
+        return ExactCount()
+    if isinstance(strategy, py2to3.string):
+        if strategy not in COUNT_STRATEGIES:
+            raise ValueError('Unknown count strategy {}.'.format(strategy))
+        return COUNT_STRATEGIES[strategy]()
+    return strategy
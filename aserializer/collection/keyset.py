@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+from aserializer.utils import cursors
+from aserializer.collection.counting import HasMoreCount
+
+
+class KeysetPaginationMixin(object):
+    """
+    The keyset pagination of a database collection by the cursors after and before. The backend filters, orders and
+    fetches the objects and reads the sort values of an object by:
+    get_keyset_order_by, filter_keyset, order_keyset, fetch_keyset and get_keyset_values.
+    The cursor errors are the errors of an invalid cursor, with which the first page is returned.
+    """
+    cursor_errors = (cursors.InvalidCursor, ValueError, TypeError)
+
+    def __init__(self, objects, *args, **kwargs):
+        self._before = kwargs.pop('before', None)
+        self._next_cursor = None
+        self._prev_cursor = None
+        super(KeysetPaginationMixin, self).__init__(objects, *args, **kwargs)
+
+    def use_keyset(self):
+        """
+        The keyset pagination is used if the Meta option keyset_pagination is set or a cursor is given.
+        """
+        return self._meta.keyset_pagination or self._after is not None or self._before is not None
+
+    def defer_metadata(self):
+        return self.use_keyset() or super(KeysetPaginationMixin, self).defer_metadata()
+
+    def metadata(self, objects):
+        total_count = self.count(objects)
+        _metadata = {}
+        if not self.use_keyset():
+            _metadata[self._meta.offset_key] = self._offset or 0
+        _metadata[self._meta.limit_key] = self._limit or total_count
+        self.add_count_metadata(_metadata, total_count)
+        if self._next_cursor is not None:
+            _metadata[self._meta.next_key] = self._next_cursor
+        if self._prev_cursor is not None:
+            _metadata[self._meta.prev_key] = self._prev_cursor
+        return _metadata
+
+    def get_keyset_order_by(self, objects):
+        """
+        Returns the order_by arguments of the sort with a unique tie-breaker.
+        """
+        raise NotImplementedError()
+
+    def filter_keyset(self, objects, order_by, values, backwards=False):
+        """
+        Returns the objects after the cursor values (before them, if backwards).
+        """
+        raise NotImplementedError()
+
+    def order_keyset(self, objects, order_by, backwards=False):
+        raise NotImplementedError()
+
+    def fetch_keyset(self, objects, limit=None):
+        """
+        Returns the list of the first (up to limit) objects.
+        """
+        raise NotImplementedError()
+
+    def get_keyset_values(self, objects, obj, order_by):
+        """
+        Returns the cursor values of an object for the order_by arguments.
+        """
+        raise NotImplementedError()
+
+    def _keyset_count_page(self, objects):
+        """
+        Returns the keyset page with the count strategy.
+        """
+        count_strategy = self._meta.count_strategy
+        objects = count_strategy.prepare(self, objects)
+        page = self._keyset_page(objects)
+        if isinstance(count_strategy, HasMoreCount):
+            # The keyset page already knows if there is a next page.
+            self._has_more = self._next_cursor is not None
+            return page
+        return count_strategy.handle_page(self, page)
+
+    def _keyset_page(self, objects):
+        """
+        Returns the page after the cursor (or before it) by filtering on the sort values of the cursor instead of
+        an offset, so a deep page costs the same as the first one. Sets the cursors of the next and the previous page.
+        """
+        limit = self._limit
+        order_by = self.get_keyset_order_by(objects)
+        backwards = self._before is not None
+        values = None
+        try:
+            values = cursors.decode_cursor(self._before if backwards else self._after)
+            if len(values) != len(order_by):
+                raise cursors.InvalidCursor('The cursor does not match the sort.')
+            objects = self.filter_keyset(objects, order_by, values, backwards=backwards)
+        except self.cursor_errors:
+            # An invalid cursor is ignored and the first page is returned.
+            values = None
+            backwards = False
+        objects = self.order_keyset(objects, order_by, backwards=backwards)
+        # One more object tells if there is another page.
+        page = self.fetch_keyset(objects, limit=limit + 1 if limit else None)
+        has_more = bool(limit) and len(page) > limit
+        if limit:
+            page = page[:limit]
+        if backwards:
+            page.reverse()
+        has_next = values is not None if backwards else has_more
+        has_prev = has_more if backwards else values is not None
+        if page and has_next:
+            self._next_cursor = cursors.encode_cursor(self.get_keyset_values(objects, page[-1], order_by))
+        if page and has_prev:
+            self._prev_cursor = cursors.encode_cursor(self.get_keyset_values(objects, page[0], order_by))
+        return page
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import bisect
+import threading
+from collections import OrderedDict
+
+from aserializer.utils import py2to3, cursors
+
+# The partial sort (heapq) is used if the requested page is smaller than 1/TOP_K_RATIO of the objects.
+TOP_K_RATIO = 10
+
+
+class Descending(object):
+    """
+    Wraps a sort key component to invert its order, so ascending and descending components can be mixed in
+    one composite key.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __gt__(self, other):
+        return other.value > self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return self.value != other.value
+
+    def __le__(self, other):
+        return other.value <= self.value
+
+    def __ge__(self, other):
+        return other.value >= self.value
+
+
+def parse_sort(sort):
+    """
+    Returns a list of (name, descending) tuples, i.g. ['name', '-number'] -> [('name', False), ('number', True)]
+    """
+    if not sort:
+        return []
+    if not isinstance(sort, (list, tuple)):
+        sort = [sort]
+    result = []
+    for item in sort:
+        name = py2to3._unicode(item)
+        if name.startswith('-'):
+            result.append((name[1:], True))
+        else:
+            result.append((name, False))
+    return result
+
+
+def get_value(item, name):
+    if isinstance(item, dict):
+        return item.get(name, None)
+    return getattr(item, name, None)
+
+
+def get_sort_key(sort):
+    """
+    Returns a key function and the reverse flag for one composite sort of the parsed sort list.
+    None values are sorted after all other values (before them for a descending sort).
+    If all components got the same direction, the key is a plain tuple and the sort is reversed as a whole.
+    """
+    directions = set(descending for name, descending in sort)
+    mixed = len(directions) > 1
+    reverse = not mixed and True in directions
+    if len(sort) == 1:
+        name = sort[0][0]
+
+        def key(item):
+            value = get_value(item, name)
+            return value is None, value
+        return key, reverse
+
+    def key(item):
+        if isinstance(item, dict):
+            values = [item.get(name, None) for name, descending in sort]
+        else:
+            values = [getattr(item, name, None) for name, descending in sort]
+        if mixed:
+            return tuple(Descending((value is None, value)) if descending else (value is None, value)
+                         for value, (name, descending) in zip(values, sort))
+        return tuple((value is None, value) for value in values)
+    return key, reverse
+
+
+def sort_objects(objects, sort, limit=None):
+    """
+    Sorts the objects in one pass by the parsed sort list. If only the first limit objects are needed and the
+    limit is small compared to the number of objects, only these are sorted.
+    """
+    if not sort:
+        return objects
+    key, reverse = get_sort_key(sort)
+    if not isinstance(objects, list):
+        objects = list(objects)
+    if limit is not None and 0 <= limit and limit * TOP_K_RATIO < len(objects):
+        if reverse:
+            return heapq.nlargest(limit, objects, key=key)
+        return heapq.nsmallest(limit, objects, key=key)
+    return sorted(objects, key=key, reverse=reverse)
+
+
+class SortedIndex(object):
+    """
+    The sorted permutation of an in-memory collection for one sort list. A page is served by slicing the
+    permutation and a cursor (the sort values and the position of an object in the collection) is resolved to
+    an offset by bisection.
+    """
+
+    def __init__(self, objects, sort):
+        self.sort = sort
+        key, self.reverse = get_sort_key(sort)
+        keys = [key(obj) for obj in objects]
+        self._key = key
+        self._offsets = None
+        self.permutation = sorted(range(len(keys)), key=keys.__getitem__, reverse=self.reverse)
+        # The entries are always ascending. Equal keys keep the order of the collection, so for a reversed
+        # sort the entries of the reversed permutation are ascending by (key, -position).
+        if self.reverse:
+            self._entries = [(keys[i], -i) for i in reversed(self.permutation)]
+        else:
+            self._entries = [(keys[i], i) for i in self.permutation]
+
+    def __len__(self):
+        return len(self.permutation)
+
+    def page(self, objects, offset, limit=None):
+        if limit is None:
+            positions = self.permutation[offset:]
+        else:
+            positions = self.permutation[offset:(offset + limit)]
+        return [objects[i] for i in positions]
+
+    def get_cursor_values(self, objects, offset):
+        """
+        Returns the cursor values of the object at the offset of the sorted collection.
+        """
+        position = self.permutation[offset]
+        obj = objects[position]
+        return [get_value(obj, name) for name, descending in self.sort] + [position]
+
+    def get_offset(self, position):
+        """
+        Returns the offset of the object at the position of the collection.
+        """
+        if self._offsets is None:
+            self._offsets = dict((position, offset) for offset, position in enumerate(self.permutation))
+        try:
+            return self._offsets[position]
+        except (KeyError, TypeError):
+            raise ValueError('The cursor does not match the index.')
+
+    def seek(self, values):
+        """
+        Returns the offset of the first object after the object of the cursor values.
+        """
+        if len(values) != len(self.sort) + 1:
+            raise ValueError('The cursor does not match the sort.')
+        position = values[-1]
+        if any(value is cursors.OPAQUE for value in values):
+            # The sort values are not known, the object is found by its position.
+            return self.get_offset(position) + 1
+        key = self._key(dict((name, value) for (name, descending), value in zip(self.sort, values)))
+        if self.reverse:
+            return len(self._entries) - bisect.bisect_left(self._entries, (key, -position))
+        return bisect.bisect_right(self._entries, (key, position))
+
+
+class SortedIndexCache(object):
+    """
+    Keeps the sorted indexes of in-memory collections for repeated pagination.
+    An index is found by the identity of the collection list and the sort. If a version token is given, the
+    index is found by the version instead, so a new list with the same content can use the index as well.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_key(self, objects, sort, version=None):
+        sort_key = tuple(sort)
+        if version is not None:
+            return 'version', version, sort_key
+        return 'id', id(objects), sort_key
+
+    def get(self, objects, sort, version=None):
+        key = self.get_key(objects, sort, version=version)
+        with self._lock:
+            entry = self._indexes.pop(key, None)
+            if entry is not None:
+                self._indexes[key] = entry
+        if entry is not None:
+            source, index = entry
+            if (version is not None or source is objects) and len(index) == len(objects):
+                return index
+        index = SortedIndex(objects, sort)
+        with self._lock:
+            self._indexes[key] = (objects if version is None else None, index)
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, objects=None, version=None):
+        """
+        Removes all indexes of the collection list or of the version token.
+        """
+        with self._lock:
+            for key in list(self._indexes.keys()):
+                if version is not None and key[0] == 'version' and key[1] == version:
+                    del self._indexes[key]
+                elif objects is not None and key[0] == 'id' and key[1] == id(objects):
+                    del self._indexes[key]
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
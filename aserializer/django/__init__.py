@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from .collection import DjangoCollectionSerializer
-from .fields import RelatedManagerListSerializerField
+from .counting import WindowCount
+from .fields import RelatedManagerListSerializerField, CountField, SumField, AvgField, MinField, MaxField
 from .mixins import DjangoRequestMixin
+from .queries import query_budget, QueryBudgetExceeded
+from .validators import ModelExistsValidator
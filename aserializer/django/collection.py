@@ -1,45 +1,63 @@
 # -*- coding: utf-8 -*-
 
-from aserializer.utils import py2to3
+from aserializer.utils import py2to3, cursors
 from aserializer.collection.base import CollectionSerializer
+from aserializer.collection.keyset import KeysetPaginationMixin
+from aserializer.django.counting import WindowCount
 from aserializer.django.mixins import DjangoRequestMixin
-from aserializer.django.utils import django_required, get_django_model_field_list
+from aserializer.django.utils import django_required, get_django_model_field_list, get_estimated_count
+from aserializer.django import pagination
+from aserializer.django.optimization import (get_plan, get_values_lookups, get_annotations, load_pk_lists,
+                                             nest_values, iterate_prefetched)
 
 try:
+    from django.core.exceptions import ValidationError
+    from django.db import connections
     from django.db.models.query import QuerySet
 except ImportError:
+    ValidationError = ValueError
+    connections = None
     QuerySet = None
 
 
-class DjangoCollectionSerializer(DjangoRequestMixin, CollectionSerializer):
+class DjangoCollectionSerializer(DjangoRequestMixin, KeysetPaginationMixin, CollectionSerializer):
+    cursor_errors = KeysetPaginationMixin.cursor_errors + (ValidationError,)
+
     @django_required()
     def pre_initial(self, objects):
         if not isinstance(objects, QuerySet):
             raise ValueError('Can only handle a django queryset.')
 
-    def metadata(self, objects):
-        if objects:
-            total_count = objects.count()
-        else:
-            total_count = 0
-        _metadata = {}
-        _metadata[self._meta.offset_key] = self._offset or 0
-        _metadata[self._meta.limit_key] = self._limit or total_count
-        _metadata[self._meta.total_count_key] = total_count
-        return _metadata
+    def get_total_count(self, objects):
+        # QuerySet.count() uses the result cache if the queryset is evaluated, otherwise it runs a COUNT query.
+        # A truth value test would fetch all rows of the unsliced queryset.
+        return objects.count()
 
-    def _pre(self, objects, limit=None, offset=None, sort=None):
-        if offset is None:
-            offset = 0
+    def get_count_key(self, objects):
         try:
-            offset = int(offset)
-            limit = int(limit)
+            sql, params = objects.query.sql_with_params()
         except Exception:
-            limit = None
+            return None
+        return objects.db, sql, tuple(py2to3._unicode(param) for param in params)
+
+    def get_estimated_count(self, objects):
+        return get_estimated_count(objects)
+
+    def iterate_objects(self, objects):
+        if isinstance(objects, QuerySet):
+            if objects._prefetch_related_lookups:
+                return iterate_prefetched(objects, chunk_size=self._meta.prefetch_chunk_size)
+            return objects.iterator()
+        return iter(objects)
+
+    def get_order_by(self, objects, sort):
+        """
+        Returns the order_by arguments of the queryset for the serializer field names of the sort.
+        """
         if sort is not None and not isinstance(sort, list):
             sort = [str(sort)]
         _sort = []
-        if objects and sort and len(sort) > 0:
+        if sort:
             model_fields = get_django_model_field_list(objects.model)
             serializer_fieldnames = self._serializer_cls.get_fieldnames()
             for sort_item in sort:
@@ -52,9 +70,19 @@ class DjangoCollectionSerializer(DjangoRequestMixin, CollectionSerializer):
                     sort_field_name = serializer_fieldnames[sort_field_name]
                     if sort_field_name in model_fields:
                         _sort.append('{}{}'.format(sort_prefix, sort_field_name))
+        return [py2to3._unicode(item).replace('.', '__') for item in _sort]
+
+    def _pre(self, objects, limit=None, offset=None, sort=None):
+        if offset is None:
+            offset = 0
         try:
-            if objects and len(_sort) > 0:
-                _sort = [py2to3._unicode(item).replace('.', '__') for item in _sort]
+            offset = int(offset)
+            limit = int(limit)
+        except Exception:
+            limit = None
+        _sort = self.get_order_by(objects, sort)
+        try:
+            if _sort:
                 objects = objects.order_by(*_sort)
             if limit:
                 objects = objects[offset:(offset + limit)]
@@ -62,3 +90,68 @@ class DjangoCollectionSerializer(DjangoRequestMixin, CollectionSerializer):
             return objects.model.objects.none()
         else:
             return objects
+
+    def optimize(self, objects):
+        """
+        Returns the queryset with the relations and the columns of the serializer projection. It is applied with the
+        Meta option optimize_queryset = True or values. With values the rows are fetched as dictionaries by
+        .values(), if the serializer reads no list relations.
+        """
+        sort_fields = [item.lstrip('-') for item in self.get_order_by(objects, self._sort)]
+        if self._meta.values:
+            lookups = get_values_lookups(self._serializer_cls, objects.model, fields=self._fields,
+                                         exclude=self._exclude, extra_fields=sort_fields)
+            if lookups is not None:
+                annotations = get_annotations(self._serializer_cls, objects.model, fields=self._fields,
+                                              exclude=self._exclude)
+                if annotations:
+                    objects = objects.annotate(**annotations)
+                return objects.values(*lookups)
+        return self._serializer_cls.optimize_queryset(objects, fields=self._fields, exclude=self._exclude,
+                                                      extra_fields=sort_fields)
+
+    def get_item_serializer(self, obj):
+        if isinstance(obj, dict) and self._meta.values:
+            obj = nest_values(obj)
+        return super(DjangoCollectionSerializer, self).get_item_serializer(obj)
+
+    def _page(self, objects):
+        plan = get_plan(self._serializer_cls, objects.model, fields=self._fields, exclude=self._exclude)
+        if self._meta.optimize_queryset or self._meta.values:
+            objects = self.optimize(objects)
+        elif plan.root.annotations:
+            # The aggregate fields are annotated without the optimization of the relations as well.
+            objects = objects.annotate(**plan.root.get_annotations())
+        page = self._fetch_page(objects)
+        if plan.pk_lists:
+            page = load_pk_lists(objects, page, plan.pk_lists)
+        return page
+
+    def _fetch_page(self, objects):
+        if not self.use_keyset():
+            return super(DjangoCollectionSerializer, self)._page(objects)
+        if isinstance(self._meta.count_strategy, WindowCount) and (self._after or self._before):
+            # The window of a cursor page counts only the rows after the cursor, so the total is counted on its own.
+            self._window_total_count = None
+            return self._keyset_page(objects)
+        return self._keyset_count_page(objects)
+
+    def get_keyset_order_by(self, objects):
+        return cursors.get_keyset_order_by(self.get_order_by(objects, self._sort), objects.model._meta.pk.name)
+
+    def filter_keyset(self, objects, order_by, values, backwards=False):
+        nulls_largest = getattr(connections[objects.db].features, 'nulls_order_largest', False)
+        return objects.filter(pagination.get_keyset_filter(order_by, values, backwards=backwards,
+                                                           nulls_largest=nulls_largest))
+
+    def order_keyset(self, objects, order_by, backwards=False):
+        objects = objects.order_by(*order_by)
+        if backwards:
+            objects = objects.reverse()
+        return objects
+
+    def fetch_keyset(self, objects, limit=None):
+        return list(objects[:limit]) if limit else list(objects)
+
+    def get_keyset_values(self, objects, obj, order_by):
+        return pagination.get_keyset_values(obj, order_by)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from aserializer.collection.counting import CountStrategy
+
+try:
+    # RawSQL exists since Django 1.8.
+    from django.db import connections
+    from django.db.models.expressions import RawSQL
+except ImportError:
+    connections = RawSQL = None
+
+
+if RawSQL is not None:
+    class WindowCountSQL(RawSQL):
+        """
+        The COUNT(*) OVER () expression. It is not added to the GROUP BY of a queryset with aggregate annotations,
+        so it counts the grouped rows.
+        """
+
+        def __init__(self):
+            super(WindowCountSQL, self).__init__('COUNT(*) OVER ()', ())
+
+        def get_group_by_cols(self, *args, **kwargs):
+            return []
+else:
+    WindowCountSQL = None
+
+
+def supports_window_count(objects):
+    """
+    Returns False for Django versions without RawSQL (1.7) and for databases without window functions, as far as
+    Django knows them (supports_over_clause since Django 2.0).
+    """
+    if WindowCountSQL is None:
+        return False
+    return getattr(connections[objects.db].features, 'supports_over_clause', True)
+
+
+class WindowCount(CountStrategy):
+    """
+    Reads the total count from a COUNT(*) OVER () annotation of the page query, so a page is fetched with one
+    query. Only for an empty page an additional COUNT query is needed. A distinct queryset is counted by a COUNT
+    query, since the window counts the rows before DISTINCT.
+    The database needs window functions (i.g. PostgreSQL, MySQL 8 or sqlite 3.25). Without them or on Django 1.7
+    the total is counted by a COUNT query like ExactCount.
+    """
+    deferred = True
+    annotation_name = '_aserializer_total_count'
+
+    def prepare(self, collection, objects):
+        collection._window_total_count = None
+        collection._window_counted = not objects.query.distinct and supports_window_count(objects)
+        if not collection._window_counted:
+            return objects
+        return objects.annotate(**{self.annotation_name: WindowCountSQL()})
+
+    def handle_page(self, collection, page):
+        page = list(page)
+        if page and collection._window_counted:
+            if isinstance(page[0], dict):
+                collection._window_total_count = page[0][self.annotation_name]
+            else:
+                collection._window_total_count = getattr(page[0], self.annotation_name)
+        return page
+
+    def count(self, collection, objects):
+        total_count = getattr(collection, '_window_total_count', None)
+        if total_count is None:
+            return collection.get_total_count(objects)
+        return total_count
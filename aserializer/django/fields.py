@@ -2,14 +2,20 @@
 from collections import Iterable
 try:
     from django.db.models.query import QuerySet
-    from django.db.models import Manager
+    from django.db.models import Manager, Model, Count, Sum, Avg, Min, Max
 except ImportError:
     QuerySet = None
     Manager = None
+    Model = None
+    Count = Sum = Avg = Min = Max = None
 
-from aserializer.fields import ListSerializerField
+from aserializer.fields import ListSerializerField, BaseSerializerField, SerializerFieldValueError
+from aserializer.fields import validators as v
 from aserializer.django.utils import get_local_fields, get_related_fields
 
+# The instance attribute of the primary key lists loaded for a page of a collection.
+PK_LISTS_CACHE_NAME = '_aserializer_pk_lists'
+
 
 class RelatedManagerListSerializerField(ListSerializerField):
 
@@ -19,7 +25,10 @@ class RelatedManagerListSerializerField(ListSerializerField):
         elif isinstance(value, Iterable):
             values = value
         elif isinstance(value, (QuerySet, Manager)):
-            if self.only_fields or self.exclude:
+            values = value.all()
+            # A prefetched relation (i.g. by optimize_queryset, with a Prefetch object of the projected .only()
+            # queryset) is read from the result cache without a query.
+            if values._result_cache is None and (self.only_fields or self.exclude):
                 local_fields = get_local_fields(value.model)
                 related_fields = get_related_fields(value.model)
                 only_fields = [f.name for f in local_fields]
@@ -31,8 +40,6 @@ class RelatedManagerListSerializerField(ListSerializerField):
                 only_fields += [f.name for f in related_fields]
                 # .only() returns a QuerySet of RelatedDjangoModel_Deferred objects?
                 values = value.only(*only_fields)
-            else:
-                values = value.all()
         else:
             return
         self.items[:] = []
@@ -40,3 +47,157 @@ class RelatedManagerListSerializerField(ListSerializerField):
         self._python_items[:] = []
         for item in values:
             self.add_item(source=item)
+
+
+class PrimaryKeyRelatedField(BaseSerializerField):
+    """
+    A forward relation represented by the primary key of the related object. The value is read from the map_field
+    (the foreign key column, i.g. relation_id), so the related object is not fetched. A related object as value
+    is replaced by its primary key. The pk_field is a serializer field for the type of the primary key.
+    """
+
+    def __init__(self, pk_field=None, *args, **kwargs):
+        super(PrimaryKeyRelatedField, self).__init__(*args, **kwargs)
+        self.pk_field = pk_field
+
+    def get_source_name(self, name, attributes):
+        if self.map_field and self.map_field in attributes:
+            return self.map_field
+        return super(PrimaryKeyRelatedField, self).get_source_name(name, attributes)
+
+    def set_value(self, value):
+        if Model is not None and isinstance(value, Model):
+            value = value.pk
+        self.value = value
+        if self.pk_field is not None:
+            self.pk_field.set_value(value)
+
+    def validate(self):
+        super(PrimaryKeyRelatedField, self).validate()
+        if self.pk_field is not None and self.value not in v.VALIDATORS_EMPTY_VALUES:
+            try:
+                self.pk_field.validate()
+            except SerializerFieldValueError as e:
+                raise SerializerFieldValueError(e.errors, field_names=self.names)
+
+    def _to_native(self):
+        if self.value is None or self.pk_field is None:
+            return self.value
+        return self.pk_field.to_native()
+
+    def _to_python(self):
+        if self.value is None or self.pk_field is None:
+            return self.value
+        return self.pk_field.to_python()
+
+
+class PrimaryKeyListField(BaseSerializerField):
+    """
+    A many-to-many or reverse relation represented by the list of primary keys of the related objects.
+    The lookup is the query name of the relation. A collection loads the lists for a whole page with one query per
+    relation (the lists of a nested serializer are prefetched for all its objects), otherwise the list is read from
+    the prefetched objects or by one values_list query.
+    """
+
+    def __init__(self, lookup=None, pk_field=None, *args, **kwargs):
+        kwargs.setdefault('required', False)
+        super(PrimaryKeyListField, self).__init__(*args, **kwargs)
+        self.lookup = lookup
+        self.pk_field = pk_field
+        self.value = []
+
+    def set_value(self, value):
+        if value is None:
+            self.value = []
+            return
+        if isinstance(value, (QuerySet, Manager)):
+            instance = getattr(value, 'instance', None)
+            pk_lists = getattr(instance, PK_LISTS_CACHE_NAME, {})
+            if self.lookup in pk_lists:
+                value = pk_lists[self.lookup]
+            else:
+                queryset = value.all()
+                if queryset._result_cache is not None:
+                    value = [obj.pk for obj in queryset]
+                else:
+                    value = list(queryset.values_list('pk', flat=True))
+        self.value = [item.pk if Model is not None and isinstance(item, Model) else item for item in value]
+
+    def _to_value(self, method_name):
+        if self.pk_field is None:
+            return list(self.value)
+        result = []
+        for item in self.value:
+            self.pk_field.set_value(item)
+            result.append(getattr(self.pk_field, method_name)())
+        return result
+
+    def _to_native(self):
+        return self._to_value('to_native')
+
+    def _to_python(self):
+        return self._to_value('to_python')
+
+
+class AggregateField(BaseSerializerField):
+    """
+    A read-only value aggregated over a relation, i.g. CountField('comments') or SumField('items__price').
+    The field name is the annotation name: a collection (or optimize_queryset) annotates the queryset, so the value
+    is read from the same SELECT. Without the annotation (i.g. a single instance) the value is aggregated by one
+    query for the primary key of the object; the model is set by the model serializer.
+    Aggregates over different multi-valued relations in one query multiply the joined rows, so counts should use
+    distinct=True then.
+    """
+    aggregate_class = None
+
+    def __init__(self, lookup, distinct=False, model=None, *args, **kwargs):
+        kwargs.setdefault('required', False)
+        super(AggregateField, self).__init__(*args, **kwargs)
+        self.lookup = lookup
+        self.distinct = distinct
+        self.model = model
+        self._aggregate_pk = False
+
+    def get_aggregate(self):
+        if self.distinct:
+            return self.aggregate_class(self.lookup, distinct=True)
+        return self.aggregate_class(self.lookup)
+
+    def get_source_name(self, name, attributes):
+        source_name = super(AggregateField, self).get_source_name(name, attributes)
+        self._aggregate_pk = source_name is None and self.model is not None
+        if self._aggregate_pk:
+            return 'pk'
+        return source_name
+
+    def set_value(self, value):
+        if self._aggregate_pk and value is not None:
+            queryset = self.model._default_manager.filter(pk=value)
+            value = queryset.aggregate(_aggregate=self.get_aggregate())['_aggregate']
+        self.value = value
+
+    def _to_native(self):
+        return self.value
+
+    def _to_python(self):
+        return self.value
+
+
+class CountField(AggregateField):
+    aggregate_class = Count
+
+
+class SumField(AggregateField):
+    aggregate_class = Sum
+
+
+class AvgField(AggregateField):
+    aggregate_class = Avg
+
+
+class MinField(AggregateField):
+    aggregate_class = Min
+
+
+class MaxField(AggregateField):
+    aggregate_class = Max
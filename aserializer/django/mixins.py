@@ -36,3 +36,9 @@ class DjangoRequestMixin(object):
                 self._offset = int(offset)
             except:
                 pass
+        after = params.get('after', None)
+        if after is not None:
+            self._after = after
+        before = params.get('before', None)
+        if before is not None:
+            self._before = before
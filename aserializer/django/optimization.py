@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import OrderedDict
+
+from aserializer.fields import SerializerObjectField, TypeField
+from aserializer.django import utils as django_utils
+from aserializer.django.fields import PrimaryKeyListField, AggregateField, PK_LISTS_CACHE_NAME
+
+try:
+    from django.db.models import ManyToManyField
+except ImportError:
+    ManyToManyField = None
+try:
+    from django.db.models import Prefetch
+    from django.db.models.query import prefetch_related_objects
+except ImportError:
+    Prefetch = None
+    prefetch_related_objects = None
+
+
+_relations_cache = {}
+_columns_cache = {}
+_plans_cache = {}
+_plans_lock = threading.Lock()
+MAX_PLANS = 1000
+
+
+def get_model_relations(model):
+    """
+    Returns a dictionary of the attribute names of the model relations to
+    (lookup, many, related model, reverse, remote field).
+    The lookup is the name for select_related/prefetch_related, many is True for relations to a list of objects
+    and the remote field is the foreign key of a reverse relation on the related model.
+    """
+    if model in _relations_cache:
+        return _relations_cache[model]
+    relations = {}
+    for field in django_utils.get_relation_fields(model):
+        related_model = django_utils.get_related_model_from_field(field)
+        if django_utils.is_reverse_relation_field(field):
+            lookup = field.get_accessor_name()
+            many = not django_utils.is_reverse_one2one_relation_field(field)
+            remote_field = None if isinstance(field.field, ManyToManyField) else field.field.name
+            relation = (lookup, many, related_model, True, remote_field)
+            relations[lookup] = relation
+            relations.setdefault(django_utils.get_reverse_related_name_from_field(field), relation)
+        else:
+            many = isinstance(field, ManyToManyField) or related_model is None
+            relations[field.name] = (field.name, many, related_model, False, None)
+    _relations_cache[model] = relations
+    return relations
+
+
+def get_model_columns(model):
+    """
+    Returns a dictionary of the names and attnames of the concrete model fields to the field names.
+    """
+    if model in _columns_cache:
+        return _columns_cache[model]
+    columns = {}
+    for field in model._meta.concrete_fields:
+        columns[field.name] = field.name
+        columns[field.attname] = field.name
+    _columns_cache[model] = columns
+    return columns
+
+
+class QueryPart(object):
+    """
+    One query of a plan: the queryset itself or the queryset of a prefetched relation.
+    The columns are the columns for .only(), relative to the model of the query. If the columns read by the
+    serializer are not known (i.g. for a serializer field of a model property), the columns are None.
+    Projected is True if a fields/exclude projection applies to the query. The annotations are the aggregate
+    fields of the model by their names.
+    """
+
+    def __init__(self, model, projected=False):
+        self.model = model
+        self.projected = projected
+        self.select = []
+        self.columns = []
+        self.annotations = OrderedDict()
+
+    def add_column(self, column):
+        if self.columns is not None and column not in self.columns:
+            self.columns.append(column)
+
+    def invalidate_columns(self):
+        self.columns = None
+
+    def get_annotations(self):
+        return OrderedDict((name, field.get_aggregate()) for name, field in self.annotations.items())
+
+    def get_queryset(self):
+        """
+        Returns the queryset for a Prefetch object or None if the default queryset of the relation can be used.
+        """
+        only = self.projected and self.columns is not None
+        if not self.select and not only and not self.annotations:
+            return None
+        queryset = self.model._default_manager.all()
+        if self.select:
+            queryset = queryset.select_related(*_leaves(self.select))
+        if self.annotations:
+            queryset = queryset.annotate(**self.get_annotations())
+        if only:
+            queryset = queryset.only(*self.columns)
+        return queryset
+
+
+class QueryPlan(object):
+    """
+    The query plan of a serializer projection: the root query with its select_related lookups and columns, the
+    prefetched relations by their lookup path (parents before their children) and the lookups of the primary key
+    lists of the serializer.
+    """
+
+    def __init__(self, model, projected=False):
+        self.root = QueryPart(model, projected=projected)
+        self.prefetch = OrderedDict()
+        self.pk_lists = []
+
+    @property
+    def select(self):
+        return _leaves(self.root.select)
+
+    @property
+    def columns(self):
+        return self.root.columns
+
+    def get_prefetches(self, exclude=None):
+        """
+        Returns the prefetch_related lookups, as Prefetch objects if a relation needs its own queryset (i.g. with
+        select_related or .only()). The lookups in exclude are skipped.
+        """
+        result = []
+        for path, part in self.prefetch.items():
+            if exclude and path in exclude:
+                continue
+            queryset = part.get_queryset() if part is not None else None
+            if queryset is None or Prefetch is None:
+                result.append(path)
+            else:
+                result.append(Prefetch(path, queryset=queryset))
+        return result
+
+
+def _collect(plan, part, serializer_cls, model, fields, exclude, path_prefix, column_prefix, parents):
+    serializer = serializer_cls(fields=fields, exclude=exclude)
+    relations = get_model_relations(model)
+    columns = get_model_columns(model)
+    part.add_column(column_prefix + model._meta.pk.name)
+    for name, field in serializer.fields.items():
+        attribute = field.map_field or name
+        if isinstance(field, PrimaryKeyListField):
+            if not path_prefix:
+                plan.pk_lists.append(field.lookup)
+            else:
+                _collect_nested_pk_list(plan, relations, field, attribute, path_prefix)
+            continue
+        if isinstance(field, AggregateField):
+            # A joined model can not be annotated, its aggregates are queried per object.
+            if not column_prefix:
+                part.annotations[name] = field
+            continue
+        if not isinstance(field, SerializerObjectField):
+            if isinstance(field, TypeField):
+                continue
+            if attribute in columns:
+                part.add_column(column_prefix + columns[attribute])
+            elif name in columns:
+                part.add_column(column_prefix + columns[name])
+            else:
+                part.invalidate_columns()
+            continue
+        relation = relations.get(attribute, None) or relations.get(name, None)
+        if relation is None:
+            part.invalidate_columns()
+            continue
+        lookup, many, related_model, reverse, remote_field = relation
+        path = path_prefix + lookup
+        only_fields, nested_exclude = serializer.get_fields_and_exclude_for_nested(name)
+        nested_fields = list(field.only_fields) + list(only_fields or [])
+        nested_exclude = list(field.exclude) + list(nested_exclude or [])
+        if many:
+            if related_model is None:
+                plan.prefetch[path] = None
+                continue
+            nested_part = QueryPart(related_model, projected=bool(nested_fields or nested_exclude))
+            if remote_field is not None:
+                # The foreign key to the parents is needed to assign the prefetched objects.
+                nested_part.add_column(remote_field)
+            plan.prefetch[path] = nested_part
+            nested_column_prefix = ''
+        else:
+            part.select.append(column_prefix + lookup)
+            if reverse:
+                # The columns of a joined reverse relation are loaded completely.
+                part.invalidate_columns()
+            else:
+                part.add_column(column_prefix + lookup)
+            nested_part = part
+            nested_column_prefix = column_prefix + lookup + '__'
+        nested_cls = field.get_serializer_cls()
+        if nested_cls is None or nested_cls in parents:
+            nested_part.invalidate_columns()
+            continue
+        _collect(plan, nested_part, nested_cls, related_model, nested_fields or None, nested_exclude or None,
+                 path + '__', nested_column_prefix, parents + (nested_cls,))
+
+
+def _collect_nested_pk_list(plan, relations, field, attribute, path_prefix):
+    # The primary key lists of a nested serializer are prefetched for all its objects with one query, which reads
+    # only the primary keys (and the foreign key to the parents).
+    relation = relations.get(attribute, None) or relations.get(field.lookup, None)
+    if relation is None:
+        return
+    lookup, many, related_model, reverse, remote_field = relation
+    if related_model is None:
+        return
+    pk_part = QueryPart(related_model, projected=True)
+    pk_part.add_column(related_model._meta.pk.name)
+    if remote_field is not None:
+        pk_part.add_column(remote_field)
+    plan.prefetch.setdefault(path_prefix + lookup, pk_part)
+
+
+def _leaves(paths):
+    return [path for path in paths if not any(other.startswith(path + '__') for other in paths)]
+
+
+def _get_plan_key(serializer_cls, model, fields, exclude):
+    return serializer_cls, model, tuple(fields or ()), tuple(exclude or ())
+
+
+def get_plan(serializer_cls, model, fields=None, exclude=None):
+    """
+    Returns the memoized QueryPlan of the serializer class and the fields/exclude projection for the model.
+    """
+    try:
+        key = _get_plan_key(serializer_cls, model, fields, exclude)
+        plan = _plans_cache.get(key, None)
+    except TypeError:
+        key = None
+        plan = None
+    if plan is not None:
+        return plan
+    plan = QueryPlan(model, projected=bool(fields or exclude))
+    _collect(plan, plan.root, serializer_cls, model, fields, exclude, '', '', (serializer_cls,))
+    if key is not None:
+        with _plans_lock:
+            if len(_plans_cache) >= MAX_PLANS:
+                _plans_cache.clear()
+            _plans_cache[key] = plan
+    return plan
+
+
+def get_query_plan(serializer_cls, model, fields=None, exclude=None):
+    """
+    Returns the select_related and the prefetch_related lookups for the relations of the model, which are
+    serialized by the serializer class with the fields/exclude projection.
+    Forward relations are joined, relations to a list of objects and everything below them are prefetched.
+    """
+    plan = get_plan(serializer_cls, model, fields=fields, exclude=exclude)
+    return plan.select, _leaves(list(plan.prefetch))
+
+
+def get_only_fields(serializer_cls, model, fields=None, exclude=None, extra_fields=None):
+    """
+    Returns the lookups of the model columns, which are read by the serializer class with the fields/exclude
+    projection, or None if they are not known. The forward relations are included with their columns.
+    """
+    plan = get_plan(serializer_cls, model, fields=fields, exclude=exclude)
+    if plan.columns is None:
+        return None
+    columns = list(plan.columns)
+    for lookup in extra_fields or []:
+        if '__' in lookup:
+            return None
+        if lookup not in columns and lookup not in plan.root.annotations:
+            columns.append(lookup)
+    return columns
+
+
+def optimize_queryset(serializer_cls, queryset, fields=None, exclude=None, extra_fields=None):
+    """
+    Applies the select_related and prefetch_related lookups and the aggregate annotations of the plan. With a
+    fields/exclude projection only the columns read by the serializer (and the extra fields, i.g. of the sort)
+    are fetched by .only().
+    """
+    plan = get_plan(serializer_cls, queryset.model, fields=fields, exclude=exclude)
+    if plan.select:
+        queryset = queryset.select_related(*plan.select)
+    if plan.root.annotations:
+        queryset = queryset.annotate(**plan.root.get_annotations())
+    # A lookup which is already prefetched by the queryset is kept.
+    prefetched = [getattr(lookup, 'prefetch_to', lookup) for lookup in queryset._prefetch_related_lookups]
+    prefetches = plan.get_prefetches(exclude=prefetched)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if fields or exclude:
+        only_fields = get_only_fields(serializer_cls, queryset.model, fields=fields, exclude=exclude,
+                                      extra_fields=extra_fields)
+        if only_fields is not None:
+            queryset = queryset.only(*only_fields)
+    return queryset
+
+
+def get_values_lookups(serializer_cls, model, fields=None, exclude=None, extra_fields=None):
+    """
+    Returns the lookups for .values(), if the serializer class reads only columns of the model and of its
+    forward relations. Otherwise (i.g. for relations to a list of objects) None is returned.
+    """
+    plan = get_plan(serializer_cls, model, fields=fields, exclude=exclude)
+    if plan.prefetch:
+        return None
+    lookups = get_only_fields(serializer_cls, model, fields=fields, exclude=exclude, extra_fields=extra_fields)
+    if lookups is None:
+        return None
+    return lookups + [name for name in plan.root.annotations if name not in lookups]
+
+
+def get_annotations(serializer_cls, model, fields=None, exclude=None):
+    """
+    Returns the dictionary of the aggregate annotations of the serializer class for the model.
+    """
+    return get_plan(serializer_cls, model, fields=fields, exclude=exclude).root.get_annotations()
+
+
+def load_pk_lists(queryset, objects, lookups):
+    """
+    Loads the primary key lists of the relations for a page of objects (model instances or rows of .values())
+    with one query per relation. Returns the objects as list.
+    """
+    objects = list(objects)
+    if not objects or not lookups:
+        return objects
+    pk_name = queryset.model._meta.pk.name
+    pks = [obj[pk_name] if isinstance(obj, dict) else obj.pk for obj in objects]
+    manager = queryset.model._default_manager.using(queryset.db)
+    for lookup in lookups:
+        pk_lists = dict((pk, []) for pk in pks)
+        for pk, related_pk in manager.filter(pk__in=pks).order_by(lookup).values_list('pk', lookup):
+            if related_pk is not None:
+                pk_lists[pk].append(related_pk)
+        for pk, obj in zip(pks, objects):
+            if isinstance(obj, dict):
+                obj[lookup] = pk_lists[pk]
+            else:
+                obj.__dict__.setdefault(PK_LISTS_CACHE_NAME, {})[lookup] = pk_lists[pk]
+    return objects
+
+
+def iterate_prefetched(queryset, chunk_size=100):
+    """
+    Iterates over the queryset by QuerySet.iterator() and runs its prefetch_related lookups per chunk of objects,
+    since iterator() ignores them. The objects are not cached by the queryset.
+    """
+    lookups = list(queryset._prefetch_related_lookups)
+    chunk = []
+    for obj in queryset.iterator():
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            _prefetch_chunk(chunk, lookups)
+            for item in chunk:
+                yield item
+            chunk = []
+    if chunk:
+        _prefetch_chunk(chunk, lookups)
+        for item in chunk:
+            yield item
+
+
+def _prefetch_chunk(objects, lookups):
+    if django_utils.django_version >= (1, 10, 0):
+        prefetch_related_objects(objects, *lookups)
+    else:
+        prefetch_related_objects(objects, lookups)
+
+
+def nest_values(values):
+    """
+    Returns the nested dictionary of a .values() row, i.g. {'relation': 1, 'relation__name': 'One'} ->
+    {'relation': {'name': 'One'}}. A relation with a NULL foreign key is None.
+    """
+    relations = set()
+    for key in values:
+        parts = key.split('__')
+        for i in range(1, len(parts)):
+            relations.add('__'.join(parts[:i]))
+    result = {}
+    for key in sorted(values, key=lambda item: item.count('__')):
+        parts = key.split('__')
+        target = result
+        for part in parts[:-1]:
+            target = target.get(part, None)
+            if target is None:
+                break
+        else:
+            if key in relations:
+                target[parts[-1]] = {} if values[key] is not None else None
+            else:
+                target[parts[-1]] = values[key]
+    return result
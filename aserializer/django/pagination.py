@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from aserializer.utils.cursors import parse_order_by
+
+try:
+    from django.db.models import Q, Model
+except ImportError:
+    Q = None
+    Model = None
+
+
+def get_keyset_value(obj, lookup):
+    if isinstance(obj, dict):
+        # A row of .values()
+        return obj.get(lookup, None)
+    for name in lookup.split('__'):
+        if obj is None:
+            return None
+        obj = getattr(obj, name)
+    if isinstance(obj, Model):
+        return obj.pk
+    return obj
+
+
+def get_keyset_values(obj, order_by):
+    """
+    Returns the cursor values of an object for the order_by arguments.
+    """
+    return [get_keyset_value(obj, lookup) for lookup, descending in parse_order_by(order_by)]
+
+
+def get_keyset_filter(order_by, values, backwards=False, nulls_largest=False):
+    """
+    Returns the Q object for the rows after the cursor values (before them, if backwards), i.g. for
+    ['-number', 'pk']: number < n OR (number = n AND pk > p).
+    The NULL values are ordered like the database does: as the largest values with nulls_largest (i.g. PostgreSQL,
+    see connection.features.nulls_order_largest), otherwise as the smallest values (i.g. sqlite, MySQL).
+    """
+    q = None
+    previous = Q()
+    for (lookup, descending), value in zip(parse_order_by(order_by), values):
+        reverse = descending != backwards
+        nulls_last = nulls_largest != reverse
+        if value is not None:
+            condition = Q(**{'{}__{}'.format(lookup, 'lt' if reverse else 'gt'): value})
+            if nulls_last:
+                condition |= Q(**{'{}__isnull'.format(lookup): True})
+        elif nulls_last:
+            condition = None
+        else:
+            condition = Q(**{'{}__isnull'.format(lookup): False})
+        if condition is not None:
+            condition = previous & condition
+            q = condition if q is None else q | condition
+        if value is not None:
+            previous &= Q(**{lookup: value})
+        else:
+            previous &= Q(**{'{}__isnull'.format(lookup): True})
+    if q is None:
+        return Q(pk__in=[])
+    return q
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from aserializer.utils.parsers import Parser
+from aserializer.django import utils as django_utils
+
+try:
+    from django.db.models import Model
+except ImportError:
+    Model = None
+
+
+class ModelAttributes(object):
+    """
+    The attribute names of a model class: the field names and the names of the class attributes (i.g. the
+    descriptors of the relations and properties).
+    """
+
+    def __init__(self, model):
+        self.fields = []
+        for field in django_utils.get_local_fields(model) + django_utils.get_relation_fields(model):
+            if django_utils.is_reverse_relation_field(field):
+                self.fields.append(field.get_accessor_name())
+            else:
+                self.fields.append(field.name)
+        self.attnames = dict((field.name, field.attname) for field in model._meta.concrete_fields)
+        self.names = set(name for name in dir(model) if not name.startswith('__'))
+        self.names.update(self.fields)
+        self.names.update(self.attnames.values())
+
+
+_model_attributes = {}
+_model_attributes_lock = threading.Lock()
+
+
+def get_model_attributes(model):
+    attributes = _model_attributes.get(model, None)
+    if attributes is None:
+        attributes = ModelAttributes(model)
+        with _model_attributes_lock:
+            _model_attributes[model] = attributes
+    return attributes
+
+
+class DjangoModelParser(Parser):
+    """
+    A parser for django model instances, which finds the attribute names in the model _meta (cached per model)
+    instead of dir() and getattr() on the instance. So no deferred field and no relation is loaded to find the
+    attributes, only the values of the serializer fields are read. Other sources are handled by the Parser.
+    """
+    _model_attributes = None
+
+    def initial(self, source):
+        super(DjangoModelParser, self).initial(source)
+        self._all_attributes_names = None
+        self._model_attributes = None
+        if Model is not None and isinstance(self.obj, Model):
+            self._model_attributes = get_model_attributes(self.obj.__class__)
+
+    def get_instance_names(self):
+        # Annotations and other values set on the instance.
+        return [name for name in self.obj.__dict__ if not name.startswith('_')]
+
+    def get_attribute_names(self, with_filter=False):
+        if self._model_attributes is None:
+            return super(DjangoModelParser, self).get_attribute_names(with_filter=with_filter)
+        if with_filter:
+            instance_names = self.obj.__dict__
+            return [name for name in self.field_list
+                    if name in self._model_attributes.names or name in instance_names]
+        deferred = self.get_deferred_fields()
+        attnames = self._model_attributes.attnames
+        names = [name for name in self._model_attributes.fields if attnames.get(name, name) not in deferred]
+        return names + [name for name in self.get_instance_names()
+                        if name not in self._model_attributes.names]
+
+    def get_deferred_fields(self):
+        get_deferred_fields = getattr(self.obj, 'get_deferred_fields', None)
+        if get_deferred_fields is not None:
+            return get_deferred_fields()
+        # Django 1.7: the instance of a deferred model class has no values of the deferred fields.
+        if getattr(self.obj, '_deferred', False):
+            return set(field.attname for field in self.obj._meta.concrete_fields
+                       if field.attname not in self.obj.__dict__)
+        return set()
+
+    def has_attribute(self, name):
+        if self._model_attributes is None:
+            return super(DjangoModelParser, self).has_attribute(name)
+        return name in self._model_attributes.names or name in self.obj.__dict__
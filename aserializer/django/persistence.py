@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+from aserializer.utils import py2to3
+from aserializer.base import Serializer
+from aserializer.fields.validators import validation_batch
+from aserializer.django import utils as django_utils
+
+try:
+    from django.db import connections, router, transaction, DatabaseError
+    from django.db.models import Model
+except ImportError:
+    connections = router = transaction = Model = None
+    DatabaseError = Exception
+
+try:
+    # Conditional expressions exist since Django 1.8.
+    from django.db.models import Case, When, Value
+except ImportError:
+    Case = When = Value = None
+
+
+class SaveManyResult(object):
+    """
+    The result of save_many: the saved model instances in the order of the items (None for an invalid or a failed
+    item), the errors by the index of the item and the indexes of the created and the updated items.
+    If the database does not return the primary keys of bulk_create (i.g. sqlite before Django 4.0), a created
+    instance without many-to-many relations has no primary key.
+    """
+
+    def __init__(self, count):
+        self.objects = [None] * count
+        self.errors = {}
+        self.created = []
+        self.updated = []
+
+    def is_valid(self):
+        return not self.errors
+
+
+class SaveEntry(object):
+
+    def __init__(self, index, instance, update_fields, many_to_many):
+        self.index = index
+        self.instance = instance
+        self.update_fields = update_fields
+        self.many_to_many = many_to_many
+
+
+def _get_pk(value):
+    if isinstance(value, dict):
+        return value.get('pk', value.get('id', None))
+    if Model is not None and isinstance(value, Model):
+        return value.pk
+    return value
+
+
+def get_model_values(model, data):
+    """
+    Returns the values of the concrete model fields by attname and the primary key lists of the many-to-many
+    relations of a to_dict() result. A relation is given by its primary key or by a dictionary with the
+    primary key (i.g. of a nested serializer).
+    """
+    values = {}
+    for field in model._meta.concrete_fields:
+        if field.attname in data:
+            values[field.attname] = data[field.attname]
+        elif field.name in data:
+            value = data[field.name]
+            if django_utils.is_relation_field(field):
+                value = _get_pk(value)
+            values[field.attname] = value
+    many_to_many = {}
+    for field in model._meta.many_to_many:
+        if data.get(field.name, None) is not None:
+            many_to_many[field.name] = [_get_pk(item) for item in data[field.name]]
+    return values, many_to_many
+
+
+def _get_batches(items, batch_size):
+    if not batch_size:
+        return [items] if items else []
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def _can_return_pks(connection):
+    features = connection.features
+    return getattr(features, 'can_return_rows_from_bulk_insert',
+                   getattr(features, 'can_return_ids_from_bulk_insert', False))
+
+
+def set_many_to_many(model, entries, using):
+    """
+    Replaces the many-to-many relations of the saved entries with one delete and one insert per relation.
+    """
+    for field in model._meta.many_to_many:
+        entries_with_field = [entry for entry in entries if field.name in entry.many_to_many]
+        if not entries_with_field:
+            continue
+        through = getattr(field, 'remote_field', None) or field.rel
+        through = through.through
+        source = through._meta.get_field(field.m2m_field_name()).attname
+        target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+        pks = [entry.instance.pk for entry in entries_with_field]
+        through._default_manager.using(using).filter(**{'{}__in'.format(source): pks}).delete()
+        rows = []
+        for entry in entries_with_field:
+            for related_pk in entry.many_to_many[field.name]:
+                rows.append(through(**{source: entry.instance.pk, target: related_pk}))
+        through._default_manager.using(using).bulk_create(rows)
+
+
+def bulk_update(model, instances, field_names, using):
+    """
+    Updates the fields of the instances with one UPDATE. Django versions without QuerySet.bulk_update get a
+    CASE WHEN expression per field. Django versions without conditional expressions (1.7) save the instances
+    one by one.
+    """
+    manager = model._default_manager.using(using)
+    if hasattr(manager, 'bulk_update'):
+        manager.bulk_update(instances, field_names)
+        return
+    if Case is None:
+        for instance in instances:
+            instance.save(update_fields=field_names, using=using)
+        return
+    updates = {}
+    for name in field_names:
+        field = model._meta.get_field(name)
+        whens = [When(pk=instance.pk, then=Value(getattr(instance, field.attname), output_field=field))
+                 for instance in instances]
+        updates[name] = Case(*whens, output_field=field)
+    manager.filter(pk__in=[instance.pk for instance in instances]).update(**updates)
+
+
+def _save_batch(result, batch, bulk, single, using):
+    """
+    Saves a batch in one transaction. If the batch fails, the items are saved one by one, so the error is reported
+    for the failed items only.
+    """
+    try:
+        with transaction.atomic(using=using):
+            bulk(batch)
+    except DatabaseError as e:
+        if len(batch) == 1:
+            result.errors[batch[0].index] = py2to3._unicode(e)
+            return []
+        saved = []
+        for entry in batch:
+            try:
+                with transaction.atomic(using=using):
+                    single(entry)
+            except DatabaseError as e:
+                result.errors[entry.index] = py2to3._unicode(e)
+            else:
+                saved.append(entry)
+    else:
+        saved = batch
+    for entry in saved:
+        result.objects[entry.index] = entry.instance
+    return saved
+
+
+def save_many(serializer_cls, items, batch_size=None, using=None):
+    """
+    Validates the items (serializer instances or payloads for the serializer class) and saves the valid ones
+    with bulk_create and bulk_update in batches of batch_size. An item with the primary key of an existing row is
+    updated (all fields of its to_dict()), the other items are created. Forward relations are saved by their
+    primary key, many-to-many relations are replaced by the given primary key lists. A new item with many-to-many
+    relations is saved with save(), if the database does not return the primary keys of bulk_create.
+    Returns a SaveManyResult with the validation and the database errors by the index of the item.
+    """
+    model = serializer_cls._meta.model
+    result = SaveManyResult(len(items))
+    pk_attname = model._meta.pk.attname
+    serializers = [item if isinstance(item, Serializer) else serializer_cls(item) for item in items]
+    entries = []
+    # The batch validators (i.g. ModelExistsValidator) check the values of all items together.
+    with validation_batch(serializers):
+        for index, serializer in enumerate(serializers):
+            if not serializer.is_valid():
+                result.errors[index] = serializer.errors
+                continue
+            values, many_to_many = get_model_values(model, serializer.to_dict())
+            update_fields = tuple(field.name for field in model._meta.concrete_fields
+                                  if field.attname in values and field.attname != pk_attname)
+            entries.append(SaveEntry(index, model(**values), update_fields, many_to_many))
+    if not entries:
+        return result
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    manager = model._default_manager.using(using)
+
+    existing = set()
+    pks = [entry.instance.pk for entry in entries if entry.instance.pk is not None]
+    for batch in _get_batches(pks, batch_size or len(pks)):
+        existing.update(manager.filter(pk__in=batch).values_list('pk', flat=True))
+    creates = [entry for entry in entries if entry.instance.pk is None or entry.instance.pk not in existing]
+    updates = [entry for entry in entries if entry.instance.pk is not None and entry.instance.pk in existing]
+
+    def single_create(entry):
+        entry.instance.save(force_insert=True, using=using)
+        set_many_to_many(model, [entry], using)
+
+    def bulk_create(batch):
+        manager.bulk_create([entry.instance for entry in batch])
+        set_many_to_many(model, batch, using)
+
+    def save_each(batch):
+        for entry in batch:
+            single_create(entry)
+
+    if not _can_return_pks(connection):
+        # Without the primary keys of bulk_create the many-to-many relations can not be set.
+        for entry in [entry for entry in creates if entry.many_to_many and entry.instance.pk is None]:
+            creates.remove(entry)
+            saved = _save_batch(result, [entry], save_each, single_create, using)
+            result.created.extend(entry.index for entry in saved)
+    for batch in _get_batches(creates, batch_size):
+        saved = _save_batch(result, batch, bulk_create, single_create, using)
+        result.created.extend(entry.index for entry in saved)
+
+    def single_update(entry):
+        if entry.update_fields:
+            entry.instance.save(update_fields=entry.update_fields, using=using)
+        set_many_to_many(model, [entry], using)
+
+    groups = {}
+    for entry in updates:
+        groups.setdefault(entry.update_fields, []).append(entry)
+    for update_fields, group in groups.items():
+        def bulk(batch):
+            if update_fields:
+                bulk_update(model, [entry.instance for entry in batch], update_fields, using)
+            set_many_to_many(model, batch, using)
+        for batch in _get_batches(group, batch_size):
+            saved = _save_batch(result, batch, bulk, single_update, using)
+            result.updated.extend(entry.index for entry in saved)
+    result.created.sort()
+    result.updated.sort()
+    return result
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import logging
+from collections import OrderedDict
+
+from aserializer.utils import tracking
+
+try:
+    from django.db import connections, DEFAULT_DB_ALIAS
+except ImportError:
+    connections = None
+    DEFAULT_DB_ALIAS = 'default'
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+
+    def __init__(self, message, budget=None):
+        super(QueryBudgetExceeded, self).__init__(message)
+        self.budget = budget
+
+
+class RecordingCursor(object):
+    """
+    A cursor proxy, which records the executed statements. Used for django versions without execute_wrapper.
+    """
+
+    def __init__(self, cursor, record):
+        self.cursor = cursor
+        self.record = record
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, sql, params=None):
+        self.record(sql)
+        return self.cursor.execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self.record(sql)
+        return self.cursor.executemany(sql, param_list)
+
+
+def get_debug_cursor_attribute(connection):
+    # Django 1.8 renamed use_debug_cursor to force_debug_cursor.
+    if hasattr(connection, 'force_debug_cursor'):
+        return 'force_debug_cursor'
+    return 'use_debug_cursor'
+
+
+class query_budget(object):
+    """
+    A context manager and decorator, which counts the SQL statements executed in the block (i.g. a serializer or
+    collection dump) per serializer field path, i.g. 'orders.items.product'. The statements outside of a field
+    (i.g. the page and count queries of a collection) have the empty path.
+    If more than max_queries statements are executed, QueryBudgetExceeded is raised or, with
+    raise_exception=False, a warning is logged. Without max_queries the statements are only counted.
+    The relations are read, when a serializer is created (by initial), not by dump(). A collection creates the
+    serializers of its items in dump(), so a budget of dump() counts them, but a budget of a single serializer
+    has to wrap its creation as well.
+
+        with query_budget(max_queries=3) as budget:
+            OrderCollectionSerializer(Order.objects.all()).dump()
+        budget.by_path()  # {'': 2, 'items': 1}
+    """
+
+    def __init__(self, max_queries=None, using=None, raise_exception=True):
+        self.max_queries = max_queries
+        self.using = using or DEFAULT_DB_ALIAS
+        self.raise_exception = raise_exception
+        self.queries = []
+        self._wrapper = None
+        self._debug_cursor_state = None
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with query_budget(max_queries=self.max_queries, using=self.using,
+                              raise_exception=self.raise_exception):
+                return func(*args, **kwargs)
+        return wrapper
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def record(self, sql):
+        self.queries.append((tracking.get_field_path(), sql))
+
+    def _execute(self, execute, sql, params, many, context):
+        self.record(sql)
+        return execute(sql, params, many, context)
+
+    def _make_debug_cursor(self, make_debug_cursor):
+        def make_cursor(cursor):
+            return RecordingCursor(make_debug_cursor(cursor), self.record)
+        return make_cursor
+
+    def has_execute_wrapper(self, connection):
+        return hasattr(connection, 'execute_wrapper')
+
+    def __enter__(self):
+        self.queries = []
+        connection = connections[self.using]
+        tracking.start_tracking()
+        if self.has_execute_wrapper(connection):
+            self._wrapper = connection.execute_wrapper(self._execute)
+            self._wrapper.__enter__()
+        else:
+            # The cursors are wrapped by make_debug_cursor, if the queries are logged.
+            attribute = get_debug_cursor_attribute(connection)
+            self._debug_cursor_state = (attribute, getattr(connection, attribute),
+                                        connection.__dict__.get('make_debug_cursor'))
+            setattr(connection, attribute, True)
+            connection.make_debug_cursor = self._make_debug_cursor(connection.make_debug_cursor)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        connection = connections[self.using]
+        if self._wrapper is not None:
+            self._wrapper.__exit__(exc_type, exc_value, traceback)
+            self._wrapper = None
+        else:
+            attribute, debug_cursor, make_debug_cursor = self._debug_cursor_state
+            setattr(connection, attribute, debug_cursor)
+            if make_debug_cursor is None:
+                del connection.make_debug_cursor
+            else:
+                connection.make_debug_cursor = make_debug_cursor
+        tracking.stop_tracking()
+        if exc_type is None and self.max_queries is not None and self.count > self.max_queries:
+            message = '{} queries executed, {} allowed\n{}'.format(self.count, self.max_queries, self.report())
+            if self.raise_exception:
+                raise QueryBudgetExceeded(message, budget=self)
+            logger.warning(message)
+
+    def by_path(self):
+        """
+        Returns an ordered dictionary of the field paths to the number of statements.
+        """
+        result = OrderedDict()
+        for path, sql in self.queries:
+            result[path] = result.get(path, 0) + 1
+        return result
+
+    def report(self):
+        lines = []
+        for path, count in self.by_path().items():
+            lines.append('{}: {}'.format(path or '(root)', count))
+        return '\n'.join(lines)
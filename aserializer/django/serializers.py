@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 import inspect
+import threading
+from collections import namedtuple
 
-from aserializer.utils import py2to3, options
+from aserializer.utils import py2to3, options, registry
 from aserializer.base import Serializer, SerializerBase
 from aserializer import fields as serializer_fields
 from aserializer.django import utils as django_utils
-from aserializer.django.fields import RelatedManagerListSerializerField
+from aserializer.django.parsers import DjangoModelParser
+from aserializer.django.persistence import save_many
+from aserializer.django.fields import (RelatedManagerListSerializerField, PrimaryKeyRelatedField, PrimaryKeyListField,
+                                      AggregateField)
 
 try:
     from django.db import models as django_models
@@ -36,10 +41,60 @@ except ImportError:
     MODEL_FIELD_MAPPING = {}
 
 
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        return id(value)
+    return value
+
+
+class LazyNestedModelSerializer(registry.LazySerializer):
+    """
+    A nested model serializer class, which is created on first use instead of at the definition of the parent
+    serializer. The classes are memoized by the model, the chain of parent models and the field kwargs, so the
+    same relation of different serializers shares one class.
+    """
+    _classes = {}
+    _lock = threading.RLock()
+
+    def __init__(self, metaclass, model, parent_manager, field_kwargs, relations=None, exclude_relations=None):
+        self.metaclass = metaclass
+        self.model = model
+        self.parent_manager = parent_manager
+        self.field_kwargs = field_kwargs
+        self.relations = relations
+        self.exclude_relations = exclude_relations
+        self.key = (metaclass, model, tuple(parent_manager.parents), parent_manager.max_depth, _freeze(field_kwargs),
+                    _freeze(relations), _freeze(exclude_relations))
+
+    def resolve(self):
+        serializer_cls = self._classes.get(self.key, None)
+        if serializer_cls is None:
+            with self._lock:
+                serializer_cls = self._classes.get(self.key, None)
+                if serializer_cls is None:
+                    serializer_cls = self.metaclass.get_nested_serializer_class(
+                        self.model, self.parent_manager, relations=self.relations,
+                        exclude_relations=self.exclude_relations, **self.field_kwargs)
+                    self._classes[self.key] = serializer_cls
+        return serializer_cls
+
+    def __repr__(self):
+        return 'LazyNestedModelSerializer({})'.format(self.model.__name__)
+
+
 class DjangoModelSerializerBase(SerializerBase):
 
     def __new__(cls, name, bases, attrs):
+        meta = attrs.get('Meta', None)
         new_class = super(DjangoModelSerializerBase, cls).__new__(cls, name, bases, attrs)
+        if not hasattr(meta, 'parser'):
+            new_class._meta.parser = DjangoModelParser
         cls.set_fields_from_model(new_class=new_class,
                                   fields=new_class._base_fields,
                                   meta=new_class._meta)
@@ -63,6 +118,9 @@ class DjangoModelSerializerBase(SerializerBase):
         if django_models is None or meta.model is None:
             return
         meta.parents.handle(meta.model)
+        for field in fields.values():
+            if isinstance(field, AggregateField) and field.model is None:
+                field.model = meta.model
         all_field_names = cls.get_all_fieldnames(fields)
         for model_field in django_utils.get_local_fields(meta.model):
             if model_field.name not in all_field_names:
@@ -91,14 +149,26 @@ class DjangoModelSerializerBase(SerializerBase):
         return None
 
     @staticmethod
-    def get_nested_serializer_class(model_field, parent_manager=None, **field_arguments):
+    def get_nested_serializer_class(model_field, parent_manager=None, relations=None, exclude_relations=None,
+                                    **field_arguments):
+        nested_relations = relations
+        nested_exclude_relations = exclude_relations
+
         class NestedModelSerializer(NestedDjangoModelSerializer):
             class Meta:
                 model = model_field
                 parents = parent_manager
                 field_kwargs = field_arguments
+                relations = nested_relations
+                exclude_relations = nested_exclude_relations
         return NestedModelSerializer
 
+    @classmethod
+    def get_lazy_nested_serializer_class(cls, model_field, parent_manager=None, relations=None,
+                                         exclude_relations=None, **field_arguments):
+        return LazyNestedModelSerializer(cls, model_field, parent_manager, field_arguments, relations=relations,
+                                         exclude_relations=exclude_relations)
+
     @classmethod
     def get_field_from_modelfield(cls, model_field, meta=None, **kwargs):
         field_class = cls.get_field_class(model_field)
@@ -133,9 +203,43 @@ class DjangoModelSerializerBase(SerializerBase):
             fields[model_field.name] = _field
         return _field
 
+    @classmethod
+    def get_pk_field(cls, model):
+        field_class = cls.get_field_class(model._meta.pk)
+        return field_class(required=False) if field_class else None
+
+    @classmethod
+    def add_pk_relation_model_field(cls, fields, field_name, model_field, meta, **kwargs):
+        """
+        Adds the field of a relation represented by primary keys. A forward relation reads the foreign key column,
+        a many-to-many or reverse relation is a list of primary keys.
+        """
+        rel_django_model = django_utils.get_related_model_from_field(model_field)
+        pk_field = cls.get_pk_field(rel_django_model)
+        if django_utils.is_reverse_relation_field(model_field):
+            if django_utils.is_reverse_one2one_relation_field(model_field):
+                _field = PrimaryKeyRelatedField(pk_field=pk_field, required=False, **kwargs)
+            else:
+                _field = PrimaryKeyListField(lookup=model_field.field.related_query_name(), pk_field=pk_field,
+                                             **kwargs)
+        elif isinstance(model_field, django_models.ManyToManyField):
+            _field = PrimaryKeyListField(lookup=model_field.name, pk_field=pk_field, **kwargs)
+        else:
+            if model_field.null or model_field.blank:
+                kwargs['required'] = False
+            _field = PrimaryKeyRelatedField(pk_field=pk_field, map_field=model_field.attname, **kwargs)
+        _field.add_name(field_name)
+        fields[field_name] = _field
+        return _field
+
     @classmethod
     def add_relation_model_field(cls, fields, model_field, meta, **kwargs):
+        if django_utils.is_relation_field(model_field) and meta.is_pk_relation(model_field.name):
+            kwargs = meta.field_arguments.parse(model_field.name, **kwargs)
+            return cls.add_pk_relation_model_field(fields, model_field.name, model_field, meta, **kwargs)
         if django_utils.is_relation_field(model_field):
+            if not meta.is_relation_included(model_field.name):
+                return None
             relation_parents_manager = meta.parents.get_working_copy()
             rel_django_model = django_utils.get_related_model_from_field(model_field)
             if not relation_parents_manager.handle(rel_django_model):
@@ -147,9 +251,12 @@ class DjangoModelSerializerBase(SerializerBase):
             if model_field.null or model_field.blank:
                 kwargs['required'] = False
             field_kwargs = meta.field_arguments.get_nested_field_kwargs(model_field.name)
-            serializer_cls = cls.get_nested_serializer_class(rel_django_model,
-                                                             relation_parents_manager,
-                                                             **field_kwargs)
+            relations, exclude_relations = meta.get_nested_relations(model_field.name)
+            serializer_cls = cls.get_lazy_nested_serializer_class(rel_django_model,
+                                                                  relation_parents_manager,
+                                                                  relations=relations,
+                                                                  exclude_relations=exclude_relations,
+                                                                  **field_kwargs)
             if isinstance(model_field, django_models.ManyToManyField):
                 field_class = RelatedManagerListSerializerField
             else:
@@ -165,14 +272,22 @@ class DjangoModelSerializerBase(SerializerBase):
     def add_reverse_relation_model_field(cls, fields, model_field, meta, **kwargs):
         if django_utils.is_reverse_relation_field(model_field):
             field_name = django_utils.get_reverse_related_name_from_field(model_field)
+            if meta.is_pk_relation(field_name):
+                kwargs = meta.field_arguments.parse(field_name, **kwargs)
+                return cls.add_pk_relation_model_field(fields, field_name, model_field, meta, **kwargs)
+            if not meta.is_relation_included(field_name):
+                return None
             relation_parents_manager = meta.parents.get_working_copy()
             rel_django_model = django_utils.get_related_model_from_field(model_field)
             if not relation_parents_manager.handle(rel_django_model):
                 return None
             field_kwargs = meta.field_arguments.get_nested_field_kwargs(field_name)
-            serializer_cls = cls.get_nested_serializer_class(rel_django_model,
-                                                             relation_parents_manager,
-                                                             **field_kwargs)
+            relations, exclude_relations = meta.get_nested_relations(field_name)
+            serializer_cls = cls.get_lazy_nested_serializer_class(rel_django_model,
+                                                                  relation_parents_manager,
+                                                                  relations=relations,
+                                                                  exclude_relations=exclude_relations,
+                                                                  **field_kwargs)
             if django_utils.is_reverse_one2one_relation_field(model_field):
                 field_class = serializer_fields.SerializerField
             else:
@@ -185,9 +300,67 @@ class DjangoModelSerializerBase(SerializerBase):
         return None
 
 
+RelationInfo = namedtuple('RelationInfo', ['path', 'model', 'many', 'depth'])
+
+
+def get_relations(serializer_cls, prefix='', depth=1, parents=()):
+    """
+    Returns the RelationInfo list of the nested serializers of the serializer class, i.g. to review the relations
+    included by a model serializer. The nested serializer classes are resolved.
+    """
+    result = []
+    parents = parents + (serializer_cls,)
+    for name, field in serializer_cls._base_fields.items():
+        get_serializer_cls = getattr(field, 'get_serializer_cls', None)
+        if get_serializer_cls is None:
+            continue
+        nested_cls = get_serializer_cls()
+        if nested_cls is None:
+            continue
+        path = prefix + name
+        model = getattr(nested_cls._meta, 'model', None)
+        many = isinstance(field, serializer_fields.ListSerializerField)
+        result.append(RelationInfo(path, model, many, depth))
+        if nested_cls not in parents:
+            result.extend(get_relations(nested_cls, prefix=path + '.', depth=depth + 1, parents=parents))
+    return result
+
+
+def get_relations_report(serializer_cls):
+    """
+    Returns a text report of the relations included by the serializer class. A joined relation is fetched with
+    the row, a prefetched relation costs one query per page (with optimize_queryset) or one query per parent row.
+    """
+    relations = get_relations(serializer_cls)
+    lines = []
+    for relation in relations:
+        model_name = relation.model.__name__ if relation.model is not None else '-'
+        lines.append('{} ({}, {}, depth {})'.format(relation.path, model_name,
+                                                    'prefetched' if relation.many else 'joined', relation.depth))
+    prefetched = len([relation for relation in relations if relation.many])
+    lines.append('{} relations: {} joined, {} prefetched, max depth {}'.format(
+        len(relations), len(relations) - prefetched, prefetched, max([r.depth for r in relations] or [0])))
+    return '\n'.join(lines)
+
+
 class NestedDjangoModelSerializer(py2to3.with_metaclass(DjangoModelSerializerBase, Serializer)):
     with_registry = False
 
 
 class DjangoModelSerializer(py2to3.with_metaclass(DjangoModelSerializerBase, Serializer)):
-    pass
+
+    @classmethod
+    def save_many(cls, items, batch_size=None, using=None):
+        """
+        Validates and saves the items (serializer instances or payloads) with bulk_create/bulk_update.
+        Returns a SaveManyResult with the saved instances and the errors by the index of the item.
+        """
+        return save_many(cls, items, batch_size=batch_size, using=using)
+
+    @classmethod
+    def get_relations(cls):
+        return get_relations(cls)
+
+    @classmethod
+    def relations_report(cls):
+        return get_relations_report(cls)
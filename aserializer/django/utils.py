@@ -68,6 +68,18 @@ def get_reverse_related_fields(model):
                [f[0] for f in model._meta.get_all_related_objects_with_model()]
 
 
+def get_relation_fields(model):
+    """
+    Returns the forward and the reverse relation fields of the model.
+    """
+    if django_version >= (1, 8, 0):
+        return [f for f in model._meta.get_fields() if f.is_relation]
+    else:
+        return get_related_fields(model) + \
+            model._meta.get_all_related_objects() + \
+            model._meta.get_all_related_many_to_many_objects()
+
+
 def is_relation_field(field):
     if django_version >= (1, 8, 0):
         return field.is_relation
@@ -125,3 +137,41 @@ def get_django_model_field_list(model, parent_name=None, result=None):
                 get_django_model_field_list(get_related_model_from_field(field), item_name, result)
 
     return result
+
+
+def get_estimated_count(queryset):
+    """
+    Returns the number of rows of the model table from the database statistics, if the queryset is not
+    filtered, grouped, distinct or empty. Otherwise or if there are no statistics it returns None.
+    For sqlite the statistics of ANALYZE are used, else the highest rowid.
+    """
+    from django.db import connections
+    query = queryset.query
+    if query.where or query.distinct or query.low_mark or query.high_mark is not None:
+        return None
+    if query.group_by is not None or query.is_empty():
+        return None
+    if getattr(query, 'combinator', None):
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute('SELECT table_rows FROM information_schema.tables '
+                           'WHERE table_schema = DATABASE() AND table_name = %s', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone()[0]:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+                row = cursor.fetchone()
+                if row is not None:
+                    return int(row[0].split()[0])
+            cursor.execute('SELECT MAX(_ROWID_) FROM {}'.format(connection.ops.quote_name(table)))
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from aserializer.fields.validators import BatchValidator
+
+try:
+    from django.core.exceptions import ValidationError
+except ImportError:
+    ValidationError = ValueError
+
+
+class ModelExistsValidator(BatchValidator):
+    """
+    Validates that a model object with the value (i.g. a foreign key id of a payload) exists. In a
+    validation_batch the values are checked with one filter(<field>__in=...) query per model and field, otherwise
+    with one query per value. The queryset limits the objects (i.g. to the active ones).
+    """
+    message = 'Object %(value)s does not exist.'
+    error_code = 'does_not_exist'
+    chunk_size = 500
+
+    def __init__(self, model, field_name='pk', queryset=None, using=None):
+        self.model = model
+        self.field_name = field_name
+        self.queryset = queryset
+        self.using = using
+
+    def get_batch_key(self):
+        if self.queryset is not None:
+            return self
+        return self.model, self.field_name, self.using
+
+    def get_model_field(self):
+        if self.field_name == 'pk':
+            return self.model._meta.pk
+        return self.model._meta.get_field(self.field_name)
+
+    def get_queryset(self):
+        queryset = self.queryset if self.queryset is not None else self.model._default_manager.all()
+        if self.using is not None:
+            queryset = queryset.using(self.using)
+        return queryset
+
+    def normalize(self, value):
+        # The values of a payload are compared by the python type of the model field, i.g. '1' as 1.
+        try:
+            return self.get_model_field().to_python(value)
+        except (ValidationError, ValueError, TypeError):
+            return value
+
+    def check_values(self, values):
+        result = set()
+        values = list(values)
+        for i in range(0, len(values), self.chunk_size):
+            chunk = values[i:i + self.chunk_size]
+            try:
+                result.update(self.get_queryset().filter(**{'{}__in'.format(self.field_name): chunk})
+                              .values_list(self.field_name, flat=True))
+            except (ValidationError, ValueError, TypeError):
+                # A value of the wrong type does not exist, the other values are checked one by one.
+                for value in chunk:
+                    try:
+                        if self.get_queryset().filter(**{self.field_name: value}).exists():
+                            result.add(value)
+                    except (ValidationError, ValueError, TypeError):
+                        pass
+        return result
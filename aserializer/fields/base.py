@@ -80,6 +80,16 @@ class BaseSerializerField(object):
     def add_name(self, name):
         self.names = list(set(self.names + [name]))
 
+    def get_source_name(self, name, attributes):
+        """
+        Returns the name of the source attribute for the field value: the field name or the map_field.
+        """
+        if name in attributes:
+            return name
+        if self.map_field and self.map_field in attributes:
+            return self.map_field
+        return None
+
     def validate(self):
         if self.ignore:
             return
@@ -105,6 +115,14 @@ class BaseSerializerField(object):
     def set_value(self, value):
         self.value = value
 
+    def collect_batch_values(self, batch):
+        """
+        Adds the value to the validation batch for the batch validators of the field.
+        """
+        for validator in self._validators:
+            if isinstance(validator, v.BatchValidator):
+                batch.add(validator, self.value)
+
     def _to_python(self):
         raise NotImplemented()
 
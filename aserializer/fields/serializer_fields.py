@@ -4,22 +4,27 @@ from collections import Iterable
 
 from aserializer.utils import py2to3, registry
 from aserializer.fields.fields import BaseSerializerField, SerializerFieldValueError
+from aserializer.fields import validators as v
 
 
 class SerializerObjectField(BaseSerializerField):
 
     def __init__(self, fields=None, exclude=None, *args, **kwargs):
+        cache = kwargs.pop('cache', None)
         super(SerializerObjectField, self).__init__(*args, **kwargs)
         self.only_fields = fields or []
         self.exclude = exclude or []
         self.unknown_error = None
         self.extras = {}
         self._serializer_cls = None
+        self.cache = cache
 
     @staticmethod
     def normalize_serializer_cls(serializer_cls):
         if isinstance(serializer_cls, py2to3.string):
             serializer_cls = registry.get_serializer(serializer_cls)
+        elif isinstance(serializer_cls, registry.LazySerializer):
+            serializer_cls = serializer_cls.resolve()
         return serializer_cls
 
     def get_serializer_cls(self):
@@ -36,6 +41,14 @@ class SerializerObjectField(BaseSerializerField):
     def get_instance(self):
         return None
 
+    def dump_serializer(self, serializer, raw=None):
+        """
+        Returns the dump of a nested serializer. With a fragment cache the dump is shared by all parents.
+        """
+        if self.cache is None:
+            return serializer.dump()
+        return self.cache.dump(serializer, fields=self.only_fields, exclude=self.exclude, raw=raw)
+
     def __get__(self, instance, owner):
         if instance is None:
             return self
@@ -62,6 +75,10 @@ class SerializerField(SerializerObjectField):
         elif self.required:
             raise SerializerFieldValueError(self._error_messages['required'], field_names=self.names)
 
+    def collect_batch_values(self, batch):
+        if self._serializer:
+            self._serializer.collect_batch_values(batch)
+
     def set_value(self, value):
         if value is None:
             self._serializer = None
@@ -78,7 +95,7 @@ class SerializerField(SerializerObjectField):
 
     def _to_native(self):
         if self._serializer:
-            return self._serializer.dump()
+            return self.dump_serializer(self._serializer)
         return None
 
     def _to_python(self):
@@ -107,14 +124,20 @@ class ListSerializerField(SerializerObjectField):
     def validate(self):
         if self.items:
             _errors = []
-            for item in self.items:
-                if not item.is_valid():
-                    _errors.append(item.errors)
-            if _errors:
+            # The batch validators of the items check their values together. The errors have one entry per item,
+            # an empty one for a valid item.
+            with v.validation_batch(self.items):
+                for item in self.items:
+                    _errors.append({} if item.is_valid() else item.errors)
+            if any(_errors):
                 raise SerializerFieldValueError(_errors)
         elif self.required:
             raise SerializerFieldValueError(self._error_messages['required'], field_names=self.names)
 
+    def collect_batch_values(self, batch):
+        for item in self.items:
+            item.collect_batch_values(batch)
+
     def get_instance(self):
         return self.items
 
@@ -138,7 +161,8 @@ class ListSerializerField(SerializerObjectField):
     def _to_native(self):
         if not self._native_items:
             for item in self.items:
-                self._native_items.append(item.dump())
+                # Sorting needs the decoded items, so a raw fragment cache can not be used here.
+                self._native_items.append(self.dump_serializer(item, raw=False if self._sort_by else None))
             if self._sort_by:
                 self._native_items = sorted(self._native_items,
                                             key=lambda item: [item.get(k, None) for k in self._sort_by])
@@ -2,6 +2,7 @@
 import uuid
 import re
 import decimal
+import threading
 
 from aserializer.utils import py2to3
 
@@ -147,3 +148,132 @@ RE_EMAIL= re.compile(
 def validate_email(value):
    if not RE_EMAIL.search(py2to3._unicode(value)):
         raise SerializerValidatorError('Enter a valid email.', error_code='invalid')
+
+
+_batch_local = threading.local()
+
+
+def get_validation_batch():
+    return getattr(_batch_local, 'batch', None)
+
+
+def _is_hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class ValidationBatch(object):
+    """
+    The values of the batch validators of many serializers, checked with one check per batch key.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._valid = {}
+
+    def add(self, validator, value):
+        key = validator.get_batch_key()
+        validator, values = self._values.setdefault(key, (validator, set()))
+        for item in validator.get_values(value):
+            # An unhashable value (i.g. a dict sent for an id) is checked by the validator on its own.
+            if _is_hashable(item):
+                values.add(item)
+
+    def check(self):
+        for key, (validator, values) in self._values.items():
+            valid = self._valid.setdefault(key, (set(), set()))
+            unchecked = [value for value in values if value not in valid[1]]
+            if unchecked:
+                valid[0].update(validator.check_values(unchecked))
+                valid[1].update(unchecked)
+
+    def is_checked(self, validator, value):
+        checked = self._valid.get(validator.get_batch_key(), None)
+        return checked is not None and _is_hashable(value) and value in checked[1]
+
+    def is_valid(self, validator, value):
+        return value in self._valid[validator.get_batch_key()][0]
+
+
+class validation_batch(object):
+    """
+    A context in which the batch validators of the serializers check their values together, i.g. with one database
+    query per model instead of one query per value. The values are collected from the serializers (and their
+    nested serializers) on enter. A nested batch adds its values to the outer batch.
+    """
+
+    def __init__(self, serializers=None):
+        self.serializers = serializers or []
+        self.batch = None
+        self._created = False
+
+    def __enter__(self):
+        self.batch = get_validation_batch()
+        self._created = self.batch is None
+        if self._created:
+            self.batch = ValidationBatch()
+            _batch_local.batch = self.batch
+        try:
+            for serializer in self.serializers:
+                serializer.collect_batch_values(self.batch)
+            self.batch.check()
+        except Exception:
+            # __exit__ is not called, if __enter__ raises.
+            if self._created:
+                _batch_local.batch = None
+            raise
+        return self.batch
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._created:
+            _batch_local.batch = None
+
+
+class BatchValidator(object):
+    """
+    A validator, which checks many values at once (i.g. by one database query). In a validation_batch the values
+    of all serializers are checked before the validation, otherwise every value is checked on its own.
+    A list value is valid, if all its items are valid.
+    """
+    message = 'Invalid value %(value)s.'
+    error_code = None
+
+    def __deepcopy__(self, memo):
+        # The fields are copied per serializer instance, the validator is shared, so its batch key stays the same.
+        return self
+
+    def get_batch_key(self):
+        """
+        The validators with the same batch key share one check.
+        """
+        return self
+
+    def normalize(self, value):
+        return value
+
+    def get_values(self, value):
+        if value in VALIDATORS_EMPTY_VALUES:
+            return []
+        if isinstance(value, (list, tuple, set)):
+            return [self.normalize(item) for item in value]
+        return [self.normalize(value)]
+
+    def check_values(self, values):
+        """
+        Returns the valid values of the list.
+        """
+        raise NotImplementedError()
+
+    def __call__(self, value):
+        batch = get_validation_batch()
+        for item in self.get_values(value):
+            if batch is not None and batch.is_checked(self, item):
+                valid = batch.is_valid(self, item)
+            else:
+                valid = item in list(self.check_values([item]))
+            if not valid:
+                raise SerializerValidatorError(message=self.message, error_code=self.error_code,
+                                               params={'value': item})
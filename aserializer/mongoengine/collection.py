@@ -1,27 +1,61 @@
 # -*- coding: utf-8 -*-
 
+import json
+
+from aserializer.utils import cursors
 from aserializer.collection.base import CollectionSerializer
+from aserializer.collection.counting import ExactCount
+from aserializer.collection.keyset import KeysetPaginationMixin
+from aserializer.mongoengine import utils as mongo_utils
+from aserializer.mongoengine import pagination
 
 
-class MongoEngineCollectionSerializer(CollectionSerializer):
+class MongoEngineCollectionSerializer(KeysetPaginationMixin, CollectionSerializer):
 
-    def metadata(self, objects):
-        total_count = objects.count()
-        _metadata = dict()
-        _metadata[self._meta.offset_key] = self._offset or 0
-        _metadata[self._meta.limit_key] = self._limit or total_count
-        _metadata[self._meta.total_count_key] = total_count
-        return _metadata
+    def get_total_count(self, objects):
+        if self._facet_count is not None:
+            # Counted by the aggregation of the page.
+            return self._facet_count
+        return objects.count()
 
-    def _pre(self, objects, limit=None, offset=None, sort=None):
-        if offset is None:
-            offset = 0
-        try:
-            offset = int(offset)
-            limit = int(limit)
-        except Exception:
-            limit = 10
+    def get_count_key(self, objects):
+        return objects._collection.name, json.dumps(objects._query, sort_keys=True, default=str)
+
+    def get_estimated_count(self, objects):
+        if objects._query or not hasattr(objects._collection, 'estimated_document_count'):
+            return None
+        return objects._collection.estimated_document_count()
 
+    def use_facet(self):
+        """
+        The page and the total count are fetched by one aggregation, if the Meta option facet_pagination is set, the
+        count strategy is the exact count and no cursor pagination is used.
+        """
+        return (self._meta.facet_pagination and type(self._meta.count_strategy) is ExactCount and
+                not self.use_keyset())
+
+    def defer_metadata(self):
+        return self.use_facet() or super(MongoEngineCollectionSerializer, self).defer_metadata()
+
+    def get_cursor(self, objects):
+        """
+        Returns the queryset with the cursor options: the Meta options cursor_batch_size (the number of documents
+        per round trip) and no_cache (the documents are not kept by the queryset).
+        """
+        if self._meta.cursor_batch_size and hasattr(objects, 'batch_size'):
+            objects = objects.batch_size(self._meta.cursor_batch_size)
+        if self._meta.no_cache and hasattr(objects, 'no_cache'):
+            objects = objects.no_cache()
+        return objects
+
+    def iterate_objects(self, objects):
+        return iter(self.get_cursor(objects))
+
+    def pre_initial(self, objects):
+        self._raw_document = None
+        self._facet_count = None
+
+    def get_order_by(self, sort):
         if sort is not None and not isinstance(sort, list):
             sort = [str(sort)]
         _sort = []
@@ -36,6 +70,131 @@ class MongoEngineCollectionSerializer(CollectionSerializer):
                 if sort_field_name in serializer_fieldnames:
                     sort_field_name = serializer_fieldnames[sort_field_name]
                     _sort.append('{}{}'.format(sort_prefix, sort_field_name))
+        return _sort
+
+    def optimize(self, objects, sort_fields=None):
+        """
+        Returns the queryset with the fields of the serializer projection (by .only()). With the Meta option
+        as_pymongo the documents are fetched as raw dictionaries, if the serializer reads no references and no
+        properties of the document.
+        """
+        document = objects._document
+        if self._fields or self._exclude:
+            only_fields = mongo_utils.get_only_fields(self._serializer_cls, document, fields=self._fields,
+                                                      exclude=self._exclude, extra_fields=sort_fields)
+            if only_fields is not None:
+                objects = objects.only(*only_fields)
+        if self._meta.as_pymongo and mongo_utils.can_read_raw(self._serializer_cls, document, fields=self._fields,
+                                                              exclude=self._exclude):
+            self._raw_document = document
+            objects = objects.as_pymongo()
+        return objects
+
+    def get_item_serializer(self, obj):
+        if isinstance(obj, dict) and self._raw_document is not None:
+            obj = mongo_utils.from_raw(self._raw_document, obj)
+        return super(MongoEngineCollectionSerializer, self).get_item_serializer(obj)
+
+    def get_offset_limit(self, offset=None, limit=None):
+        if offset is None:
+            offset = 0
+        try:
+            offset = int(offset)
+            limit = int(limit)
+        except Exception:
+            limit = 10
+        return offset, limit
+
+    def _pre(self, objects, limit=None, offset=None, sort=None):
+        offset, limit = self.get_offset_limit(offset=offset, limit=limit)
+        _sort = self.get_order_by(sort)
         if _sort:
             objects = objects.order_by(*_sort)
+        objects = self.optimize(objects, sort_fields=[item.lstrip('-') for item in _sort])
         return objects.skip(offset).limit(limit)
+
+    def _page(self, objects):
+        return self.dereference(self._fetch_page(objects))
+
+    def dereference(self, page):
+        """
+        Loads the references of the page, which are serialized by nested serializers, with one query per
+        referenced collection instead of one query per reference and item. Enabled by the Meta option
+        optimize_queryset = True.
+        """
+        if self._raw_document is not None or not self._meta.optimize_queryset:
+            return page
+        document = getattr(page, '_document', None)
+        if document is None:
+            page = list(page)
+            if not page:
+                return page
+            document = type(page[0])
+        if not mongo_utils.get_nested_references(self._serializer_cls, document, fields=self._fields,
+                                                 exclude=self._exclude):
+            return page
+        page = list(self.get_cursor(page)) if hasattr(page, '_document') else page
+        mongo_utils.dereference(page, self._serializer_cls, fields=self._fields, exclude=self._exclude)
+        return page
+
+    def _fetch_page(self, objects):
+        if self.use_facet():
+            return self._facet_page(objects)
+        if not self.use_keyset():
+            return super(MongoEngineCollectionSerializer, self)._page(objects)
+        return self._keyset_count_page(objects)
+
+    def get_facet_pipeline(self, objects):
+        """
+        Returns the aggregation pipeline of the page by the serializer sort mapping and projection.
+        """
+        document = objects._document
+        order_by = self.get_order_by(self._sort)
+        if order_by:
+            order_by = cursors.get_keyset_order_by(order_by, 'id')
+        only_fields = None
+        if self._fields or self._exclude:
+            only_fields = mongo_utils.get_only_fields(self._serializer_cls, document, fields=self._fields,
+                                                      exclude=self._exclude)
+        ordering = objects._ordering
+        if ordering is None and document._meta.get('ordering'):
+            ordering = objects._get_order_by(document._meta['ordering'])
+        offset, limit = self.get_offset_limit(offset=self._offset, limit=self._limit)
+        return pagination.get_facet_pipeline(document, objects._query, order_by, offset=offset, limit=limit,
+                                             only_fields=only_fields, ordering=ordering)
+
+    def _facet_page(self, objects):
+        """
+        Returns the page and sets the total count by one aggregation with a $facet of the page and the count,
+        instead of a count and a find query.
+        """
+        document = objects._document
+        result = list(objects._collection.aggregate(self.get_facet_pipeline(objects)))
+        facet = result[0] if result else {}
+        total = facet.get('total', [])
+        self._facet_count = total[0]['count'] if total else 0
+        items = facet.get('items', [])
+        if self._meta.as_pymongo and mongo_utils.can_read_raw(self._serializer_cls, document, fields=self._fields,
+                                                              exclude=self._exclude):
+            self._raw_document = document
+            return items
+        return [document._from_son(item) for item in items]
+
+    def get_keyset_order_by(self, objects):
+        return cursors.get_keyset_order_by(self.get_order_by(self._sort), 'id')
+
+    def filter_keyset(self, objects, order_by, values, backwards=False):
+        query = pagination.get_keyset_query(objects._document, order_by, values, backwards=backwards)
+        return objects.filter(__raw__=query)
+
+    def order_keyset(self, objects, order_by, backwards=False):
+        objects = objects.order_by(*(cursors.reverse_order_by(order_by) if backwards else order_by))
+        return self.optimize(objects, sort_fields=[name for name, descending in cursors.parse_order_by(order_by)])
+
+    def fetch_keyset(self, objects, limit=None):
+        if limit:
+            objects = objects.limit(limit)
+        return list(self.get_cursor(objects))
+
+    def get_keyset_values(self, objects, obj, order_by):
+        return pagination.get_keyset_values(objects._document, obj, order_by)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from aserializer.utils.cursors import parse_order_by
+
+try:
+    from mongoengine.base import BaseDocument
+    from bson import SON
+except ImportError:
+    BaseDocument = None
+    SON = None
+
+
+def get_keyset_value(document, obj, name):
+    if isinstance(obj, dict):
+        # A raw document of .as_pymongo()
+        for db_name in document._translate_field_name(name).split('.'):
+            if not isinstance(obj, dict):
+                return None
+            obj = obj.get(db_name, None)
+        return obj
+    for part in name.split('.'):
+        if obj is None:
+            return None
+        obj = getattr(obj, part, None)
+    if BaseDocument is not None and isinstance(obj, BaseDocument) and hasattr(obj, 'pk'):
+        # A reference is sorted by its id.
+        return obj.pk
+    return obj
+
+
+def get_keyset_values(document, obj, order_by):
+    """
+    Returns the cursor values of a document (or a raw document) for the order_by arguments.
+    """
+    return [get_keyset_value(document, obj, name) for name, descending in parse_order_by(order_by)]
+
+
+def get_keyset_query(document, order_by, values, backwards=False):
+    """
+    Returns the raw query for the documents after the cursor values (before them, if backwards), i.g. for
+    ['-number', 'id']: {'$or': [{'number': {'$lt': n}}, {'number': n, '_id': {'$gt': i}}]}.
+    MongoDB sorts a null (or missing) value before all other values, so a null cursor value is followed by the
+    documents with a value ({'$ne': None}) and a descending cursor value by the null documents ({'$eq': None}).
+    """
+    conditions = []
+    previous = {}
+    for (name, descending), value in zip(parse_order_by(order_by), values):
+        db_name = document._translate_field_name(name)
+        reverse = descending != backwards
+        condition = dict(previous)
+        if value is None:
+            if not reverse:
+                condition[db_name] = {'$ne': None}
+                conditions.append(condition)
+        elif reverse:
+            condition['$or'] = [{db_name: {'$lt': value}}, {db_name: {'$eq': None}}]
+            conditions.append(condition)
+        else:
+            condition[db_name] = {'$gt': value}
+            conditions.append(condition)
+        previous[db_name] = {'$eq': None} if value is None else value
+    if not conditions:
+        return {'_id': {'$in': []}}
+    return {'$or': conditions}
+
+
+def get_facet_pipeline(document, query, order_by, offset=None, limit=None, only_fields=None, ordering=None):
+    """
+    Returns the aggregation pipeline for the documents of a page and the total count in one roundtrip:
+    $match, $sort and a $facet with the items ($skip, $limit, $project) and the total ($count).
+    The order_by arguments and the fields of the projection are the names of the document fields. Without
+    order_by the ordering of the queryset, a list of (db field, direction) tuples, is used.
+    """
+    pipeline = []
+    if query:
+        pipeline.append({'$match': query})
+    if order_by:
+        ordering = [(document._translate_field_name(name), -1 if descending else 1)
+                    for name, descending in parse_order_by(order_by)]
+    if ordering:
+        pipeline.append({'$sort': SON(list(ordering))})
+    items = []
+    if offset:
+        items.append({'$skip': offset})
+    if limit:
+        items.append({'$limit': limit})
+    if only_fields is not None:
+        items.append({'$project': dict((document._translate_field_name(name), 1) for name in only_fields)})
+    if not items:
+        # A sub-pipeline of $facet can not be empty.
+        items.append({'$skip': 0})
+    pipeline.append({'$facet': {'items': items, 'total': [{'$count': 'count'}]}})
+    return pipeline
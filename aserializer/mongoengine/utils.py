@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+from aserializer.fields import TypeField
+from aserializer.fields.serializer_fields import SerializerObjectField
+
+try:
+    from mongoengine import fields as mongo_fields
+    from mongoengine.base import BaseList
+    from bson import DBRef
+except ImportError:
+    mongo_fields = None
+    BaseList = None
+    DBRef = None
+
+
+def get_read_names(serializer_cls, fields=None, exclude=None):
+    """
+    Returns the source names, which the serializer class with the fields/exclude projection reads: the field
+    name and its map field name by get_fieldnames(). A fixed TypeField reads nothing.
+    """
+    fieldnames = serializer_cls.get_fieldnames()
+    result = []
+    for name, field in serializer_cls(fields=fields, exclude=exclude).fields.items():
+        if isinstance(field, TypeField) and field.fixed:
+            continue
+        for source_name in (name, fieldnames.get(name, name)):
+            if source_name not in result:
+                result.append(source_name)
+    return result
+
+
+def is_reference_field(field):
+    if mongo_fields is None:
+        return False
+    if isinstance(field, (mongo_fields.ListField, mongo_fields.DictField)) and field.field is not None:
+        return is_reference_field(field.field)
+    return isinstance(field, (mongo_fields.ReferenceField, mongo_fields.LazyReferenceField,
+                              mongo_fields.GenericReferenceField, mongo_fields.GenericLazyReferenceField,
+                              mongo_fields.CachedReferenceField))
+
+
+def get_only_fields(serializer_cls, document, fields=None, exclude=None, extra_fields=None):
+    """
+    Returns the document field names for .only(), which are read by the serializer class with the fields/exclude
+    projection, or None if they are not known (i.g. a property of the document reads other fields).
+    """
+    result = []
+    for name in get_read_names(serializer_cls, fields=fields, exclude=exclude) + list(extra_fields or []):
+        if name in document._fields:
+            if name not in result:
+                result.append(name)
+        elif hasattr(document, name):
+            return None
+    return result
+
+
+def can_read_raw(serializer_cls, document, fields=None, exclude=None):
+    """
+    Returns True, if the serializer class reads only fields of the document, which can be read from the raw
+    pymongo dictionaries. The references and the properties of the document need the document objects.
+    """
+    for name in get_read_names(serializer_cls, fields=fields, exclude=exclude):
+        if name in document._fields:
+            if is_reference_field(document._fields[name]):
+                return False
+        elif hasattr(document, name):
+            return False
+    return True
+
+
+def _get_embedded_document(field):
+    if mongo_fields is None:
+        return None
+    if isinstance(field, mongo_fields.EmbeddedDocumentField):
+        return field.document_type
+    return None
+
+
+def from_raw(document, raw):
+    """
+    Returns the dictionary of a raw pymongo document by the field names of the document, i.g. {'_id': ...} as
+    {'id': ...}. The embedded documents are converted too.
+    """
+    if not isinstance(raw, dict):
+        return raw
+    result = {}
+    for name, field in document._fields.items():
+        if field.db_field not in raw:
+            continue
+        value = raw[field.db_field]
+        embedded = _get_embedded_document(field)
+        if embedded is None and isinstance(field, mongo_fields.ListField):
+            embedded = _get_embedded_document(field.field)
+            if embedded is not None and isinstance(value, list):
+                value = [from_raw(embedded, item) for item in value]
+        elif embedded is not None:
+            value = from_raw(embedded, value)
+        result[name] = value
+    return result
+
+
+def _get_nested_projection(names, field_name):
+    if not names:
+        return None
+    prefix = '{}.'.format(field_name)
+    return [name[len(prefix):] for name in names if str(name).startswith(prefix)] or None
+
+
+def get_nested_references(serializer_cls, document, fields=None, exclude=None):
+    """
+    Returns a list of (document field name, referenced document, nested serializer class, fields, exclude) for the
+    references (ReferenceField or ListField(ReferenceField)) of the document, which are serialized by nested
+    serializers of the serializer class with the fields/exclude projection.
+    """
+    result = []
+    if mongo_fields is None:
+        return result
+    for name, field in serializer_cls(fields=fields, exclude=exclude).fields.items():
+        if not isinstance(field, SerializerObjectField):
+            continue
+        source_name = name if name in document._fields else field.map_field
+        document_field = document._fields.get(source_name, None)
+        if isinstance(document_field, mongo_fields.ListField):
+            document_field = document_field.field
+        if not isinstance(document_field, mongo_fields.ReferenceField):
+            continue
+        result.append((source_name, document_field.document_type, field.get_serializer_cls(),
+                       _get_nested_projection(fields, name), _get_nested_projection(exclude, name)))
+    return result
+
+
+def _get_ref_id(value):
+    if DBRef is not None and isinstance(value, DBRef):
+        return value.id
+    return None
+
+
+def dereference(documents, serializer_cls, fields=None, exclude=None, parents=None):
+    """
+    Loads the references of the documents, which are serialized by nested serializers, with one $in query per
+    referenced document class and binds the referenced documents to the documents (like select_related), so the
+    nested serialization does not dereference every reference on its own. The references of the referenced
+    documents are loaded in the same way.
+    """
+    documents = [document for document in documents if document is not None]
+    if not documents:
+        return
+    parents = (parents or ()) + (serializer_cls,)
+    references = get_nested_references(serializer_cls, type(documents[0]), fields=fields, exclude=exclude)
+    ids = {}
+    for name, referenced, nested_cls, nested_fields, nested_exclude in references:
+        for document in documents:
+            value = document._data.get(name, None)
+            for item in (value if isinstance(value, list) else [value]):
+                ref_id = _get_ref_id(item)
+                if ref_id is not None:
+                    ids.setdefault(referenced, set()).add(ref_id)
+    loaded = {}
+    for referenced, referenced_ids in ids.items():
+        loaded[referenced] = dict((obj.pk, obj) for obj in referenced.objects(pk__in=list(referenced_ids)))
+    # The references with the same nested serializer are loaded together on the next level.
+    nested = OrderedDict()
+    for name, referenced, nested_cls, nested_fields, nested_exclude in references:
+        objects = loaded.get(referenced, {})
+        key = (nested_cls, tuple(nested_fields or ()), tuple(nested_exclude or ()))
+        bound = nested.setdefault(key, OrderedDict())
+        for document in documents:
+            value = document._data.get(name, None)
+            if isinstance(value, list):
+                items = BaseList([objects.get(_get_ref_id(item), item) for item in value], document, name)
+                items._dereferenced = True
+                document._data[name] = items
+                values = items
+            else:
+                if _get_ref_id(value) in objects:
+                    document._data[name] = objects[_get_ref_id(value)]
+                values = [document._data[name]]
+            for item in values:
+                if isinstance(item, referenced):
+                    bound[id(item)] = item
+    for (nested_cls, nested_fields, nested_exclude), bound in nested.items():
+        if nested_cls not in parents:
+            dereference(list(bound.values()), nested_cls, fields=list(nested_fields) or None,
+                        exclude=list(nested_exclude) or None, parents=parents)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import json
+import uuid
+import base64
+import decimal
+from datetime import datetime, date, time, timedelta, tzinfo
+
+from aserializer.utils import py2to3
+
+try:
+    from bson import ObjectId
+    from bson.errors import InvalidId
+except ImportError:
+    ObjectId = None
+    InvalidId = ValueError
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class OpaqueValue(object):
+    """
+    A sort value of a cursor, which got no json form (i.g. an object of the application). It is encoded as a
+    placeholder, the sorted index resolves such a cursor by the position of its object.
+    """
+
+    def __repr__(self):
+        return 'OPAQUE'
+
+
+OPAQUE = OpaqueValue()
+
+
+class FixedOffset(tzinfo):
+
+    def __init__(self, seconds):
+        self._offset = timedelta(seconds=seconds)
+
+    def utcoffset(self, dt):
+        return self._offset
+
+    def dst(self, dt):
+        return timedelta(0)
+
+    def tzname(self, dt):
+        return None
+
+
+def _get_offset(value):
+    offset = value.utcoffset()
+    if offset is None:
+        return None
+    return offset.days * 86400 + offset.seconds
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.replace(tzinfo=None).strftime('%Y-%m-%dT%H:%M:%S.%f'), 'tz': _get_offset(value)}
+    if isinstance(value, date):
+        return {'$d': value.strftime('%Y-%m-%d')}
+    if isinstance(value, time):
+        return {'$t': value.replace(tzinfo=None).strftime('%H:%M:%S.%f')}
+    if isinstance(value, decimal.Decimal):
+        return {'$dec': py2to3._unicode(value)}
+    if isinstance(value, uuid.UUID):
+        return {'$uuid': py2to3._unicode(value)}
+    if ObjectId is not None and isinstance(value, ObjectId):
+        return {'$oid': py2to3._unicode(value)}
+    if isinstance(value, timedelta):
+        return {'$td': [value.days, value.seconds, value.microseconds]}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    if value is None or isinstance(value, (bool, float, dict) + py2to3.integer + py2to3.string):
+        return value
+    return {'$?': None}
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if '$dt' in value:
+        result = datetime.strptime(value['$dt'], '%Y-%m-%dT%H:%M:%S.%f')
+        if value.get('tz', None) is not None:
+            result = result.replace(tzinfo=FixedOffset(value['tz']))
+        return result
+    if '$d' in value:
+        return datetime.strptime(value['$d'], '%Y-%m-%d').date()
+    if '$t' in value:
+        return datetime.strptime(value['$t'], '%H:%M:%S.%f').time()
+    if '$dec' in value:
+        return decimal.Decimal(value['$dec'])
+    if '$uuid' in value:
+        return uuid.UUID(value['$uuid'])
+    if '$oid' in value and ObjectId is not None:
+        return ObjectId(value['$oid'])
+    if '$td' in value:
+        days, seconds, microseconds = value['$td']
+        return timedelta(days=days, seconds=seconds, microseconds=microseconds)
+    if '$?' in value:
+        return OPAQUE
+    raise InvalidCursor('Unknown cursor value.')
+
+
+def encode_cursor(values):
+    """
+    Returns an opaque url safe token for a list of sort values.
+    """
+    data = json.dumps(_encode_value(list(values)), separators=(',', ':'))
+    token = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+    return token.rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Returns the list of sort values of a token created by encode_cursor.
+    """
+    if not isinstance(token, py2to3.string):
+        raise InvalidCursor('Invalid cursor.')
+    try:
+        token = str(token)
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(data.decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor('Invalid cursor.')
+    if not isinstance(values, list):
+        raise InvalidCursor('Invalid cursor.')
+    try:
+        return _decode_value(values)
+    except (TypeError, ValueError, decimal.InvalidOperation, InvalidId):
+        raise InvalidCursor('Invalid cursor.')
+
+
+def parse_order_by(order_by):
+    """
+    Returns a list of (name, descending) tuples of a list of order_by arguments.
+    """
+    result = []
+    for item in order_by:
+        item = py2to3._unicode(item)
+        if item.startswith('-'):
+            result.append((item[1:], True))
+        elif item.startswith('+'):
+            result.append((item[1:], False))
+        else:
+            result.append((item, False))
+    return result
+
+
+def reverse_order_by(order_by):
+    return ['{}{}'.format('' if descending else '-', name) for name, descending in parse_order_by(order_by)]
+
+
+def get_keyset_order_by(order_by, pk_name, aliases=('pk',)):
+    """
+    Appends the primary key (i.g. 'id') to the order_by arguments as tie-breaker, so the order is unique.
+    """
+    pk_names = (pk_name,) + tuple(aliases)
+    for name, descending in parse_order_by(order_by):
+        if name in pk_names:
+            return list(order_by)
+    return list(order_by) + [pk_name]
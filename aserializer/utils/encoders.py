@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import re
+import json
+import uuid
+
+from aserializer.utils import py2to3
+
+
+class RawJSON(object):
+    """
+    An already json encoded fragment. Fields, custom *_to_native methods and caches can return it and the
+    encoder of this module writes it verbatim into the output, without encoding it again.
+    """
+    __slots__ = ('encoded',)
+
+    def __init__(self, encoded):
+        if isinstance(encoded, py2to3.binary) and not isinstance(encoded, py2to3.text):
+            encoded = encoded.decode('utf-8')
+        self.encoded = encoded
+
+    def __reduce__(self):
+        return RawJSON, (self.encoded,)
+
+    def loads(self):
+        return json.loads(self.encoded)
+
+    def __eq__(self, other):
+        if isinstance(other, RawJSON):
+            return self.encoded == other.encoded
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.encoded)
+
+    def __repr__(self):
+        return 'RawJSON({!r})'.format(self.encoded)
+
+
+class JSONEncoder(json.JSONEncoder):
+    """
+    A json encoder which splices RawJSON fragments into the output.
+    Every fragment is encoded as a unique placeholder string which is replaced by the fragment afterwards.
+    The fragments are not indented.
+    """
+
+    def iterencode(self, o, _one_shot=False):
+        self._fragments = []
+        self._token = uuid.uuid4().hex
+        self._placeholder_re = re.compile(r'"{}:(\d+)"'.format(self._token))
+        for chunk in super(JSONEncoder, self).iterencode(o, _one_shot):
+            if self._token in chunk:
+                chunk = self._placeholder_re.sub(self._splice, chunk)
+            yield chunk
+
+    def _splice(self, match):
+        return self._fragments[int(match.group(1))]
+
+    def default(self, o):
+        if isinstance(o, RawJSON):
+            self._fragments.append(o.encoded)
+            return u'{}:{}'.format(self._token, len(self._fragments) - 1)
+        return super(JSONEncoder, self).default(o)
+
+
+def dumps(obj, indent=None):
+    return json.dumps(obj, cls=JSONEncoder, indent=indent)
+
+
+def iterencode(obj, indent=None):
+    return JSONEncoder(indent=indent).iterencode(obj)
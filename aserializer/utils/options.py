@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
-from copy import deepcopy
 
+from aserializer.utils import py2to3
 from aserializer.utils.parsers import Parser
 
 
@@ -23,8 +23,49 @@ class ModelSerializerMetaOptions(SerializerMetaOptions):
     def __init__(self, meta):
         super(ModelSerializerMetaOptions, self).__init__(meta)
         self.model = getattr(meta, 'model', None)
-        self.parents = getattr(meta, 'parents', RelatedParentManager())
+        self.max_depth = getattr(meta, 'max_depth', None)
+        self.parents = getattr(meta, 'parents', None) or RelatedParentManager(max_depth=self.max_depth)
         self.field_arguments = ModelFieldKwargsHelper(getattr(meta, 'field_kwargs', {}))
+        self.pk_relations = getattr(meta, 'pk_relations', [])
+        self.relations = getattr(meta, 'relations', None)
+        self.exclude_relations = getattr(meta, 'exclude_relations', [])
+
+    def is_pk_relation(self, field_name):
+        """
+        Returns True if the relation is represented by the primary keys (Meta option pk_relations is True or a
+        list of relation names).
+        """
+        if self.pk_relations is True:
+            return True
+        return field_name in (self.pk_relations or [])
+
+    def is_relation_included(self, field_name):
+        """
+        Returns True if a nested serializer is generated for the relation. The Meta option relations is a list of
+        the included relations (None for all relations), exclude_relations a list of the excluded relations.
+        Nested relations are named by their path, i.g. 'orders.items'.
+        """
+        if self.relations is not None and field_name not in _get_first_names(self.relations):
+            return False
+        return field_name not in (self.exclude_relations or [])
+
+    def get_nested_relations(self, field_name):
+        """
+        Returns the relations and exclude_relations options for the nested serializer of the relation.
+        """
+        relations = None
+        if self.relations is not None:
+            relations = _get_nested_names(self.relations, field_name)
+        return relations, _get_nested_names(self.exclude_relations or [], field_name)
+
+
+def _get_first_names(names):
+    return [py2to3._unicode(name).split('.')[0] for name in names]
+
+
+def _get_nested_names(names, field_name):
+    prefix = '{}.'.format(field_name)
+    return [name[len(prefix):] for name in (py2to3._unicode(name) for name in names) if name.startswith(prefix)]
 
 
 class CollectionMetaOptions(MetaOptions):
@@ -40,19 +81,48 @@ class CollectionMetaOptions(MetaOptions):
         self.total_count_key = getattr(meta, 'total_count_key', 'totalCount')
         self.sort = getattr(meta, 'sort', [])
         self.validation = getattr(meta, 'validation', False)
+        self.cache = getattr(meta, 'cache', None)
+        self.index_cache = getattr(meta, 'index_cache', None)
+        self.next_key = getattr(meta, 'next_key', 'next')
+        self.prev_key = getattr(meta, 'prev_key', 'prev')
+        self.keyset_pagination = getattr(meta, 'keyset_pagination', False)
+        self.optimize_queryset = getattr(meta, 'optimize_queryset', False)
+        self.values = getattr(meta, 'values', False)
+        self.prefetch_chunk_size = getattr(meta, 'prefetch_chunk_size', 100)
+        self.as_pymongo = getattr(meta, 'as_pymongo', False)
+        self.cursor_batch_size = getattr(meta, 'cursor_batch_size', None)
+        self.no_cache = getattr(meta, 'no_cache', True)
+        self.facet_pagination = getattr(meta, 'facet_pagination', False)
+        self.parallel_threshold = getattr(meta, 'parallel_threshold', 100)
+        self.executor = getattr(meta, 'executor', 'thread')
+        self.count_strategy = getattr(meta, 'count_strategy', 'exact')
+        self.has_more_key = getattr(meta, 'has_more_key', 'hasMore')
 
 
 class RelatedParentManager(object):
+    """
+    The chain of models of the nested model serializers. A relation to a model of the chain (a cycle) or, with a
+    max_depth, below the max depth is not followed.
+    """
 
-    def __init__(self):
+    def __init__(self, max_depth=None):
         self.parents = []
+        self.max_depth = max_depth
+
+    @property
+    def depth(self):
+        return max(len(self.parents) - 1, 0)
 
     def get_working_copy(self):
-        return deepcopy(self)
+        working_copy = RelatedParentManager(max_depth=self.max_depth)
+        working_copy.parents = list(self.parents)
+        return working_copy
 
     def handle(self, child):
         if child in self.parents:
             return False
+        if self.max_depth is not None and self.parents and len(self.parents) > self.max_depth:
+            return False
         self.parents.append(child)
         return True
 
@@ -8,6 +8,19 @@ class SerializerNotRegistered(Exception):
     message = 'Not in register.'
 
 
+class LazySerializer(object):
+    """
+    A placeholder for a serializer class, which is created on first use by resolve().
+    Serializer fields accept it like a serializer class or a registered name.
+    """
+
+    def resolve(self):
+        raise NotImplementedError()
+
+    def __deepcopy__(self, memo):
+        return self
+
+
 def register_serializer(name, cls):
     if name in _serializer_registry:
         return
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+_local = threading.local()
+
+
+def start_tracking():
+    """
+    Starts the tracking of the serializer field path for the current thread. Nested calls share the path.
+    """
+    if getattr(_local, 'depth', 0) == 0:
+        _local.path = []
+    _local.depth = getattr(_local, 'depth', 0) + 1
+
+
+def stop_tracking():
+    _local.depth = getattr(_local, 'depth', 1) - 1
+    if _local.depth <= 0:
+        _local.depth = 0
+        _local.path = None
+
+
+def get_path_stack():
+    """
+    Returns the list of the field names, which are set by the serializers, or None if the tracking is not started.
+    """
+    return getattr(_local, 'path', None)
+
+
+def get_field_path():
+    """
+    Returns the path of the serializer field, which is set at the moment (i.g. 'orders.items.product'). Outside of
+    a field (i.g. the queries of a collection) the path is an empty string.
+    """
+    path = get_path_stack()
+    if not path:
+        return ''
+    return '.'.join(path)
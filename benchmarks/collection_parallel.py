@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the parallel item serialization of a CollectionSerializer.
+
+Usage: python benchmarks/collection_parallel.py [items] [repeat]
+
+Prints the time of one dump for 1 up to the number of cores workers for the thread and the process executor.
+Every row is serialized by the pool, one worker as well, so its speedup shows the overhead of the pool.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+import decimal
+import multiprocessing
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aserializer import (Serializer, IntegerField, StringField, DecimalField, DatetimeField, DateField,
+                         ListSerializerField)
+from aserializer.collection.base import CollectionSerializer
+
+
+class PositionSerializer(Serializer):
+    id = IntegerField(identity=True)
+    price = DecimalField(decimal_places=2)
+    tax = DecimalField(decimal_places=4)
+    created = DatetimeField()
+
+
+class RowSerializer(Serializer):
+    id = IntegerField(identity=True)
+    name = StringField(max_length=100)
+    amount = DecimalField(decimal_places=2)
+    created = DatetimeField()
+    updated = DatetimeField()
+    day = DateField()
+    positions = ListSerializerField(PositionSerializer)
+
+
+class RowCollection(CollectionSerializer):
+
+    class Meta:
+        serializer = RowSerializer
+
+
+class PooledRowCollection(RowCollection):
+
+    class Meta:
+        serializer = RowSerializer
+
+    def _items(self, objects):
+        # The items are serialized by the pool for any number of workers and items.
+        return self._parallel_items(list(self._page(objects)))
+
+
+def create_rows(count):
+    start = datetime(2015, 1, 1)
+    rows = []
+    for i in range(count):
+        created = start + timedelta(minutes=i)
+        rows.append(dict(id=i, name='Row {}'.format(i), amount=decimal.Decimal(i) / 7,
+                         created=created, updated=created, day=created.date(),
+                         positions=[dict(id=j, price=decimal.Decimal(j) / 3, tax=decimal.Decimal('0.19'),
+                                         created=created) for j in range(5)]))
+    return rows
+
+
+def measure(collection_cls, rows, repeat, **kwargs):
+    # One dump before the timing, so the pools are started and the serializer classes are warm.
+    collection_cls(rows, limit=len(rows)).dump(**kwargs)
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        collection_cls(rows, limit=len(rows)).dump(**kwargs)
+        duration = time.time() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rows = create_rows(count)
+    serial = measure(RowCollection, rows, repeat)
+    print('{} items, {} cores, serial: {:.3f}s'.format(count, multiprocessing.cpu_count(), serial))
+    print('{:>8} {:>10} {:>8} {:>10} {:>8}'.format('workers', 'thread', 'speedup', 'process', 'speedup'))
+    for workers in range(1, multiprocessing.cpu_count() + 1):
+        thread = measure(PooledRowCollection, rows, repeat, workers=workers, executor='thread')
+        process = measure(PooledRowCollection, rows, repeat, workers=workers, executor='process')
+        print('{:>8} {:>9.3f}s {:>7.2f}x {:>9.3f}s {:>7.2f}x'.format(workers, thread, serial / thread,
+                                                                     process, serial / process))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the definition of DjangoModelSerializer classes for a synthetic, richly connected schema.
+
+Usage: python benchmarks/django_startup.py [models] [relations]
+
+Every model got foreign keys and a many-to-many relation to the previous models. Prints the time to define one
+model serializer per model, the time to resolve all nested serializer classes of the tree (i.g. on first use)
+and the number of nested classes created.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+                       INSTALLED_APPS=[])
+if django.VERSION >= (1, 7, 0):
+    django.setup()
+
+from django.db import models
+
+from aserializer.django.serializers import DjangoModelSerializer, LazyNestedModelSerializer
+
+
+def create_models(count, relations):
+    result = []
+    for i in range(count):
+        attrs = {
+            '__module__': __name__,
+            'Meta': type('Meta', (), {'app_label': 'startup_benchmark'}),
+            'name': models.CharField(max_length=24),
+            'number': models.IntegerField(default=0),
+        }
+        for j in range(1, relations + 1):
+            if i - j >= 0:
+                attrs['fk{}'.format(j)] = models.ForeignKey(result[i - j], null=True, on_delete=models.CASCADE,
+                                                            related_name='model{}_fk{}'.format(i, j))
+        if i >= 1:
+            attrs['m2m'] = models.ManyToManyField(result[i - 1], related_name='model{}_m2m'.format(i))
+        result.append(type('Model{}'.format(i), (models.Model,), attrs))
+    return result
+
+
+def create_serializers(model_classes):
+    result = []
+    for model in model_classes:
+        meta = type('Meta', (), {'model': model})
+        result.append(type('{}Serializer'.format(model.__name__), (DjangoModelSerializer,), {'Meta': meta}))
+    return result
+
+
+def resolve(serializer_cls, depth, max_depth):
+    for field in serializer_cls._base_fields.values():
+        get_serializer_cls = getattr(field, 'get_serializer_cls', None)
+        if get_serializer_cls is not None and depth < max_depth:
+            resolve(get_serializer_cls(), depth + 1, max_depth)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    relations = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    model_classes = create_models(count, relations)
+    start = time.time()
+    serializers = create_serializers(model_classes)
+    print('define {} serializers: {:.3f}s'.format(count, time.time() - start))
+    for max_depth in (1, 2, 3):
+        start = time.time()
+        for serializer_cls in serializers:
+            resolve(serializer_cls, 0, max_depth)
+        print('resolve depth {}: {:.3f}s, {} nested classes'.format(max_depth, time.time() - start,
+                                                                    len(LazyNestedModelSerializer._classes)))
+
+
+if __name__ == '__main__':
+    main()
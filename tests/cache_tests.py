@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from aserializer import Serializer
+from aserializer.collection import CollectionSerializer
+from aserializer.fields import IntegerField, StringField, SerializerField, ListSerializerField
+from aserializer.cache import (FragmentCache,
+                               LocMemCacheBackend,
+                               SQLiteCacheBackend,
+                               MemcachedCacheBackend,)
+
+
+class LocalMemcachedClient(object):
+    """
+    A local stand-in for a memcached client (python-memcached/pymemcache interface).
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key, None)
+
+    def set(self, key, value, expire=0):
+        self.data[key] = value.encode('utf-8')
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def flush_all(self):
+        self.data.clear()
+
+
+CACHE = FragmentCache(backend=LocMemCacheBackend())
+
+
+class CustomerSerializer(Serializer):
+    id = IntegerField(identity=True)
+    name = StringField()
+    dump_calls = []
+
+    def name_to_native(self, field):
+        self.dump_calls.append(field.value)
+        return field.to_native()
+
+
+class OrderSerializer(Serializer):
+    id = IntegerField(identity=True)
+    customer = SerializerField(CustomerSerializer, cache=CACHE)
+
+
+class BasketSerializer(Serializer):
+    id = IntegerField(identity=True)
+    customers = ListSerializerField(CustomerSerializer, cache=CACHE)
+
+
+RAW_CACHE = FragmentCache(backend=LocMemCacheBackend(), raw=True)
+
+
+class RawOrderSerializer(Serializer):
+    id = IntegerField(identity=True)
+    customer = SerializerField(CustomerSerializer, cache=RAW_CACHE)
+
+
+class RawOrderCollectionSerializer(CollectionSerializer):
+    class Meta:
+        serializer = RawOrderSerializer
+        cache = CACHE
+
+
+def get_other_order_serializer():
+    class CustomerSerializer(Serializer):
+        # The same name as the customer serializer of this module.
+        __module__ = 'tests.other_cache_tests'
+        id = IntegerField(identity=True)
+        name = StringField()
+
+        def name_to_native(self, field):
+            return field.to_native().upper()
+
+    class OtherOrderSerializer(Serializer):
+        id = IntegerField(identity=True)
+        customer = SerializerField(CustomerSerializer, cache=CACHE)
+
+    return OtherOrderSerializer
+
+
+class NoIdentitySerializer(Serializer):
+    name = StringField()
+
+
+class BackendTestMixin(object):
+
+    def get_backend(self):
+        raise NotImplementedError()
+
+    def test_get_set_delete(self):
+        backend = self.get_backend()
+        self.assertIsNone(backend.get('key'))
+        backend.set('key', u'{"id": 1}')
+        self.assertEqual(backend.get('key'), u'{"id": 1}')
+        backend.set('key', u'{"id": 2}')
+        self.assertEqual(backend.get('key'), u'{"id": 2}')
+        backend.delete('key')
+        self.assertIsNone(backend.get('key'))
+
+    def test_clear(self):
+        backend = self.get_backend()
+        backend.set('key1', u'1')
+        backend.set('key2', u'2')
+        backend.clear()
+        self.assertIsNone(backend.get('key1'))
+        self.assertIsNone(backend.get('key2'))
+
+
+class LocMemCacheBackendTests(BackendTestMixin, unittest.TestCase):
+
+    def get_backend(self):
+        return LocMemCacheBackend()
+
+    def test_timeout(self):
+        backend = self.get_backend()
+        backend.set('key', u'1', timeout=-1)
+        self.assertIsNone(backend.get('key'))
+
+    def test_max_entries(self):
+        backend = LocMemCacheBackend(max_entries=2)
+        backend.set('key1', u'1')
+        backend.set('key2', u'2')
+        backend.set('key3', u'3')
+        self.assertIsNone(backend.get('key1'))
+        self.assertEqual(backend.get('key3'), u'3')
+
+
+class SQLiteCacheBackendTests(BackendTestMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_backend(self):
+        return SQLiteCacheBackend(self.path)
+
+    def test_shared_file(self):
+        self.get_backend().set('key', u'{"id": 1}')
+        self.assertEqual(self.get_backend().get('key'), u'{"id": 1}')
+
+    def test_invalid_table_name(self):
+        self.assertRaises(ValueError, SQLiteCacheBackend, self.path, table='cache; DROP TABLE x')
+
+
+class MemcachedCacheBackendTests(BackendTestMixin, unittest.TestCase):
+
+    def get_backend(self):
+        return MemcachedCacheBackend(LocalMemcachedClient())
+
+    def test_long_key(self):
+        client = LocalMemcachedClient()
+        backend = MemcachedCacheBackend(client)
+        key = 'a b' * 200
+        backend.set(key, u'1')
+        self.assertEqual(backend.get(key), u'1')
+        self.assertNotIn(key, client.data)
+        self.assertTrue(all(len(k) <= 250 for k in client.data))
+
+
+class FragmentCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        CACHE.clear()
+        RAW_CACHE.clear()
+        CACHE.version = 1
+        CustomerSerializer.dump_calls[:] = []
+
+    def test_make_key(self):
+        cache = FragmentCache()
+        self.assertEqual(cache.make_key(CustomerSerializer, 1), 'aserializer:1:tests.cache_tests.CustomerSerializer:1')
+        self.assertEqual(cache.make_key(CustomerSerializer, [1, 2], version=3),
+                         'aserializer:3:tests.cache_tests.CustomerSerializer:1,2')
+        self.assertNotEqual(cache.make_key(CustomerSerializer, 1, fields=['name']),
+                            cache.make_key(CustomerSerializer, 1))
+        self.assertEqual(cache.make_key(CustomerSerializer, 1, fields=['id', 'name']),
+                         cache.make_key(CustomerSerializer, 1, fields=['name', 'id']))
+
+    def test_no_identity(self):
+        cache = FragmentCache()
+        self.assertIsNone(cache.get_key(NoIdentitySerializer(dict(name='Joe'))))
+        self.assertIsNone(cache.get_key(CustomerSerializer(dict(name='Joe'))))
+
+    def test_nested_fragment_shared_by_parents(self):
+        customer = dict(id=1, name='Joe')
+        first = OrderSerializer(dict(id=1, customer=customer)).dump()
+        second = OrderSerializer(dict(id=2, customer=customer)).dump()
+        self.assertDictEqual(first, {'id': 1, 'customer': {'id': 1, 'name': 'Joe'}})
+        self.assertDictEqual(second, {'id': 2, 'customer': {'id': 1, 'name': 'Joe'}})
+        self.assertEqual(CustomerSerializer.dump_calls, ['Joe'])
+
+    def test_classes_with_the_same_name(self):
+        customer = dict(id=1, name='Joe')
+        OrderSerializer(dict(id=1, customer=customer)).dump()
+        dump = get_other_order_serializer()(dict(id=1, customer=customer)).dump()
+        self.assertDictEqual(dump['customer'], {'id': 1, 'name': 'JOE'})
+
+    def test_list_fragments(self):
+        OrderSerializer(dict(id=1, customer=dict(id=1, name='Joe'))).dump()
+        dump = BasketSerializer(dict(id=1, customers=[dict(id=1, name='Joe'), dict(id=2, name='Jane')])).dump()
+        self.assertListEqual(dump['customers'], [{'id': 1, 'name': 'Joe'}, {'id': 2, 'name': 'Jane'}])
+        self.assertEqual(CustomerSerializer.dump_calls, ['Joe', 'Jane'])
+
+    def test_invalidate(self):
+        OrderSerializer(dict(id=1, customer=dict(id=1, name='Joe'))).dump()
+        CACHE.invalidate(CustomerSerializer, 1)
+        dump = OrderSerializer(dict(id=1, customer=dict(id=1, name='Joseph'))).dump()
+        self.assertEqual(dump['customer']['name'], 'Joseph')
+        self.assertEqual(CustomerSerializer.dump_calls, ['Joe', 'Joseph'])
+
+    def test_version(self):
+        OrderSerializer(dict(id=1, customer=dict(id=1, name='Joe'))).dump()
+        CACHE.version = 2
+        dump = OrderSerializer(dict(id=1, customer=dict(id=1, name='Joseph'))).dump()
+        self.assertEqual(dump['customer']['name'], 'Joseph')
+        self.assertEqual(CustomerSerializer.dump_calls, ['Joe', 'Joseph'])
+
+    def test_projection(self):
+        OrderSerializer(dict(id=1, customer=dict(id=1, name='Joe'))).dump()
+        dump = OrderSerializer(dict(id=1, customer=dict(id=1, name='Joe')), fields=['id', 'customer.id']).dump()
+        self.assertDictEqual(dump['customer'], {'id': 1})
+
+    def test_shared_cache_instance(self):
+        serializer = OrderSerializer(dict(id=1, customer=dict(id=1, name='Joe')))
+        self.assertIs(serializer.fields['customer'].cache, CACHE)
+
+    def test_nested_raw_fragment(self):
+        orders = [dict(id=1, customer=dict(id=1, name='Joe')), dict(id=2, customer=dict(id=1, name='Joe'))]
+        expected = {'_metadata': {'offset': 0, 'limit': 10, 'totalCount': 2},
+                    'items': [{'id': 1, 'customer': {'id': 1, 'name': 'Joe'}},
+                              {'id': 2, 'customer': {'id': 1, 'name': 'Joe'}}]}
+        # The collection cache stores the items with the nested raw fragments.
+        self.assertDictEqual(json.loads(RawOrderCollectionSerializer(orders).to_json()), expected)
+        self.assertDictEqual(json.loads(RawOrderCollectionSerializer(orders).to_json()), expected)
+        self.assertEqual(CustomerSerializer.dump_calls, ['Joe'])
+
+    def test_positional_arguments(self):
+        # The cache is a keyword argument, the positional arguments are passed to the base field.
+        field = SerializerField(CustomerSerializer, None, None, False)
+        self.assertFalse(field.required)
+        self.assertIsNone(field.cache)
@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import json
+import functools
 import unittest
-
-from aserializer.collection.base import CollectionSerializer
+import uuid
+import decimal
+from datetime import datetime, date, time, timedelta
+
+from aserializer.collection.base import CollectionSerializer, get_pool
+from aserializer.collection.sorting import SortedIndex, SortedIndexCache
+from aserializer.collection.counting import CachedCount, HasMoreCount, get_count_strategy
+from aserializer.utils.cursors import encode_cursor, decode_cursor, InvalidCursor, FixedOffset, OPAQUE
 from aserializer.utils.options import CollectionMetaOptions
 from aserializer import Serializer
 from aserializer.fields import StringField, IntegerField
@@ -172,6 +180,35 @@ class CollectionTestCase(unittest.TestCase):
         self.assertEqual(olist[3]['number'], 5)
 
 
+    def test_pre_sort_none_values(self):
+        collection = TestCollectionSerializer([])
+        objects = [
+            dict(name='2', number=None),
+            dict(name=None, number=6),
+            dict(name='1', number=7)
+        ]
+        olist = collection._pre(objects, sort=['name'])
+        self.assertListEqual([o['name'] for o in olist], ['1', '2', None])
+        olist = collection._pre(objects, sort=['-name'])
+        self.assertListEqual([o['name'] for o in olist], [None, '2', '1'])
+        olist = collection._pre(objects, sort=['-number', 'name'])
+        self.assertListEqual([o['number'] for o in olist], [None, 7, 6])
+
+    def test_pre_sort_objects(self):
+        collection = TestCollectionSerializer([])
+        objects = [TestObject(name=str(i % 3), number=i) for i in range(6)]
+        olist = collection._pre(objects, sort=['name', '-number'])
+        self.assertListEqual([(o.name, o.number) for o in olist],
+                             [('0', 3), ('0', 0), ('1', 4), ('1', 1), ('2', 5), ('2', 2)])
+
+    def test_pre_sort_top_k(self):
+        collection = TestCollectionSerializer([])
+        objects = [dict(name=str(i % 7), number=(i * 37) % 101) for i in range(500)]
+        for sort in (['name'], ['-number'], ['name', 'number'], ['-name', 'number'], ['-name', '-number']):
+            expected = collection._pre(objects, sort=sort, limit=500)
+            self.assertListEqual(collection._pre(objects, sort=sort, limit=10), expected[:10])
+            self.assertListEqual(collection._pre(objects, sort=sort, limit=10, offset=20), expected[20:30])
+
     def test_metadata(self):
         collection = TestCollectionSerializer([])
         objects = [
@@ -203,6 +240,291 @@ class CollectionTestCase(unittest.TestCase):
         self.assertEqual(metadata['offset'], 1)
 
 
+INDEX_CACHE = SortedIndexCache()
+
+
+@functools.total_ordering
+class Rank(object):
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return self.value < other.value
+
+
+class CursorCollectionSerializer(CollectionSerializer):
+
+    class Meta:
+        serializer = TestSerializer
+        keyset_pagination = True
+
+
+class IndexedCollectionSerializer(CollectionSerializer):
+
+    class Meta:
+        serializer = TestSerializer
+        index_cache = INDEX_CACHE
+
+
+class SortedIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        INDEX_CACHE.clear()
+        self.objects = [dict(name=str(i % 4), number=(i * 7) % 11) for i in range(30)]
+
+    def test_pages(self):
+        for sort in (['name'], ['-name'], ['name', '-number'], ['-name', '-number'], []):
+            expected = TestCollectionSerializer([])._pre(self.objects, sort=sort, limit=30)
+            for offset in (0, 5, 28):
+                collection = IndexedCollectionSerializer(self.objects, sort=sort, limit=5, offset=offset)
+                self.assertListEqual(collection.dump()['items'], expected[offset:offset + 5])
+
+    def test_index_is_cached(self):
+        IndexedCollectionSerializer(self.objects, sort=['name']).dump()
+        index = INDEX_CACHE.get(self.objects, [('name', False)])
+        IndexedCollectionSerializer(self.objects, sort=['name'], offset=10).dump()
+        self.assertIs(INDEX_CACHE.get(self.objects, [('name', False)]), index)
+        self.assertIsNot(INDEX_CACHE.get(self.objects, [('name', True)]), index)
+        self.assertIsNot(INDEX_CACHE.get(list(self.objects), [('name', False)]), index)
+
+    def test_version(self):
+        index = INDEX_CACHE.get(self.objects, [('name', False)], version=1)
+        self.assertIs(INDEX_CACHE.get(list(self.objects), [('name', False)], version=1), index)
+        self.assertIsNot(INDEX_CACHE.get(self.objects, [('name', False)], version=2), index)
+        INDEX_CACHE.invalidate(version=1)
+        self.assertIsNot(INDEX_CACHE.get(self.objects, [('name', False)], version=1), index)
+
+    def test_invalidate(self):
+        index = INDEX_CACHE.get(self.objects, [('name', False)])
+        INDEX_CACHE.invalidate(objects=self.objects)
+        self.assertIsNot(INDEX_CACHE.get(self.objects, [('name', False)]), index)
+
+    def test_max_entries(self):
+        cache = SortedIndexCache(max_entries=1)
+        index = cache.get(self.objects, [('name', False)])
+        cache.get(self.objects, [('number', False)])
+        self.assertIsNot(cache.get(self.objects, [('name', False)]), index)
+
+    def test_cursor_pagination(self):
+        for sort in (['name'], ['-name'], ['name', '-number'], ['-name', '-number']):
+            expected = TestCollectionSerializer([])._pre(self.objects, sort=sort, limit=30)
+            result = []
+            after = None
+            while True:
+                dump = IndexedCollectionSerializer(self.objects, sort=sort, limit=7, after=after).dump()
+                result.extend(dump['items'])
+                after = dump['_metadata'].get('next', None)
+                if after is None:
+                    break
+            self.assertListEqual(result, expected)
+
+    def test_cursor_without_index_cache(self):
+        first = CursorCollectionSerializer(self.objects, sort=['number'], limit=5).dump()
+        self.assertIn('next', first['_metadata'])
+        second = CursorCollectionSerializer(self.objects, sort=['number'], limit=5,
+                                            after=first['_metadata']['next']).dump()
+        self.assertEqual(second['_metadata']['offset'], 5)
+        self.assertNotIn('next', TestCollectionSerializer(self.objects, limit=5).dump()['_metadata'])
+
+    def test_cursor_values_without_json_form(self):
+        objects = [dict(name='Name {}'.format(i), number=i, duration=timedelta(seconds=i % 4),
+                        rank=Rank(i % 3)) for i in range(12)]
+        for sort in (['duration', 'number'], ['-duration'], ['rank'], ['-rank', 'name']):
+            expected = TestCollectionSerializer([])._pre(objects, sort=sort, limit=30)
+            result = []
+            after = None
+            while True:
+                dump = CursorCollectionSerializer(objects, sort=sort, limit=5, after=after).dump()
+                result.extend(dump['items'])
+                after = dump['_metadata'].get('next', None)
+                if after is None:
+                    break
+            self.assertListEqual(result, [dict(name=obj['name'], number=obj['number']) for obj in expected])
+        self.assertIs(decode_cursor(encode_cursor([Rank(1)]))[0], OPAQUE)
+        self.assertEqual(decode_cursor(encode_cursor([timedelta(days=1, microseconds=5)])),
+                         [timedelta(days=1, microseconds=5)])
+
+    def test_invalid_cursor(self):
+        dump = IndexedCollectionSerializer(self.objects, sort=['number'], limit=5, after='invalid').dump()
+        self.assertEqual(dump['_metadata']['offset'], 0)
+
+    def test_seek(self):
+        index = SortedIndex(self.objects, [('number', True)])
+        values = index.get_cursor_values(self.objects, 3)
+        self.assertEqual(index.seek(values), 4)
+        self.assertRaises(ValueError, index.seek, [1])
+
+
+class ParallelCollectionSerializer(CollectionSerializer):
+
+    class Meta:
+        serializer = TestSerializer
+        parallel_threshold = 10
+
+
+class CountingExecutor(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def map(self, func, iterable):
+        self.calls += 1
+        return list(map(func, iterable))
+
+
+class ExecutorCollectionSerializer(CollectionSerializer):
+
+    class Meta:
+        serializer = TestSerializer
+        parallel_threshold = 10
+        executor = CountingExecutor()
+
+
+class ParallelCollectionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = [dict(name='Name {}'.format(i), number=i) for i in range(50)]
+
+    def test_thread(self):
+        expected = ParallelCollectionSerializer(self.objects, limit=50).dump()
+        dump = ParallelCollectionSerializer(self.objects, limit=50).dump(workers=3, chunk_size=4)
+        self.assertDictEqual(dump, expected)
+
+    def test_process(self):
+        objects = [TestObject(name='Name {}'.format(i), number=i) for i in range(30)]
+        expected = ParallelCollectionSerializer(objects, limit=30, sort=['-number']).dump()
+        dump = ParallelCollectionSerializer(objects, limit=30, sort=['-number']).dump(workers=2, executor='process')
+        self.assertDictEqual(dump, expected)
+
+    def test_pool_object(self):
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(2)
+        try:
+            dump = ParallelCollectionSerializer(self.objects, limit=20).dump(workers=2, executor=pool)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertListEqual(dump['items'], self.objects[:20])
+
+    def test_shared_pool(self):
+        pool = get_pool('thread', 3)
+        self.assertIs(get_pool('thread', 3), pool)
+        self.assertIsNot(get_pool('thread', 2), pool)
+        ParallelCollectionSerializer(self.objects, limit=50).dump(workers=3)
+        # The pool is kept for the next dump.
+        self.assertListEqual(pool.map(abs, [-1, -2]), [1, 2])
+        dump = ParallelCollectionSerializer(self.objects, limit=50).dump(workers=3)
+        self.assertListEqual(dump['items'], self.objects)
+
+    def test_meta_executor(self):
+        executor = CountingExecutor()
+        dump = ExecutorCollectionSerializer(self.objects, limit=20).dump(workers=2)
+        self.assertListEqual(dump['items'], self.objects[:20])
+        self.assertEqual(ExecutorCollectionSerializer._meta.executor.calls, 1)
+        dump = ExecutorCollectionSerializer(self.objects, limit=20).dump(workers=2, executor=executor)
+        self.assertListEqual(dump['items'], self.objects[:20])
+        self.assertEqual(executor.calls, 1)
+
+    def test_threshold(self):
+        collection = ParallelCollectionSerializer(self.objects, limit=5)
+        dump = collection.dump(workers=2, executor='unknown')
+        self.assertListEqual(dump['items'], self.objects[:5])
+
+    def test_unknown_executor(self):
+        collection = ParallelCollectionSerializer(self.objects, limit=20)
+        self.assertRaises(ValueError, collection.dump, workers=2, executor='unknown')
+
+
+class StreamingCollectionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = [dict(name='Name {}'.format(i), number=i) for i in range(12)]
+
+    def test_iter_dump(self):
+        collection = TestCollectionSerializer(self.objects, sort=['-number'], limit=5, offset=2)
+        items = collection.iter_dump()
+        self.assertFalse(isinstance(items, list))
+        self.assertListEqual(list(items), TestCollectionSerializer(self.objects, sort=['-number'], limit=5,
+                                                                   offset=2).dump()['items'])
+
+    def test_iter_json(self):
+        expected = TestCollectionSerializer(self.objects, limit=5, offset=2).dump()
+        chunks = list(TestCollectionSerializer(self.objects, limit=5, offset=2).iter_json())
+        self.assertEqual(len(chunks), 7)
+        self.assertDictEqual(json.loads(''.join(chunks)), expected)
+
+    def test_iter_json_encoding(self):
+        chunks = list(TestCollectionSerializer(self.objects).iter_json(encoding='utf-8'))
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+        self.assertEqual(json.loads(b''.join(chunks).decode('utf-8'))['_metadata']['totalCount'], 12)
+
+    def test_iter_json_without_metadata(self):
+        class MyCollection(CollectionSerializer):
+            class Meta:
+                serializer = TestSerializer
+                with_metadata = False
+        self.assertListEqual(json.loads(''.join(MyCollection(self.objects, limit=3).iter_json())),
+                             self.objects[:3])
+        self.assertListEqual(json.loads(''.join(MyCollection([]).iter_json())), [])
+
+    def test_write_json(self):
+        class Writer(object):
+            def __init__(self):
+                self.chunks = []
+
+            def write(self, chunk):
+                self.chunks.append(chunk)
+        fp = Writer()
+        TestCollectionSerializer(self.objects, limit=4).write_json(fp)
+        self.assertDictEqual(json.loads(''.join(fp.chunks)), TestCollectionSerializer(self.objects, limit=4).dump())
+
+
+class CountStrategyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = [dict(name='Name {}'.format(i), number=i) for i in range(12)]
+
+    def test_get_count_strategy(self):
+        self.assertIsInstance(get_count_strategy('cached'), CachedCount)
+        strategy = HasMoreCount()
+        self.assertIs(get_count_strategy(strategy), strategy)
+        self.assertRaises(ValueError, get_count_strategy, 'unknown')
+
+    def test_has_more(self):
+        class MyCollection(CollectionSerializer):
+            class Meta:
+                serializer = TestSerializer
+                count_strategy = 'has_more'
+        dump = MyCollection(self.objects, limit=5, offset=5).dump()
+        self.assertDictEqual(dump['_metadata'], {'offset': 5, 'limit': 5, 'hasMore': True})
+        self.assertListEqual(dump['items'], self.objects[5:10])
+        dump = MyCollection(self.objects, limit=5, offset=7).dump()
+        self.assertDictEqual(dump['_metadata'], {'offset': 7, 'limit': 5, 'hasMore': False})
+        self.assertListEqual(dump['items'], self.objects[7:])
+        chunks = MyCollection(self.objects, limit=5, offset=5).iter_json()
+        self.assertDictEqual(json.loads(''.join(chunks)), MyCollection(self.objects, limit=5, offset=5).dump())
+
+
+class CursorTests(unittest.TestCase):
+
+    def test_encode_decode(self):
+        values = [1, u'name', None, 1.5, datetime(2015, 1, 2, 3, 4, 5, 6), date(2015, 1, 2), time(3, 4, 5),
+                  decimal.Decimal('1.50'), uuid.UUID('12345678-1234-5678-1234-567812345678'),
+                  datetime(2015, 1, 2, 3, 4, 5, tzinfo=FixedOffset(3600))]
+        token = encode_cursor(values)
+        self.assertNotIn('=', token)
+        self.assertListEqual(decode_cursor(token), values)
+
+    def test_invalid(self):
+        self.assertRaises(InvalidCursor, decode_cursor, 'invalid')
+        self.assertRaises(InvalidCursor, decode_cursor, None)
+        self.assertRaises(InvalidCursor, decode_cursor, encode_cursor([{'$unknown': 1}]))
+
+
 class CollectionMetaOptionsTests(unittest.TestCase):
 
     def check_hasattr(self, meta):
@@ -19,10 +19,21 @@ else:
 
 SKIPTEST_TEXT = "Django is not installed."
 SKIPTEST_TEXT_VERSION_18 = "Django >= 1.8 is not installed."
+SKIPTEST_TEXT_WINDOW = "Django >= 1.8 and a database with window functions are needed."
 DJANGO_RUNNER = None
 DJANGO_RUNNER_STATE = None
 
 
+def has_window_count():
+    if django is None:
+        return False
+    from django.db import connection
+    from aserializer.django.counting import WindowCountSQL
+    if WindowCountSQL is None:
+        return False
+    return getattr(connection.features, 'supports_over_clause', True)
+
+
 def setUpModule():
     if django is None:
         raise unittest.SkipTest(SKIPTEST_TEXT)
@@ -1,9 +1,84 @@
 # -*- coding: utf-8 -*-
+import json
 import unittest
 
-from tests.django_tests import django, SKIPTEST_TEXT, TestCase
-from tests.django_tests.django_base import (SimpleDjangoModel, RelatedDjangoModel,
-                                            SimpleDjangoModelCollectionSerializer, )
+from tests.django_tests import django, SKIPTEST_TEXT, TestCase, SKIPTEST_TEXT_WINDOW, has_window_count
+if django is not None:
+    from django.db import connection, DatabaseError
+    from django.db.models import Count
+    from django.test.utils import CaptureQueriesContext
+from aserializer import Serializer, fields
+from aserializer.django.collection import DjangoCollectionSerializer
+from aserializer.django.pagination import get_keyset_filter
+from aserializer.django.utils import get_estimated_count
+from aserializer.collection.counting import CachedCount
+from aserializer.django.counting import WindowCount
+from aserializer.utils.cursors import encode_cursor
+from tests.django_tests.django_base import (SimpleDjangoModel, RelatedDjangoModel, SimpleDjangoSerializer,
+                                            SimpleDjangoModelCollectionSerializer, FieldArgsDjangoModel, )
+
+
+class CachedCountCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        count_strategy = CachedCount(ttl=60)
+
+
+class EstimatedCountCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        count_strategy = 'estimated'
+
+
+class WindowCountCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        count_strategy = WindowCount()
+
+
+class HasMoreCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        count_strategy = 'has_more'
+
+
+class KeysetCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        keyset_pagination = True
+
+
+class NullableNameSerializer(Serializer):
+    id = fields.IntegerField()
+    name = fields.StringField(required=False)
+
+
+class NullableKeysetCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = NullableNameSerializer
+        keyset_pagination = True
+
+
+class FailingKeysetCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        keyset_pagination = True
+
+    def filter_keyset(self, objects, order_by, values, backwards=False):
+        raise DatabaseError('The filter failed.')
+
+
+class KeysetHasMoreCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        keyset_pagination = True
+        count_strategy = 'has_more'
+
+
+class FakeRequest(object):
+
+    def __init__(self, **params):
+        self.GET = params
 
 
 @unittest.skipIf(django is None, SKIPTEST_TEXT)
@@ -24,7 +99,7 @@ class DjangoCollectionSerializerTests(TestCase):
         qs = SimpleDjangoModel.objects.all()
         with self.assertNumQueries(0):
             collection = SimpleDjangoModelCollectionSerializer(qs)
-        with self.assertNumQueries(1):
+        with self.assertNumQueries(2):
             collection_dump = collection.dump()
         test_value = {
             "_metadata": {
@@ -187,4 +262,285 @@ class DjangoCollectionSerializerTests(TestCase):
             },
             "items": []
         }
-        self.assertDictEqual(collection.dump(), test_value)
\ No newline at end of file
+        self.assertDictEqual(collection.dump(), test_value)
+
+    def test_iter_json(self):
+        expected = SimpleDjangoModelCollectionSerializer(SimpleDjangoModel.objects.all(), limit=3,
+                                                         sort=['-number']).dump()
+        collection = SimpleDjangoModelCollectionSerializer(SimpleDjangoModel.objects.all(), limit=3, sort=['-number'])
+        self.assertDictEqual(json.loads(''.join(collection.iter_json())), expected)
+        collection = SimpleDjangoModelCollectionSerializer(SimpleDjangoModel.objects.all(), limit=3, sort=['-number'])
+        self.assertListEqual(list(collection.iter_dump()), expected['items'])
+
+    def test_queryset_is_not_evaluated(self):
+        for i in range(20):
+            SimpleDjangoModel.objects.create(name='Name', code='EEEE', number=i)
+        qs = SimpleDjangoModel.objects.all()
+        for offset in (0, 10, 20):
+            collection = SimpleDjangoModelCollectionSerializer(qs, limit=5, offset=offset, sort=['-number'])
+            with CaptureQueriesContext(connection) as context:
+                dump = collection.dump()
+            self.assertEqual(len(dump['items']), 5)
+            self.assertEqual(len(context.captured_queries), 2)
+            self.assertIn('COUNT(', context.captured_queries[0]['sql'])
+            self.assertIn('LIMIT 5', context.captured_queries[1]['sql'])
+            self.assertIsNone(qs._result_cache)
+        with self.assertNumQueries(2):
+            ''.join(SimpleDjangoModelCollectionSerializer(qs, limit=5).iter_json())
+        self.assertIsNone(qs._result_cache)
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class DjangoCountStrategyTests(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            SimpleDjangoModel.objects.create(name='Name', code='CODE', number=i)
+        CachedCountCollectionSerializer._meta.count_strategy.invalidate()
+
+    def tearDown(self):
+        SimpleDjangoModel.objects.all().delete()
+
+    def test_cached(self):
+        with self.assertNumQueries(2):
+            dump = CachedCountCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 5)
+        SimpleDjangoModel.objects.create(name='Name', code='CODE', number=5)
+        with self.assertNumQueries(1):
+            dump = CachedCountCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2, offset=2).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 5)
+        with self.assertNumQueries(2):
+            dump = CachedCountCollectionSerializer(SimpleDjangoModel.objects.filter(number__gte=3)).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 3)
+        CachedCountCollectionSerializer._meta.count_strategy.invalidate()
+        dump = CachedCountCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 6)
+
+    def test_estimated(self):
+        dump = EstimatedCountCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2).dump()
+        self.assertGreaterEqual(dump['_metadata']['totalCount'], 5)
+        dump = EstimatedCountCollectionSerializer(SimpleDjangoModel.objects.filter(number__gte=3)).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 2)
+        dump = EstimatedCountCollectionSerializer(SimpleDjangoModel.objects.none()).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 0)
+
+    def test_estimated_grouped(self):
+        # The statistics count the rows of the table, not the groups or the distinct rows.
+        grouped = SimpleDjangoModel.objects.values('code').annotate(count=Count('id'))
+        self.assertIsNone(get_estimated_count(grouped))
+        self.assertIsNone(get_estimated_count(SimpleDjangoModel.objects.values('code').distinct()))
+        collection = EstimatedCountCollectionSerializer(grouped)
+        self.assertEqual(collection._meta.count_strategy.count(collection, grouped), 1)
+
+    def test_estimated_with_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        dump = EstimatedCountCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 5)
+
+    def test_has_more(self):
+        with CaptureQueriesContext(connection) as context:
+            dump = HasMoreCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2, offset=2).dump()
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('LIMIT 3', context.captured_queries[0]['sql'])
+        self.assertDictEqual(dump['_metadata'], {'offset': 2, 'limit': 2, 'hasMore': True})
+        self.assertEqual(len(dump['items']), 2)
+        dump = HasMoreCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2, offset=3).dump()
+        self.assertDictEqual(dump['_metadata'], {'offset': 3, 'limit': 2, 'hasMore': False})
+
+    @unittest.skipUnless(has_window_count(), SKIPTEST_TEXT_WINDOW)
+    def test_window(self):
+        qs = SimpleDjangoModel.objects.all()
+        with CaptureQueriesContext(connection) as context:
+            dump = WindowCountCollectionSerializer(qs, limit=2, offset=1, sort=['-number']).dump()
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('OVER ()', context.captured_queries[0]['sql'])
+        self.assertDictEqual(dump['_metadata'], {'offset': 1, 'limit': 2, 'totalCount': 5})
+        self.assertListEqual([item['number'] for item in dump['items']], [3, 2])
+        with self.assertNumQueries(1):
+            dump = WindowCountCollectionSerializer(qs.filter(number__gte=3)).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 2)
+        self.assertIsNone(qs._result_cache)
+
+    @unittest.skipUnless(has_window_count(), SKIPTEST_TEXT_WINDOW)
+    def test_window_distinct(self):
+        for simple in SimpleDjangoModel.objects.all():
+            RelatedDjangoModel.objects.create(name='Related', relation=simple)
+            RelatedDjangoModel.objects.create(name='Related', relation=simple)
+        qs = SimpleDjangoModel.objects.filter(relations__name='Related').distinct()
+        # The page and the count of the distinct rows.
+        with self.assertNumQueries(2):
+            dump = WindowCountCollectionSerializer(qs, limit=2).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 5)
+        self.assertEqual(len(dump['items']), 2)
+
+    @unittest.skipUnless(has_window_count(), SKIPTEST_TEXT_WINDOW)
+    def test_window_empty_page(self):
+        with self.assertNumQueries(2):
+            dump = WindowCountCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2, offset=10).dump()
+        self.assertDictEqual(dump['_metadata'], {'offset': 10, 'limit': 2, 'totalCount': 5})
+        self.assertListEqual(dump['items'], [])
+
+    @unittest.skipUnless(has_window_count(), SKIPTEST_TEXT_WINDOW)
+    def test_window_iter_json(self):
+        qs = SimpleDjangoModel.objects.all()
+        with self.assertNumQueries(1):
+            data = json.loads(''.join(WindowCountCollectionSerializer(qs, limit=3).iter_json()))
+        self.assertEqual(data['_metadata']['totalCount'], 5)
+        self.assertEqual(len(data['items']), 3)
+
+    @unittest.skipIf(django is None or has_window_count(), "Window functions are available.")
+    def test_window_unavailable(self):
+        # The page and a COUNT query like ExactCount.
+        with self.assertNumQueries(2):
+            dump = WindowCountCollectionSerializer(SimpleDjangoModel.objects.all(), limit=2).dump()
+        self.assertDictEqual(dump['_metadata'], {'offset': 0, 'limit': 2, 'totalCount': 5})
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class DjangoKeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        for i in range(20):
+            SimpleDjangoModel.objects.create(name='Name{}'.format(i % 4), code='C{}'.format(i), number=i // 3)
+
+    def tearDown(self):
+        SimpleDjangoModel.objects.all().delete()
+
+    def get_codes(self, dump):
+        return [item['code'] for item in dump['items']]
+
+    def walk(self, sort, limit):
+        codes = []
+        pages = []
+        after = None
+        while True:
+            dump = KeysetCollectionSerializer(SimpleDjangoModel.objects.all(), sort=sort, limit=limit,
+                                              after=after).dump()
+            pages.append(dump)
+            codes.extend(self.get_codes(dump))
+            after = dump['_metadata'].get('next', None)
+            if after is None:
+                return codes, pages
+
+    def test_walk_forward(self):
+        for sort in (['number'], ['-number'], ['-number', 'name'], ['name', '-number'], []):
+            expected = SimpleDjangoModelCollectionSerializer(SimpleDjangoModel.objects.all(), sort=sort,
+                                                             limit=20).dump()
+            if not sort:
+                expected = SimpleDjangoModelCollectionSerializer(SimpleDjangoModel.objects.order_by('pk'),
+                                                                 limit=20).dump()
+            codes, pages = self.walk(sort, 3)
+            self.assertListEqual(codes, self.get_codes(expected))
+            self.assertEqual(len(pages), 7)
+            self.assertNotIn('prev', pages[0]['_metadata'])
+            self.assertIn('prev', pages[1]['_metadata'])
+
+    def test_walk_backwards(self):
+        codes, pages = self.walk(['-number', 'name'], 3)
+        before = pages[-1]['_metadata']['prev']
+        backwards = []
+        while before is not None:
+            dump = KeysetCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['-number', 'name'], limit=3,
+                                              before=before).dump()
+            backwards = self.get_codes(dump) + backwards
+            self.assertIn('next', dump['_metadata'])
+            before = dump['_metadata'].get('prev', None)
+        self.assertListEqual(backwards, codes[:18])
+
+    def test_metadata(self):
+        dump = KeysetCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=5).dump()
+        self.assertDictEqual(dump['_metadata'], {'limit': 5, 'totalCount': 20,
+                                                 'next': dump['_metadata']['next']})
+        dump = KeysetHasMoreCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=5).dump()
+        self.assertTrue(dump['_metadata']['hasMore'])
+        self.assertNotIn('totalCount', dump['_metadata'])
+
+    def test_deep_page_query(self):
+        codes, pages = self.walk(['number'], 5)
+        after = pages[2]['_metadata']['next']
+        with CaptureQueriesContext(connection) as context:
+            dump = KeysetCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=5,
+                                              after=after).dump()
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertIn('LIMIT 6', context.captured_queries[0]['sql'])
+        self.assertNotIn('OFFSET', context.captured_queries[0]['sql'])
+        self.assertListEqual(self.get_codes(dump), codes[15:])
+        self.assertNotIn('next', dump['_metadata'])
+
+    def test_request(self):
+        first = SimpleDjangoModelCollectionSerializer(SimpleDjangoModel.objects.all(),
+                                                      request=FakeRequest(sort='number', limit='4', after=''))
+        first = first.dump()
+        self.assertIn('next', first['_metadata'])
+        second = SimpleDjangoModelCollectionSerializer(
+            SimpleDjangoModel.objects.all(),
+            request=FakeRequest(sort='number', limit='4', after=first['_metadata']['next'])).dump()
+        self.assertListEqual(self.get_codes(second), ['C4', 'C5', 'C6', 'C7'])
+        previous = SimpleDjangoModelCollectionSerializer(
+            SimpleDjangoModel.objects.all(),
+            request=FakeRequest(sort='number', limit='4', before=second['_metadata']['prev'])).dump()
+        self.assertListEqual(self.get_codes(previous), self.get_codes(first))
+
+    def test_invalid_cursor(self):
+        for after in ('invalid', encode_cursor(['text', 1]), encode_cursor([1])):
+            dump = KeysetCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=3,
+                                              after=after).dump()
+            self.assertListEqual(self.get_codes(dump), ['C0', 'C1', 'C2'])
+
+    def test_filter_error(self):
+        after = KeysetCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'],
+                                           limit=3).dump()['_metadata']['next']
+        # Only an invalid cursor returns the first page, the other errors are raised.
+        with self.assertRaises(DatabaseError):
+            FailingKeysetCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=3,
+                                              after=after).dump()
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class DjangoKeysetNullTests(TestCase):
+
+    def setUp(self):
+        for name in ('b', None, 'a', None, 'c', 'a', None):
+            FieldArgsDjangoModel.objects.create(name=name)
+
+    def tearDown(self):
+        FieldArgsDjangoModel.objects.all().delete()
+
+    def walk(self, sort, limit):
+        ids = []
+        after = None
+        while True:
+            dump = NullableKeysetCollectionSerializer(FieldArgsDjangoModel.objects.all(), sort=sort, limit=limit,
+                                                      after=after).dump()
+            ids.extend(item['id'] for item in dump['items'])
+            after = dump['_metadata'].get('next', None)
+            if after is None:
+                return ids
+
+    def test_walk_null_values(self):
+        for sort in (['name'], ['-name']):
+            expected = list(FieldArgsDjangoModel.objects.order_by(*(sort + ['pk'])).values_list('pk', flat=True))
+            for limit in (1, 2, 3):
+                self.assertListEqual(self.walk(sort, limit), expected)
+
+    def test_nulls_largest(self):
+        # The rows after every row for both NULL orderings of the databases.
+        rows = list(FieldArgsDjangoModel.objects.values('pk', 'name'))
+        for nulls_largest in (False, True):
+            for descending in (False, True):
+                order_by = ['-name' if descending else 'name', 'pk']
+                if nulls_largest:
+                    key = lambda row: (row['name'] is None, row['name'] or '')
+                else:
+                    key = lambda row: (row['name'] is not None, row['name'] or '')
+                # A stable sort keeps the pk order of the equal names.
+                ordered = sorted(sorted(rows, key=lambda row: row['pk']), key=key, reverse=descending)
+                for i, row in enumerate(ordered):
+                    q = get_keyset_filter(order_by, [row['name'], row['pk']], nulls_largest=nulls_largest)
+                    after = set(FieldArgsDjangoModel.objects.filter(q).values_list('pk', flat=True))
+                    self.assertSetEqual(after, set(item['pk'] for item in ordered[i + 1:]))
+                    q = get_keyset_filter(order_by, [row['name'], row['pk']], backwards=True,
+                                          nulls_largest=nulls_largest)
+                    before = set(FieldArgsDjangoModel.objects.filter(q).values_list('pk', flat=True))
+                    self.assertSetEqual(before, set(item['pk'] for item in ordered[:i]))
@@ -6,6 +6,12 @@ from datetime import datetime
 from decimal import Decimal
 
 from tests.django_tests import django, SKIPTEST_TEXT, TestCase, SKIPTEST_TEXT_VERSION_18
+from aserializer import Serializer, fields
+from aserializer.cache import FragmentCache
+from aserializer.django.collection import DjangoCollectionSerializer
+from aserializer.django.fields import PrimaryKeyRelatedField, PrimaryKeyListField
+from aserializer.django.serializers import (DjangoModelSerializer, NestedDjangoModelSerializer,
+                                            LazyNestedModelSerializer)
 from tests.django_tests.django_app.models import (One2One1DjangoModel,
                                                   One2One2DjangoModel,
                                                   UUIDFieldModel,
@@ -19,6 +25,7 @@ from tests.django_tests.django_base import (TheDjangoModelSerializer,
                                             RelDjangoModelSerializer,
                                             RelReverseDjangoModelSerializer,
                                             M2MOneDjangoModel,
+                                            M2MTwoDjangoModel,
                                             M2MOneDjangoModelSerializer,
                                             M2MTwoDjangoModelSerializer,
                                             One2One2DjangoModelSerializer,
@@ -471,3 +478,253 @@ class FieldArgsTests(TestCase):
         self.assertTrue(serializer.is_valid())
         test_value = {'id': 2, 'name': 'Foo', 'relations': [{'id': 2, 'name': 'Foo'}, {'id': 3}]}
         self.assertDictEqual(serializer.dump(), test_value)
+
+
+class PkRelThreeDjangoModelSerializer(DjangoModelSerializer):
+
+    class Meta:
+        model = RelThreeDjangoModel if django else None
+        pk_relations = True
+
+
+class PkRelOneDjangoModelSerializer(DjangoModelSerializer):
+
+    class Meta:
+        model = RelOneDjangoModel if django else None
+        pk_relations = ['rel_twos']
+        exclude = ['rel_threes']
+
+
+class PkM2MTwoDjangoModelSerializer(DjangoModelSerializer):
+
+    class Meta:
+        model = M2MTwoDjangoModel if django else None
+        pk_relations = True
+
+
+class PkRelThreeCollectionSerializer(DjangoCollectionSerializer):
+
+    class Meta:
+        serializer = PkRelThreeDjangoModelSerializer
+
+
+class PkRelOneCollectionSerializer(DjangoCollectionSerializer):
+
+    class Meta:
+        serializer = PkRelOneDjangoModelSerializer
+
+
+class PkM2MTwoCollectionSerializer(DjangoCollectionSerializer):
+
+    class Meta:
+        serializer = PkM2MTwoDjangoModelSerializer
+
+
+class PkM2MTwoValuesCollectionSerializer(DjangoCollectionSerializer):
+
+    class Meta:
+        serializer = PkM2MTwoDjangoModelSerializer
+        values = True
+
+
+class NestedPkRelThreeSerializer(Serializer):
+    name = fields.StringField()
+    rel_one = fields.SerializerField(PkRelOneDjangoModelSerializer)
+
+
+class NestedPkRelThreeCollectionSerializer(DjangoCollectionSerializer):
+
+    class Meta:
+        serializer = NestedPkRelThreeSerializer
+        optimize_queryset = True
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class PkRelationsTests(TestCase):
+
+    def tearDown(self):
+        RelThreeDjangoModel.objects.all().delete()
+        RelTwoDjangoModel.objects.all().delete()
+        RelOneDjangoModel.objects.all().delete()
+        M2MTwoDjangoModel.objects.all().delete()
+        M2MOneDjangoModel.objects.all().delete()
+
+    def test_fields(self):
+        self.assertIsInstance(PkRelThreeDjangoModelSerializer._base_fields['rel_two'], PrimaryKeyRelatedField)
+        self.assertIsInstance(PkRelOneDjangoModelSerializer._base_fields['rel_twos'], PrimaryKeyListField)
+        self.assertIsInstance(PkM2MTwoDjangoModelSerializer._base_fields['ones'], PrimaryKeyListField)
+        self.assertNotIn('rel_threes', PkRelOneDjangoModelSerializer(None).fields)
+
+    def test_forward_relation(self):
+        one = RelOneDjangoModel.objects.create(name='One')
+        two = RelTwoDjangoModel.objects.create(name='Two', rel_one=one)
+        RelThreeDjangoModel.objects.create(name='Three', rel_two=two)
+        obj = RelThreeDjangoModel.objects.get()
+        with self.assertNumQueries(0):
+            serializer = PkRelThreeDjangoModelSerializer(obj)
+            self.assertTrue(serializer.is_valid())
+            self.assertDictEqual(serializer.dump(), {'id': obj.id, 'name': 'Three', 'rel_two': two.id,
+                                                     'rel_one': None})
+        self.assertDictEqual(serializer.to_dict(), {'id': obj.id, 'name': 'Three', 'rel_two_id': two.id,
+                                                    'rel_one_id': None})
+        serializer = PkRelThreeDjangoModelSerializer({'name': 'Three', 'rel_two': 'invalid'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('rel_two', serializer.errors)
+        serializer = PkRelThreeDjangoModelSerializer({'name': 'Three', 'rel_two': two.id})
+        self.assertTrue(serializer.is_valid())
+
+    def test_reverse_relation(self):
+        one = RelOneDjangoModel.objects.create(name='One')
+        twos = [RelTwoDjangoModel.objects.create(name='Two', rel_one=one) for i in range(3)]
+        with self.assertNumQueries(1):
+            dump = PkRelOneDjangoModelSerializer(one).dump()
+        self.assertListEqual(sorted(dump['rel_twos']), [two.id for two in twos])
+
+    def test_collection(self):
+        ones = [M2MOneDjangoModel.objects.create(name='One{}'.format(i)) for i in range(3)]
+        for i in range(4):
+            two = M2MTwoDjangoModel.objects.create(name='Two{}'.format(i))
+            two.ones.add(*ones[:i])
+        expected = [[one.id for one in ones[:i]] for i in range(4)]
+        with self.assertNumQueries(3):
+            dump = PkM2MTwoCollectionSerializer(M2MTwoDjangoModel.objects.all()).dump()
+        self.assertListEqual([item['ones'] for item in dump['items']], expected)
+        with self.assertNumQueries(3):
+            dump = PkM2MTwoValuesCollectionSerializer(M2MTwoDjangoModel.objects.all(), sort=['-name']).dump()
+        self.assertListEqual([item['ones'] for item in dump['items']], list(reversed(expected)))
+
+    def test_collection_forward_and_reverse(self):
+        one = RelOneDjangoModel.objects.create(name='One')
+        two = RelTwoDjangoModel.objects.create(name='Two', rel_one=one)
+        for i in range(3):
+            RelThreeDjangoModel.objects.create(name='Three', rel_two=two, rel_one=one)
+        with self.assertNumQueries(2):
+            dump = PkRelThreeCollectionSerializer(RelThreeDjangoModel.objects.all()).dump()
+        self.assertEqual(dump['items'][0]['rel_two'], two.id)
+        with self.assertNumQueries(3):
+            dump = PkRelOneCollectionSerializer(RelOneDjangoModel.objects.all()).dump()
+        self.assertListEqual(dump['items'][0]['rel_twos'], [two.id])
+
+    def test_collection_nested_pk_list(self):
+        def create(count):
+            for i in range(count):
+                one = RelOneDjangoModel.objects.create(name='One')
+                twos = [RelTwoDjangoModel.objects.create(name='Two', rel_one=one) for j in range(2)]
+                RelThreeDjangoModel.objects.create(name='Three', rel_two=twos[0], rel_one=one)
+        # The count, the page with the joined rel_one and the primary keys of all rel_one.rel_twos.
+        create(2)
+        with self.assertNumQueries(3):
+            NestedPkRelThreeCollectionSerializer(RelThreeDjangoModel.objects.all()).dump()
+        create(4)
+        with self.assertNumQueries(3):
+            dump = NestedPkRelThreeCollectionSerializer(RelThreeDjangoModel.objects.all()).dump()
+        self.assertEqual(len(dump['items']), 6)
+        self.assertListEqual([len(item['rel_one']['rel_twos']) for item in dump['items']], [2] * 6)
+        self.assertListEqual(sorted(pk for item in dump['items'] for pk in item['rel_one']['rel_twos']),
+                             sorted(RelTwoDjangoModel.objects.values_list('id', flat=True)))
+
+
+class SecondRelThreeDjangoModelSerializer(DjangoModelSerializer):
+
+    class Meta:
+        model = RelThreeDjangoModel if django else None
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class LazyNestedSerializerTests(TestCase):
+
+    def test_lazy_class(self):
+        field = RelDjangoModelSerializer._base_fields['rel_two']
+        self.assertIsInstance(field._serializer_cls, LazyNestedModelSerializer)
+        nested_cls = field.get_serializer_cls()
+        self.assertTrue(issubclass(nested_cls, NestedDjangoModelSerializer))
+        self.assertIs(nested_cls._meta.model, RelTwoDjangoModel)
+        self.assertIs(field.get_serializer_cls(), nested_cls)
+
+    def test_memoized_class(self):
+        first = RelDjangoModelSerializer._base_fields['rel_two'].get_serializer_cls()
+        second = SecondRelThreeDjangoModelSerializer._base_fields['rel_two'].get_serializer_cls()
+        self.assertIs(first, second)
+        self.assertIsNot(first, RelDjangoModelSerializer._base_fields['rel_one'].get_serializer_cls())
+
+    def test_serializer(self):
+        one = RelOneDjangoModel.objects.create(name='One')
+        two = RelTwoDjangoModel.objects.create(name='Two', rel_one=one)
+        three = RelThreeDjangoModel.objects.create(name='Three', rel_two=two)
+        dump = SecondRelThreeDjangoModelSerializer(three).dump()
+        self.assertEqual(dump['rel_two'], {'id': two.id, 'name': 'Two', 'rel_one': {'id': one.id, 'name': 'One'}})
+        self.assertIn('rel_two.rel_one.name', SecondRelThreeDjangoModelSerializer.get_fieldnames())
+
+    def test_cache_key(self):
+        # The nested classes share their name, the key tells their models apart.
+        two_cls = RelDjangoModelSerializer._base_fields['rel_two'].get_serializer_cls()
+        one_cls = RelDjangoModelSerializer._base_fields['rel_one'].get_serializer_cls()
+        self.assertEqual(two_cls.__name__, one_cls.__name__)
+        cache = FragmentCache()
+        self.assertNotEqual(cache.make_key(two_cls, 1), cache.make_key(one_cls, 1))
+        other_two_cls = SecondRelThreeDjangoModelSerializer._base_fields['rel_two'].get_serializer_cls()
+        self.assertEqual(cache.make_key(two_cls, 1), cache.make_key(other_two_cls, 1))
+
+
+class MaxDepthRelOneDjangoModelSerializer(DjangoModelSerializer):
+    class Meta:
+        model = RelOneDjangoModel if django else None
+        max_depth = 1
+
+
+class NoRelationsRelOneDjangoModelSerializer(DjangoModelSerializer):
+    class Meta:
+        model = RelOneDjangoModel if django else None
+        max_depth = 0
+
+
+class OptInRelOneDjangoModelSerializer(DjangoModelSerializer):
+    class Meta:
+        model = RelOneDjangoModel if django else None
+        relations = ['rel_twos', 'rel_twos.rel_threes']
+
+
+class OptOutRelOneDjangoModelSerializer(DjangoModelSerializer):
+    class Meta:
+        model = RelOneDjangoModel if django else None
+        exclude_relations = ['rel_twos', 'rel_threes.rel_two']
+        pk_relations = ['rel_twos']
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class RelationLimitsTests(TestCase):
+
+    def get_paths(self, serializer_cls):
+        return [relation.path for relation in serializer_cls.get_relations()]
+
+    def test_all_relations(self):
+        self.assertListEqual(sorted(self.get_paths(RelReverseDjangoModelSerializer)),
+                             ['rel_threes', 'rel_threes.rel_two', 'rel_twos', 'rel_twos.rel_threes'])
+
+    def test_max_depth(self):
+        self.assertListEqual(sorted(self.get_paths(MaxDepthRelOneDjangoModelSerializer)), ['rel_threes', 'rel_twos'])
+        self.assertListEqual(self.get_paths(NoRelationsRelOneDjangoModelSerializer), [])
+        self.assertNotIn('rel_twos', NoRelationsRelOneDjangoModelSerializer._base_fields)
+
+    def test_max_depth_dump(self):
+        one = RelOneDjangoModel.objects.create(name='One')
+        two = RelTwoDjangoModel.objects.create(name='Two', rel_one=one)
+        RelThreeDjangoModel.objects.create(name='Three', rel_two=two, rel_one=one)
+        dump = MaxDepthRelOneDjangoModelSerializer(one).dump()
+        self.assertListEqual(dump['rel_twos'], [{'id': two.id, 'name': 'Two'}])
+        self.assertNotIn('rel_two', dump['rel_threes'][0])
+
+    def test_opt_in(self):
+        self.assertListEqual(self.get_paths(OptInRelOneDjangoModelSerializer), ['rel_twos', 'rel_twos.rel_threes'])
+        nested_cls = OptInRelOneDjangoModelSerializer._base_fields['rel_twos'].get_serializer_cls()
+        self.assertIsNot(nested_cls, RelReverseDjangoModelSerializer._base_fields['rel_twos'].get_serializer_cls())
+
+    def test_opt_out(self):
+        self.assertListEqual(self.get_paths(OptOutRelOneDjangoModelSerializer), ['rel_threes'])
+        self.assertIsInstance(OptOutRelOneDjangoModelSerializer._base_fields['rel_twos'], PrimaryKeyListField)
+
+    def test_report(self):
+        report = RelReverseDjangoModelSerializer.relations_report()
+        self.assertIn('rel_twos.rel_threes (RelThreeDjangoModel, prefetched, depth 2)', report)
+        self.assertIn('rel_threes.rel_two (RelTwoDjangoModel, joined, depth 2)', report)
+        self.assertTrue(report.endswith('4 relations: 1 joined, 3 prefetched, max depth 2'))
@@ -0,0 +1,510 @@
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+
+from tests.django_tests import django, SKIPTEST_TEXT, TestCase, SKIPTEST_TEXT_WINDOW, has_window_count
+if django is not None:
+    from django.db import connection
+    from django.db.models import Prefetch
+    from django.test.utils import CaptureQueriesContext
+from aserializer import Serializer, fields
+from aserializer.django.collection import DjangoCollectionSerializer
+from aserializer.django.fields import CountField, MaxField, RelatedManagerListSerializerField
+from aserializer.django.serializers import DjangoModelSerializer
+from aserializer.django.counting import WindowCount
+from aserializer.django.optimization import get_query_plan, get_only_fields, get_values_lookups, nest_values
+from tests.django_tests.django_base import (SimpleDjangoModel,
+                                            RelatedDjangoModel,
+                                            RelOneDjangoModel,
+                                            RelTwoDjangoModel,
+                                            RelThreeDjangoModel,
+                                            M2MOneDjangoModel,
+                                            M2MTwoDjangoModel,
+                                            SimpleDjangoSerializer,
+                                            RelatedDjangoSerializer,
+                                            SecondSimpleDjangoSerializer,
+                                            RelDjangoModelSerializer,
+                                            RelReverseDjangoModelSerializer,
+                                            M2MTwoDjangoModelSerializer,)
+
+
+class SimpleCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        optimize_queryset = True
+
+
+class RelatedCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelatedDjangoSerializer
+        optimize_queryset = True
+
+
+class ReverseRelatedCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SecondSimpleDjangoSerializer
+        optimize_queryset = True
+
+
+class ChunkedReverseRelatedCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SecondSimpleDjangoSerializer
+        optimize_queryset = True
+        prefetch_chunk_size = 2
+
+
+class RelThreeCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelDjangoModelSerializer
+        optimize_queryset = True
+
+
+class RelOneCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelReverseDjangoModelSerializer
+        optimize_queryset = True
+
+
+class M2MCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = M2MTwoDjangoModelSerializer
+        optimize_queryset = True
+
+
+class SimpleValuesCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = SimpleDjangoSerializer
+        values = True
+        count_strategy = WindowCount()
+
+
+class RelatedValuesCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelatedDjangoSerializer
+        values = True
+
+
+class RelThreeValuesCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelDjangoModelSerializer
+        values = True
+
+
+class NotOptimizedRelatedCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelatedDjangoSerializer
+        optimize_queryset = False
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class QueryPlanTests(TestCase):
+
+    def test_forward_relation(self):
+        self.assertEqual(get_query_plan(RelatedDjangoSerializer, RelatedDjangoModel), (['relation'], []))
+
+    def test_reverse_relation(self):
+        self.assertEqual(get_query_plan(SecondSimpleDjangoSerializer, SimpleDjangoModel), ([], ['relations']))
+
+    def test_m2m_relation(self):
+        self.assertEqual(get_query_plan(M2MTwoDjangoModelSerializer, M2MTwoDjangoModel), ([], ['ones']))
+
+    def test_nested_relations(self):
+        select, prefetch = get_query_plan(RelDjangoModelSerializer, RelThreeDjangoModel)
+        self.assertEqual(sorted(select), ['rel_one', 'rel_two__rel_one'])
+        self.assertEqual(prefetch, ['rel_one__rel_twos'])
+        select, prefetch = get_query_plan(RelReverseDjangoModelSerializer, RelOneDjangoModel)
+        self.assertEqual(select, [])
+        self.assertEqual(sorted(prefetch), ['rel_threes', 'rel_twos__rel_threes'])
+
+    def test_projection(self):
+        self.assertEqual(get_query_plan(RelatedDjangoSerializer, RelatedDjangoModel, fields=['name']), ([], []))
+        self.assertEqual(get_query_plan(RelatedDjangoSerializer, RelatedDjangoModel, exclude=['relation']),
+                         ([], []))
+        self.assertEqual(get_query_plan(RelDjangoModelSerializer, RelThreeDjangoModel,
+                                        fields=['name', 'rel_two.name']), (['rel_two'], []))
+        self.assertEqual(get_query_plan(RelDjangoModelSerializer, RelThreeDjangoModel, exclude=['rel_two']),
+                         (['rel_one'], ['rel_one__rel_twos']))
+
+    def test_optimize_queryset(self):
+        queryset = RelatedDjangoSerializer.optimize_queryset(RelatedDjangoModel.objects.all())
+        self.assertEqual(queryset.query.select_related, {'relation': {}})
+        queryset = SecondSimpleDjangoSerializer.optimize_queryset(SimpleDjangoModel.objects.all())
+        prefetch, = queryset._prefetch_related_lookups
+        self.assertIsInstance(prefetch, Prefetch)
+        self.assertEqual(prefetch.prefetch_to, 'relations')
+        self.assertEqual(prefetch.queryset.query.deferred_loading, ({'id', 'relation', 'name'}, False))
+        queryset = RelReverseDjangoModelSerializer.optimize_queryset(RelOneDjangoModel.objects.all())
+        lookups = dict((getattr(lookup, 'prefetch_to', lookup), lookup)
+                       for lookup in queryset._prefetch_related_lookups)
+        self.assertEqual(sorted(lookups), ['rel_threes', 'rel_twos', 'rel_twos__rel_threes'])
+        self.assertEqual(lookups['rel_threes'].queryset.query.select_related, {'rel_two': {}})
+
+    def test_optimize_queryset_keeps_prefetch(self):
+        queryset = SimpleDjangoModel.objects.prefetch_related('relations')
+        queryset = SecondSimpleDjangoSerializer.optimize_queryset(queryset)
+        self.assertEqual(list(queryset._prefetch_related_lookups), ['relations'])
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class OptimizedCollectionTests(TestCase):
+
+    def tearDown(self):
+        RelatedDjangoModel.objects.all().delete()
+        SimpleDjangoModel.objects.all().delete()
+        RelThreeDjangoModel.objects.all().delete()
+        RelTwoDjangoModel.objects.all().delete()
+        RelOneDjangoModel.objects.all().delete()
+        M2MTwoDjangoModel.objects.all().delete()
+        M2MOneDjangoModel.objects.all().delete()
+
+    def create_related(self, count):
+        for i in range(count):
+            simple = SimpleDjangoModel.objects.create(name='Simple{}'.format(i), code='CODE', number=i)
+            RelatedDjangoModel.objects.create(name='Related{}'.format(i), relation=simple)
+            RelatedDjangoModel.objects.create(name='Other{}'.format(i), relation=simple)
+
+    def create_rel_three(self, count):
+        for i in range(count):
+            one = RelOneDjangoModel.objects.create(name='One{}'.format(i))
+            two = RelTwoDjangoModel.objects.create(name='Two{}'.format(i), rel_one=one)
+            RelThreeDjangoModel.objects.create(name='Three{}'.format(i), rel_two=two, rel_one=one)
+
+    def create_m2m(self, count):
+        ones = [M2MOneDjangoModel.objects.create(name='One{}'.format(i)) for i in range(3)]
+        for i in range(count):
+            two = M2MTwoDjangoModel.objects.create(name='Two{}'.format(i))
+            two.ones.add(*ones)
+
+    def assertConstantQueries(self, collection_cls, create, num):
+        model = collection_cls._meta.serializer._meta.model
+        create(3)
+        with self.assertNumQueries(num):
+            small = collection_cls(model.objects.all()).dump()
+        create(6)
+        with self.assertNumQueries(num):
+            large = collection_cls(model.objects.all()).dump()
+        self.assertEqual(len(small['items']), 3)
+        self.assertEqual(len(large['items']), 9)
+
+    def test_forward_relation(self):
+        self.create_related(2)
+        with self.assertNumQueries(2):
+            small = RelatedCollectionSerializer(RelatedDjangoModel.objects.all()).dump()
+        self.create_related(3)
+        with self.assertNumQueries(2):
+            large = RelatedCollectionSerializer(RelatedDjangoModel.objects.all()).dump()
+        self.assertEqual(len(small['items']), 4)
+        self.assertEqual(len(large['items']), 10)
+        self.assertDictEqual(large['items'][0], {'name': 'Related0',
+                                                 'relation': {'name': 'Simple0', 'code': 'CODE', 'number': 0}})
+        with self.assertNumQueries(6):
+            NotOptimizedRelatedCollectionSerializer(RelatedDjangoModel.objects.all(), limit=4).dump()
+
+    def test_reverse_relation(self):
+        self.create_related(2)
+        with self.assertNumQueries(3):
+            small = ReverseRelatedCollectionSerializer(SimpleDjangoModel.objects.all()).dump()
+        self.create_related(4)
+        with self.assertNumQueries(3):
+            large = ReverseRelatedCollectionSerializer(SimpleDjangoModel.objects.all()).dump()
+        self.assertEqual(len(small['items']), 2)
+        self.assertEqual(len(large['items']), 6)
+        self.assertListEqual(large['items'][0]['relations'], [{'name': 'Related0'}, {'name': 'Other0'}])
+
+    def test_reverse_relation_iter_json(self):
+        self.create_related(6)
+        with self.assertNumQueries(3):
+            data = json.loads(''.join(ReverseRelatedCollectionSerializer(SimpleDjangoModel.objects.all()).iter_json()))
+        self.assertDictEqual(data, ReverseRelatedCollectionSerializer(SimpleDjangoModel.objects.all()).dump())
+
+    def test_reverse_relation_stream(self):
+        self.create_related(5)
+        collection = ChunkedReverseRelatedCollectionSerializer(SimpleDjangoModel.objects.all())
+        queryset = collection.optimize(SimpleDjangoModel.objects.order_by('pk'))
+        objects = collection.iterate_objects(queryset)
+        # The first chunk of two rows and its relations.
+        with self.assertNumQueries(2):
+            first = next(objects)
+        self.assertIsNone(queryset._result_cache)
+        self.assertEqual([obj.name for obj in first.relations.all()], ['Related0', 'Other0'])
+        # One prefetch query per chunk.
+        with self.assertNumQueries(2):
+            rest = list(objects)
+        self.assertIsNone(queryset._result_cache)
+        self.assertEqual(len(rest), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual([len(obj.relations.all()) for obj in rest], [2, 2, 2, 2])
+        with self.assertNumQueries(5):
+            data = json.loads(''.join(ChunkedReverseRelatedCollectionSerializer(SimpleDjangoModel.objects.all())
+                                      .iter_json()))
+        self.assertDictEqual(data, ReverseRelatedCollectionSerializer(SimpleDjangoModel.objects.all()).dump())
+
+    def test_nested_relations(self):
+        self.assertConstantQueries(RelThreeCollectionSerializer, self.create_rel_three, 3)
+
+    def test_nested_reverse_relations(self):
+        self.assertConstantQueries(RelOneCollectionSerializer, self.create_rel_three, 5)
+
+    def test_m2m_relation(self):
+        self.assertConstantQueries(M2MCollectionSerializer, self.create_m2m, 3)
+
+    def test_projection(self):
+        self.create_related(3)
+        with self.assertNumQueries(2):
+            dump = RelatedCollectionSerializer(RelatedDjangoModel.objects.all(), fields=['name']).dump()
+        self.assertDictEqual(dump['items'][0], {'name': 'Related0'})
+        with self.assertNumQueries(2):
+            RelatedCollectionSerializer(RelatedDjangoModel.objects.all(), exclude=['relation']).dump()
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class ProjectionTests(TestCase):
+
+    def setUp(self):
+        for i in range(4):
+            simple = SimpleDjangoModel.objects.create(name='Simple{}'.format(i), code='C{}'.format(i), number=i)
+            RelatedDjangoModel.objects.create(name='Related{}'.format(i), relation=simple)
+        one = RelOneDjangoModel.objects.create(name='One')
+        two = RelTwoDjangoModel.objects.create(name='Two', rel_one=one)
+        RelThreeDjangoModel.objects.create(name='Three', rel_two=two, rel_one=one)
+        RelThreeDjangoModel.objects.create(name='Four', rel_two=two)
+
+    def tearDown(self):
+        RelatedDjangoModel.objects.all().delete()
+        SimpleDjangoModel.objects.all().delete()
+        RelThreeDjangoModel.objects.all().delete()
+        RelTwoDjangoModel.objects.all().delete()
+        RelOneDjangoModel.objects.all().delete()
+
+    def test_only_fields(self):
+        # The order of the columns follows the serializer fields, which are not ordered on every python version.
+        self.assertEqual(sorted(get_only_fields(SimpleDjangoSerializer, SimpleDjangoModel, fields=['name'])),
+                         ['id', 'name'])
+        self.assertEqual(sorted(get_only_fields(SimpleDjangoSerializer, SimpleDjangoModel, exclude=['name'],
+                                                extra_fields=['name'])), ['code', 'id', 'name', 'number'])
+        self.assertEqual(sorted(get_only_fields(RelatedDjangoSerializer, RelatedDjangoModel,
+                                                fields=['name', 'relation.name'])),
+                         ['id', 'name', 'relation', 'relation__id', 'relation__name'])
+        self.assertIsNone(get_only_fields(SimpleDjangoSerializer, SimpleDjangoModel, extra_fields=['relation__name']))
+
+    def test_values_lookups(self):
+        self.assertIsNone(get_values_lookups(SecondSimpleDjangoSerializer, SimpleDjangoModel))
+        self.assertEqual(sorted(get_values_lookups(RelDjangoModelSerializer, RelThreeDjangoModel,
+                                                   fields=['name', 'rel_two.name', 'rel_one.name'])),
+                         ['id', 'name', 'rel_one', 'rel_one__id', 'rel_one__name', 'rel_two', 'rel_two__id',
+                          'rel_two__name'])
+
+    def test_nest_values(self):
+        self.assertDictEqual(nest_values({'id': 1, 'relation': 2, 'relation__name': 'One', 'relation__id': 2}),
+                             {'id': 1, 'relation': {'name': 'One', 'id': 2}})
+        self.assertDictEqual(nest_values({'id': 1, 'relation': None, 'relation__name': None}),
+                             {'id': 1, 'relation': None})
+
+    def test_collection_only(self):
+        with CaptureQueriesContext(connection) as context:
+            dump = SimpleCollectionSerializer(SimpleDjangoModel.objects.all(), fields=['name'],
+                                              sort=['-number']).dump()
+        self.assertEqual(len(context.captured_queries), 2)
+        sql = context.captured_queries[1]['sql']
+        self.assertIn('"number"', sql)
+        self.assertNotIn('"code"', sql)
+        self.assertListEqual(dump['items'], [{'name': 'Simple3'}, {'name': 'Simple2'}, {'name': 'Simple1'},
+                                             {'name': 'Simple0'}])
+        with CaptureQueriesContext(connection) as context:
+            dump = RelatedCollectionSerializer(RelatedDjangoModel.objects.all(),
+                                               fields=['name', 'relation.name']).dump()
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertNotIn('"code"', context.captured_queries[1]['sql'])
+        self.assertDictEqual(dump['items'][0], {'name': 'Related0', 'relation': {'name': 'Simple0'}})
+
+    def test_prefetch_only(self):
+        with CaptureQueriesContext(connection) as context:
+            dump = RelOneCollectionSerializer(RelOneDjangoModel.objects.all(),
+                                              fields=['name', 'rel_threes.name']).dump()
+        self.assertEqual(len(context.captured_queries), 3)
+        sql = context.captured_queries[2]['sql']
+        self.assertIn('"rel_one_id"', sql)
+        self.assertNotIn('"rel_two_id"', sql)
+        self.assertEqual(dump['items'][0]['name'], 'One')
+        self.assertEqual([item['name'] for item in dump['items'][0]['rel_threes']], ['Three'])
+        with self.assertNumQueries(3):
+            dump = ReverseRelatedCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['name']).dump()
+        self.assertListEqual(dump['items'][1]['relations'], [{'name': 'Related1'}])
+
+    def test_values(self):
+        with CaptureQueriesContext(connection) as context:
+            dump = RelatedValuesCollectionSerializer(RelatedDjangoModel.objects.all(), sort=['-name']).dump()
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertIn('INNER JOIN', context.captured_queries[1]['sql'])
+        expected = RelatedCollectionSerializer(RelatedDjangoModel.objects.all(), sort=['-name']).dump()
+        self.assertDictEqual(dump, expected)
+
+    def test_values_null_relation(self):
+        fields = ['name', 'rel_one.name', 'rel_two.name']
+        with self.assertNumQueries(2):
+            dump = RelThreeValuesCollectionSerializer(RelThreeDjangoModel.objects.all(), fields=fields).dump()
+        self.assertEqual(dump['items'][0]['rel_one']['name'], 'One')
+        self.assertIsNone(dump['items'][1]['rel_one'])
+        self.assertDictEqual(dump, RelThreeCollectionSerializer(RelThreeDjangoModel.objects.all(),
+                                                                fields=fields).dump())
+
+    def test_values_fallback(self):
+        dump = RelThreeValuesCollectionSerializer(RelThreeDjangoModel.objects.all()).dump()
+        self.assertDictEqual(dump, RelThreeCollectionSerializer(RelThreeDjangoModel.objects.all()).dump())
+
+    @unittest.skipUnless(has_window_count(), SKIPTEST_TEXT_WINDOW)
+    def test_values_with_window_count_and_cursor(self):
+        with self.assertNumQueries(1):
+            first = SimpleValuesCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=2,
+                                                     after='').dump()
+        self.assertEqual(first['_metadata']['totalCount'], 4)
+        second = SimpleValuesCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=2,
+                                                  after=first['_metadata']['next']).dump()
+        self.assertListEqual([item['number'] for item in first['items'] + second['items']], [0, 1, 2, 3])
+
+    def test_window_count_on_cursor_page(self):
+        first = SimpleValuesCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=1,
+                                                 after='').dump()
+        # The page and the count of all the rows, not only of the rows after the cursor.
+        with self.assertNumQueries(2):
+            second = SimpleValuesCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=1,
+                                                      after=first['_metadata']['next']).dump()
+        self.assertEqual(second['_metadata']['totalCount'], 4)
+        self.assertListEqual([item['number'] for item in second['items']], [1])
+        third = SimpleValuesCollectionSerializer(SimpleDjangoModel.objects.all(), sort=['number'], limit=1,
+                                                 before=second['_metadata']['prev']).dump()
+        self.assertEqual(third['_metadata']['totalCount'], 4)
+
+
+class AggregateRelOneSerializer(DjangoModelSerializer):
+    two_count = CountField('rel_twos', distinct=True)
+    three_count = CountField('rel_threes', distinct=True)
+    max_three = MaxField('rel_threes__id')
+
+    class Meta:
+        model = RelOneDjangoModel if django else None
+        relations = []
+
+
+class AggregateSimpleSerializer(Serializer):
+    name = fields.StringField()
+    relation_count = CountField('relations', model=SimpleDjangoModel if django else None)
+
+
+class AggregateRelTwoSerializer(Serializer):
+    name = fields.StringField()
+    three_count = CountField('rel_threes')
+
+
+class AggregateNestedSerializer(Serializer):
+    name = fields.StringField()
+    rel_twos = RelatedManagerListSerializerField(AggregateRelTwoSerializer)
+
+
+class AggregateRelOneCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = AggregateRelOneSerializer
+
+
+class AggregateRelOneValuesCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = AggregateRelOneSerializer
+        values = True
+
+
+class AggregateRelOneWindowCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = AggregateRelOneSerializer
+        count_strategy = WindowCount()
+
+
+class AggregateRelOneWindowValuesCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = AggregateRelOneSerializer
+        count_strategy = WindowCount()
+        values = True
+
+
+class AggregateNestedCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = AggregateNestedSerializer
+        optimize_queryset = True
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class AggregateFieldTests(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            one = RelOneDjangoModel.objects.create(name='One{}'.format(i))
+            for j in range(i):
+                two = RelTwoDjangoModel.objects.create(name='Two{}'.format(j), rel_one=one)
+                RelThreeDjangoModel.objects.create(name='Three{}'.format(j), rel_two=two, rel_one=one)
+                RelThreeDjangoModel.objects.create(name='Four{}'.format(j), rel_two=two, rel_one=one)
+
+    def tearDown(self):
+        RelThreeDjangoModel.objects.all().delete()
+        RelTwoDjangoModel.objects.all().delete()
+        RelOneDjangoModel.objects.all().delete()
+        RelatedDjangoModel.objects.all().delete()
+        SimpleDjangoModel.objects.all().delete()
+
+    def get_counts(self, items):
+        return [(item['name'], item['two_count'], item['three_count']) for item in items]
+
+    def test_annotated_collection(self):
+        with CaptureQueriesContext(connection) as context:
+            dump = AggregateRelOneCollectionSerializer(RelOneDjangoModel.objects.all(), sort=['name']).dump()
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertIn('COUNT(DISTINCT', context.captured_queries[1]['sql'])
+        self.assertListEqual(self.get_counts(dump['items']), [('One0', 0, 0), ('One1', 1, 2), ('One2', 2, 4)])
+        self.assertIsNone(dump['items'][0]['max_three'])
+        self.assertEqual(dump['items'][2]['max_three'], RelThreeDjangoModel.objects.order_by('-id')[0].id)
+
+    def test_values_collection(self):
+        with self.assertNumQueries(2):
+            dump = AggregateRelOneValuesCollectionSerializer(RelOneDjangoModel.objects.all(), sort=['name']).dump()
+        self.assertDictEqual(dump, AggregateRelOneCollectionSerializer(RelOneDjangoModel.objects.all(),
+                                                                       sort=['name']).dump())
+
+    @unittest.skipUnless(has_window_count(), SKIPTEST_TEXT_WINDOW)
+    def test_window_count(self):
+        expected = AggregateRelOneCollectionSerializer(RelOneDjangoModel.objects.all(), sort=['name'], limit=2).dump()
+        for collection_cls in (AggregateRelOneWindowCollectionSerializer,
+                               AggregateRelOneWindowValuesCollectionSerializer):
+            # The window count is not grouped with the aggregates.
+            with self.assertNumQueries(1):
+                dump = collection_cls(RelOneDjangoModel.objects.all(), sort=['name'], limit=2).dump()
+            self.assertDictEqual(dump, expected)
+            self.assertEqual(dump['_metadata']['totalCount'], 3)
+
+    def test_projection(self):
+        dump = AggregateRelOneCollectionSerializer(RelOneDjangoModel.objects.all(), sort=['name'],
+                                                   fields=['name', 'two_count']).dump()
+        self.assertEqual((dump['items'][2]['name'], dump['items'][2]['two_count']), ('One2', 2))
+        self.assertNotIn('three_count', dump['items'][2])
+        queryset = AggregateRelOneSerializer.optimize_queryset(RelOneDjangoModel.objects.all(), fields=['name'])
+        self.assertNotIn('COUNT', str(queryset.query))
+
+    def test_instance_fallback(self):
+        one = RelOneDjangoModel.objects.get(name='One2')
+        with self.assertNumQueries(3):
+            dump = AggregateRelOneSerializer(one).dump()
+        self.assertEqual((dump['two_count'], dump['three_count']), (2, 4))
+
+    def test_simple_serializer(self):
+        for i in range(2):
+            simple = SimpleDjangoModel.objects.create(name='Simple{}'.format(i), code='C', number=i)
+            RelatedDjangoModel.objects.create(name='Related{}'.format(i), relation=simple)
+        self.assertEqual(AggregateSimpleSerializer(SimpleDjangoModel.objects.first()).dump()['relation_count'], 1)
+        queryset = AggregateSimpleSerializer.optimize_queryset(SimpleDjangoModel.objects.all())
+        with self.assertNumQueries(1):
+            dump = [AggregateSimpleSerializer(obj).dump() for obj in queryset]
+        self.assertListEqual([item['relation_count'] for item in dump], [1, 1])
+
+    def test_prefetched_annotation(self):
+        with self.assertNumQueries(3):
+            dump = AggregateNestedCollectionSerializer(RelOneDjangoModel.objects.all(), sort=['name']).dump()
+        self.assertListEqual(dump['items'][2]['rel_twos'], [{'name': 'Two0', 'three_count': 2},
+                                                            {'name': 'Two1', 'three_count': 2}])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from tests.django_tests import django, SKIPTEST_TEXT, TestCase
+if django is not None:
+    from django.db.models import Count
+from aserializer.utils.parsers import Parser
+from aserializer.django.parsers import DjangoModelParser
+from aserializer.django.serializers import DjangoModelSerializer
+from tests.django_tests.django_base import SimpleDjangoModel, RelatedDjangoModel, TheDjangoModelSerializer
+
+
+class RelatedNameDjangoModelSerializer(DjangoModelSerializer):
+
+    class Meta:
+        model = RelatedDjangoModel if django else None
+        fields = ['name']
+
+
+class RelatedNameParserDjangoModelSerializer(DjangoModelSerializer):
+
+    class Meta:
+        model = RelatedDjangoModel if django else None
+        fields = ['name']
+        parser = Parser
+
+
+class SimpleNameDjangoModelSerializer(DjangoModelSerializer):
+
+    class Meta:
+        model = SimpleDjangoModel if django else None
+        fields = ['name']
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class DjangoModelParserTests(TestCase):
+
+    def setUp(self):
+        simple = SimpleDjangoModel.objects.create(name='Simple', code='CODE', number=1)
+        RelatedDjangoModel.objects.create(name='Related', relation=simple)
+
+    def tearDown(self):
+        RelatedDjangoModel.objects.all().delete()
+        SimpleDjangoModel.objects.all().delete()
+
+    def test_default_parser(self):
+        self.assertIs(TheDjangoModelSerializer._meta.parser, DjangoModelParser)
+        self.assertIs(RelatedNameParserDjangoModelSerializer._meta.parser, Parser)
+
+    def test_relation_is_not_loaded(self):
+        obj = RelatedDjangoModel.objects.get()
+        with self.assertNumQueries(0):
+            serializer = RelatedNameDjangoModelSerializer(obj, unknown_error=True)
+            serializer.is_valid()
+            self.assertEqual(serializer.dump()['name'], 'Related')
+        obj = RelatedDjangoModel.objects.get()
+        with self.assertNumQueries(1):
+            RelatedNameParserDjangoModelSerializer(obj, unknown_error=True).is_valid()
+
+    def test_deferred_fields(self):
+        obj = SimpleDjangoModel.objects.only('id', 'name').get()
+        with self.assertNumQueries(0):
+            serializer = SimpleNameDjangoModelSerializer(obj, unknown_error=True)
+            self.assertEqual(serializer.dump(), {'id': obj.id, 'name': 'Simple'})
+        parser = DjangoModelParser(fields=['name', 'code'])
+        parser.initial(obj)
+        with self.assertNumQueries(0):
+            self.assertNotIn('code', parser.all_attributes)
+            self.assertIn('name', parser.all_attributes)
+            self.assertTrue(parser.has_attribute('code'))
+
+    def test_attribute_names(self):
+        obj = SimpleDjangoModel.objects.annotate(related_count=Count('relations')).get()
+        parser = DjangoModelParser(fields=['name', 'related_count', 'relations', 'unknown'])
+        parser.initial(obj)
+        self.assertListEqual(parser.attributes_for_serializer, ['name', 'related_count', 'relations'])
+        self.assertListEqual(sorted(parser.all_attributes),
+                             ['code', 'id', 'name', 'number', 'related_count', 'relations'])
+        self.assertEqual(parser.get_value('related_count'), 1)
+        self.assertFalse(parser.has_attribute('unknown'))
+
+    def test_dict_source(self):
+        parser = DjangoModelParser(fields=['name'])
+        parser.initial({'name': 'Name', 'other': 1})
+        self.assertListEqual(parser.attributes_for_serializer, ['name'])
+        self.assertListEqual(sorted(parser.all_attributes), ['name', 'other'])
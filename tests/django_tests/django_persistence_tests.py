@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from contextlib import contextmanager
+
+from tests.django_tests import django, SKIPTEST_TEXT, TestCase
+if django is not None:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+from aserializer.django import persistence
+from aserializer.django.serializers import DjangoModelSerializer
+from tests.django_tests.django_base import (SimpleDjangoModel,
+                                            RelOneDjangoModel,
+                                            RelTwoDjangoModel,
+                                            M2MOneDjangoModel,
+                                            M2MTwoDjangoModel,)
+
+
+class SimpleModelSerializer(DjangoModelSerializer):
+    class Meta:
+        model = SimpleDjangoModel if django else None
+        relations = []
+
+
+class RelTwoModelSerializer(DjangoModelSerializer):
+    class Meta:
+        model = RelTwoDjangoModel if django else None
+        pk_relations = True
+
+
+class M2MTwoModelSerializer(DjangoModelSerializer):
+    class Meta:
+        model = M2MTwoDjangoModel if django else None
+        pk_relations = True
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class SaveManyTests(TestCase):
+
+    def tearDown(self):
+        SimpleDjangoModel.objects.all().delete()
+        RelTwoDjangoModel.objects.all().delete()
+        RelOneDjangoModel.objects.all().delete()
+        M2MTwoDjangoModel.objects.all().delete()
+        M2MOneDjangoModel.objects.all().delete()
+
+    def get_payloads(self, count, prefix='Simple'):
+        return [{'name': '{}{}'.format(prefix, i), 'code': 'C', 'number': i} for i in range(count)]
+
+    @contextmanager
+    def assertNumStatements(self, num):
+        # The savepoints of the batch transactions are not counted.
+        with CaptureQueriesContext(connection) as context:
+            yield
+        statements = [query['sql'] for query in context.captured_queries
+                      if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), num, '\n'.join(statements))
+
+    def test_create(self):
+        # One query for the batch instead of one INSERT per row.
+        with self.assertNumStatements(1):
+            result = SimpleModelSerializer.save_many(self.get_payloads(200))
+        self.assertTrue(result.is_valid())
+        self.assertEqual(len(result.created), 200)
+        self.assertEqual(SimpleDjangoModel.objects.count(), 200)
+        self.assertEqual(SimpleDjangoModel.objects.get(name='Simple7').number, 7)
+
+    def test_batch_size(self):
+        with self.assertNumStatements(4):
+            result = SimpleModelSerializer.save_many(self.get_payloads(200), batch_size=50)
+        self.assertEqual(len(result.objects), 200)
+
+    def test_update(self):
+        SimpleModelSerializer.save_many(self.get_payloads(100))
+        payloads = [{'id': obj.id, 'name': obj.name, 'code': 'D', 'number': obj.number * 10}
+                    for obj in SimpleDjangoModel.objects.all()]
+        payloads.append({'name': 'New', 'code': 'N', 'number': 1})
+        # The lookup of the existing rows, the insert and the update (one per row without CASE WHEN on Django 1.7).
+        updates = 1 if persistence.Case is not None else 100
+        with self.assertNumStatements(2 + updates):
+            result = SimpleModelSerializer.save_many(payloads)
+        self.assertEqual(len(result.updated), 100)
+        self.assertListEqual(result.created, [100])
+        self.assertEqual(SimpleDjangoModel.objects.filter(code='D').count(), 100)
+        self.assertEqual(SimpleDjangoModel.objects.get(name='Simple9').number, 90)
+
+    def test_validation_errors(self):
+        payloads = self.get_payloads(5)
+        payloads[1]['number'] = 'x'
+        del payloads[3]['name']
+        result = SimpleModelSerializer.save_many(payloads)
+        self.assertListEqual(sorted(result.errors), [1, 3])
+        self.assertIn('number', result.errors[1])
+        self.assertIsNone(result.objects[1])
+        self.assertListEqual(result.created, [0, 2, 4])
+        self.assertEqual(SimpleDjangoModel.objects.count(), 3)
+
+    def test_serializer_items(self):
+        serializers = [SimpleModelSerializer(payload) for payload in self.get_payloads(3)]
+        result = SimpleModelSerializer.save_many(serializers)
+        self.assertListEqual([obj.name for obj in result.objects], ['Simple0', 'Simple1', 'Simple2'])
+
+    def test_database_errors(self):
+        payloads = self.get_payloads(4)
+        payloads[1]['id'] = 1000
+        payloads[3]['id'] = 1000
+        result = SimpleModelSerializer.save_many(payloads)
+        # The failed batch is saved item by item, so the error is reported for the failed item only.
+        self.assertListEqual(list(result.errors), [3])
+        self.assertListEqual(result.created, [0, 1, 2])
+        self.assertEqual(SimpleDjangoModel.objects.count(), 3)
+
+    def test_forward_relation(self):
+        one = RelOneDjangoModel.objects.create(name='One')
+        payloads = [{'name': 'Two{}'.format(i), 'rel_one': one.id} for i in range(3)]
+        with self.assertNumStatements(1):
+            result = RelTwoModelSerializer.save_many(payloads)
+        self.assertListEqual(result.created, [0, 1, 2])
+        self.assertEqual(one.rel_twos.count(), 3)
+
+    def test_many_to_many(self):
+        ones = [M2MOneDjangoModel.objects.create(name='One{}'.format(i)) for i in range(3)]
+        payloads = [{'name': 'Two{}'.format(i), 'ones': [one.id for one in ones[:i + 1]]} for i in range(3)]
+        result = M2MTwoModelSerializer.save_many(payloads)
+        self.assertTrue(result.is_valid())
+        self.assertListEqual([two.ones.count() for two in M2MTwoDjangoModel.objects.order_by('name')], [1, 2, 3])
+        update = [{'id': result.objects[2].id, 'name': 'Two2', 'ones': [ones[0].id]}]
+        M2MTwoModelSerializer.save_many(update)
+        self.assertListEqual(list(result.objects[2].ones.values_list('id', flat=True)), [ones[0].id])
+
+    def test_many_to_many_without_returned_pks(self):
+        ones = [M2MOneDjangoModel.objects.create(name='One{}'.format(i)) for i in range(2)]
+        payloads = [{'name': 'Two0', 'ones': [ones[0].id, ones[1].id]}, {'name': 'Two1'}]
+        # sqlite does not return the primary keys of bulk_create before Django 4.0.
+        result = M2MTwoModelSerializer.save_many(payloads)
+        self.assertListEqual(result.created, [0, 1])
+        two = M2MTwoDjangoModel.objects.get(name='Two0')
+        self.assertEqual(result.objects[0].pk, two.pk)
+        self.assertListEqual(sorted(two.ones.values_list('id', flat=True)), [ones[0].id, ones[1].id])
+        self.assertEqual(M2MTwoDjangoModel.objects.get(name='Two1').ones.count(), 0)
+
+    def get_validated(self, count, prefix):
+        serializers = [SimpleModelSerializer(payload) for payload in self.get_payloads(count, prefix=prefix)]
+        self.assertTrue(all(serializer.is_valid() for serializer in serializers))
+        return serializers
+
+    def test_throughput(self):
+        # One INSERT per batch instead of one per row, the timing is measured by benchmarks/django_bulk_save.py.
+        count = 1000
+        serializers = self.get_validated(count, 'Row')
+        with self.assertNumStatements(count):
+            for serializer in serializers:
+                SimpleDjangoModel.objects.create(**serializer.to_dict())
+        serializers = self.get_validated(count, 'Bulk')
+        with self.assertNumStatements(5):
+            result = SimpleModelSerializer.save_many(serializers, batch_size=200)
+        self.assertEqual(len(result.created), count)
+        self.assertEqual(SimpleDjangoModel.objects.count(), 2 * count)
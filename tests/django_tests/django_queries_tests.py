@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import unittest
+
+from tests.django_tests import django, SKIPTEST_TEXT, TestCase
+if django is not None:
+    from django.db import connection
+from aserializer.django import query_budget, QueryBudgetExceeded
+from aserializer.django.collection import DjangoCollectionSerializer
+from aserializer.django.queries import get_debug_cursor_attribute
+from aserializer.utils import tracking
+from tests.django_tests.django_base import (SimpleDjangoModel,
+                                            RelatedDjangoModel,
+                                            RelOneDjangoModel,
+                                            RelTwoDjangoModel,
+                                            RelThreeDjangoModel,
+                                            RelatedDjangoSerializer,
+                                            SecondSimpleDjangoSerializer,
+                                            RelReverseDjangoModelSerializer,)
+
+
+class NotOptimizedRelatedCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelatedDjangoSerializer
+        optimize_queryset = False
+
+
+class OptimizedRelatedCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelatedDjangoSerializer
+        optimize_queryset = True
+
+
+class NotOptimizedRelOneCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelReverseDjangoModelSerializer
+        optimize_queryset = False
+
+
+class debug_cursor_query_budget(query_budget):
+    # The budget of django versions without execute_wrapper.
+
+    def has_execute_wrapper(self, connection):
+        return False
+
+
+@query_budget(max_queries=2)
+def dump_related(collection_cls):
+    return collection_cls(RelatedDjangoModel.objects.all()).dump()
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            simple = SimpleDjangoModel.objects.create(name='Simple{}'.format(i), code='C', number=i)
+            RelatedDjangoModel.objects.create(name='Related{}'.format(i), relation=simple)
+        one = RelOneDjangoModel.objects.create(name='One')
+        for i in range(2):
+            two = RelTwoDjangoModel.objects.create(name='Two{}'.format(i), rel_one=one)
+            RelThreeDjangoModel.objects.create(name='Three{}'.format(i), rel_two=two, rel_one=one)
+
+    def tearDown(self):
+        RelatedDjangoModel.objects.all().delete()
+        SimpleDjangoModel.objects.all().delete()
+        RelThreeDjangoModel.objects.all().delete()
+        RelTwoDjangoModel.objects.all().delete()
+        RelOneDjangoModel.objects.all().delete()
+
+    def test_count_per_field_path(self):
+        with query_budget() as budget:
+            NotOptimizedRelatedCollectionSerializer(RelatedDjangoModel.objects.all()).dump()
+        self.assertEqual(budget.count, 5)
+        self.assertDictEqual(dict(budget.by_path()), {'': 2, 'relation': 3})
+        self.assertIn('relation: 3', budget.report())
+
+    def test_nested_field_path(self):
+        with query_budget() as budget:
+            NotOptimizedRelOneCollectionSerializer(RelOneDjangoModel.objects.all()).dump()
+        by_path = budget.by_path()
+        self.assertEqual(by_path['rel_twos'], 1)
+        self.assertEqual(by_path['rel_twos.rel_threes'], 2)
+
+    def test_serializer_dump(self):
+        simple = SimpleDjangoModel.objects.first()
+        with query_budget(max_queries=1) as budget:
+            SecondSimpleDjangoSerializer(simple).dump()
+        self.assertDictEqual(dict(budget.by_path()), {'relations': 1})
+
+    def test_budget_of_dump(self):
+        # The item serializers of a collection are created by dump(), so the N+1 queries are counted.
+        collection = NotOptimizedRelatedCollectionSerializer(RelatedDjangoModel.objects.all())
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            with query_budget(max_queries=2):
+                collection.dump()
+        self.assertDictEqual(dict(context.exception.budget.by_path()), {'': 2, 'relation': 3})
+        # A serializer reads its relations when it is created.
+        serializer = SecondSimpleDjangoSerializer(SimpleDjangoModel.objects.first())
+        with query_budget() as budget:
+            serializer.dump()
+        self.assertEqual(budget.count, 0)
+
+    def test_budget_exceeded(self):
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            with query_budget(max_queries=2):
+                NotOptimizedRelatedCollectionSerializer(RelatedDjangoModel.objects.all()).dump()
+        self.assertEqual(context.exception.budget.count, 5)
+        self.assertIn('5 queries executed, 2 allowed', str(context.exception))
+        with query_budget(max_queries=2) as budget:
+            OptimizedRelatedCollectionSerializer(RelatedDjangoModel.objects.all()).dump()
+        self.assertEqual(budget.count, 2)
+
+    def test_log_exceeded(self):
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger = logging.getLogger('aserializer.django.queries')
+        logger.addHandler(handler)
+        try:
+            with query_budget(max_queries=2, raise_exception=False):
+                NotOptimizedRelatedCollectionSerializer(RelatedDjangoModel.objects.all()).dump()
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(len(records), 1)
+        self.assertIn('relation: 3', records[0].getMessage())
+
+    def test_decorator(self):
+        self.assertEqual(len(dump_related(OptimizedRelatedCollectionSerializer)['items']), 3)
+        with self.assertRaises(QueryBudgetExceeded):
+            dump_related(NotOptimizedRelatedCollectionSerializer)
+
+    def test_tracking_stopped(self):
+        with query_budget():
+            with query_budget():
+                self.assertEqual(tracking.get_path_stack(), [])
+            self.assertEqual(tracking.get_path_stack(), [])
+        self.assertIsNone(tracking.get_path_stack())
+
+    def test_debug_cursor(self):
+        attribute = get_debug_cursor_attribute(connection)
+        debug_cursor = getattr(connection, attribute)
+        with debug_cursor_query_budget() as budget:
+            NotOptimizedRelatedCollectionSerializer(RelatedDjangoModel.objects.all()).dump()
+        self.assertDictEqual(dict(budget.by_path()), {'': 2, 'relation': 3})
+        self.assertEqual(getattr(connection, attribute), debug_cursor)
+        self.assertNotIn('make_debug_cursor', connection.__dict__)
+
+    def test_debug_cursor_attribute(self):
+        class OldConnection(object):
+            use_debug_cursor = None
+
+        self.assertEqual(get_debug_cursor_attribute(OldConnection()), 'use_debug_cursor')
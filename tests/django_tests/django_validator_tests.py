@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from tests.django_tests import django, SKIPTEST_TEXT, TestCase
+from aserializer import Serializer
+from aserializer.fields import IntegerField, StringField, ListSerializerField
+from aserializer.fields.validators import validation_batch
+from aserializer.django import ModelExistsValidator
+from aserializer.django.collection import DjangoCollectionSerializer
+from aserializer.django.serializers import DjangoModelSerializer
+from tests.django_tests.django_base import SimpleDjangoModel, RelatedDjangoModel
+
+
+class ItemSerializer(Serializer):
+    name = StringField(required=True)
+    simple = IntegerField(required=True, validators=[ModelExistsValidator(SimpleDjangoModel)])
+    other = IntegerField(required=False, validators=[ModelExistsValidator(SimpleDjangoModel, field_name='number')])
+
+
+class PayloadSerializer(Serializer):
+    items = ListSerializerField(ItemSerializer, required=True)
+
+
+class RelatedModelSerializer(DjangoModelSerializer):
+    relation_id = IntegerField(required=True, validators=[ModelExistsValidator(SimpleDjangoModel)])
+
+    class Meta:
+        model = RelatedDjangoModel if django else None
+        exclude = ['relation']
+
+
+class ValidatedRelatedCollectionSerializer(DjangoCollectionSerializer):
+    class Meta:
+        serializer = RelatedModelSerializer
+        validation = True
+
+
+@unittest.skipIf(django is None, SKIPTEST_TEXT)
+class ModelExistsValidatorTests(TestCase):
+
+    def setUp(self):
+        self.simples = [SimpleDjangoModel.objects.create(name='Simple{}'.format(i), code='C', number=i + 100)
+                        for i in range(20)]
+
+    def tearDown(self):
+        RelatedDjangoModel.objects.all().delete()
+        SimpleDjangoModel.objects.all().delete()
+
+    def get_payload(self, missing=None):
+        items = [{'name': 'Item{}'.format(i), 'simple': simple.pk} for i, simple in enumerate(self.simples)]
+        if missing is not None:
+            items[missing]['simple'] = self.simples[-1].pk + 1000
+        return {'items': items}
+
+    def test_single_value(self):
+        serializer = ItemSerializer({'name': 'Item', 'simple': self.simples[0].pk})
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+        serializer = ItemSerializer({'name': 'Item', 'simple': 99999})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('simple', serializer.errors)
+
+    def test_list_payload(self):
+        # One query for all the items instead of one query per item.
+        serializer = PayloadSerializer(self.get_payload())
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+
+    def test_list_payload_errors(self):
+        serializer = PayloadSerializer(self.get_payload(missing=7))
+        with self.assertNumQueries(1):
+            self.assertFalse(serializer.is_valid())
+        errors = serializer.errors['items']
+        self.assertEqual([index for index, item_errors in enumerate(errors) if item_errors], [7])
+        self.assertIn('simple', errors[7])
+
+    def test_query_per_field(self):
+        payload = self.get_payload()
+        for item in payload['items']:
+            item['other'] = item['simple'] and 105
+        payload['items'][3]['other'] = 5
+        serializer = PayloadSerializer(payload)
+        # One query for the primary keys and one for the numbers.
+        with self.assertNumQueries(2):
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(len(serializer.errors['items']), 20)
+        self.assertIn('other', serializer.errors['items'][3])
+
+    def test_string_values(self):
+        payload = self.get_payload()
+        payload['items'][0]['simple'] = str(self.simples[0].pk)
+        payload['items'][1]['simple'] = 'invalid'
+        serializer = PayloadSerializer(payload)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('simple', serializer.errors['items'][1])
+        self.assertEqual(serializer.errors['items'][0], {})
+
+    def test_unhashable_values(self):
+        payload = self.get_payload()
+        payload['items'][2]['simple'] = {'id': self.simples[2].pk}
+        payload['items'][4]['simple'] = [self.simples[4].pk, {'id': 1}]
+        serializer = PayloadSerializer(payload)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual([index for index, item_errors in enumerate(serializer.errors['items']) if item_errors],
+                         [2, 4])
+        self.assertIn('simple', serializer.errors['items'][2])
+
+    def test_queryset(self):
+        validator = ModelExistsValidator(SimpleDjangoModel, queryset=SimpleDjangoModel.objects.filter(number__lt=110))
+        self.assertEqual(validator.check_values([simple.pk for simple in self.simples]),
+                         set(simple.pk for simple in self.simples[:10]))
+
+    def test_validation_batch(self):
+        serializers = [ItemSerializer({'name': 'Item', 'simple': simple.pk}) for simple in self.simples]
+        with self.assertNumQueries(1):
+            with validation_batch(serializers):
+                self.assertTrue(all(serializer.is_valid() for serializer in serializers))
+
+    def test_collection_validation(self):
+        for simple in self.simples:
+            RelatedDjangoModel.objects.create(name='Related', relation=simple)
+        collection = ValidatedRelatedCollectionSerializer(RelatedDjangoModel.objects.all(), limit=100)
+        # The count, the page and one query for the relations of all the items.
+        with self.assertNumQueries(3):
+            data = collection.dump()
+        self.assertEqual(len(data['items']), 20)
+
+    def test_save_many(self):
+        payloads = [{'name': 'Related{}'.format(i), 'relation_id': simple.pk} for i, simple in enumerate(self.simples)]
+        payloads[5]['relation_id'] = 99999
+        # One query for the relations of all the items and the insert in its savepoint.
+        with self.assertNumQueries(4):
+            result = RelatedModelSerializer.save_many(payloads)
+        self.assertEqual(list(result.errors.keys()), [5])
+        self.assertEqual(RelatedDjangoModel.objects.count(), 19)
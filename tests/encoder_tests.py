@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+
+from aserializer import Serializer
+from aserializer.fields import IntegerField, StringField, SerializerField, ListSerializerField
+from aserializer.collection.base import CollectionSerializer
+from aserializer.cache import FragmentCache
+from aserializer.utils.encoders import RawJSON, dumps, iterencode
+
+
+class TagSerializer(Serializer):
+    id = IntegerField(identity=True)
+    name = StringField()
+
+
+class RawHookSerializer(Serializer):
+    id = IntegerField(identity=True)
+    payload = StringField()
+
+    def payload_to_native(self, field):
+        return RawJSON(field.value)
+
+
+class RawCacheArticleSerializer(Serializer):
+    id = IntegerField(identity=True)
+    tag = SerializerField(TagSerializer, cache=FragmentCache(raw=True))
+    tags = ListSerializerField(TagSerializer, required=False, cache=FragmentCache(raw=True))
+    sorted_tags = ListSerializerField(TagSerializer, required=False, sort_by='name', cache=FragmentCache(raw=True))
+
+
+class RawCacheTagCollection(CollectionSerializer):
+
+    class Meta:
+        serializer = TagSerializer
+        cache = FragmentCache(raw=True)
+
+
+class RawJSONTests(unittest.TestCase):
+
+    def test_raw_json(self):
+        raw = RawJSON(b'{"a": 1}')
+        self.assertEqual(raw.encoded, u'{"a": 1}')
+        self.assertEqual(raw.loads(), {'a': 1})
+        self.assertEqual(raw, RawJSON('{"a": 1}'))
+        self.assertNotEqual(raw, '{"a": 1}')
+
+    def test_dumps(self):
+        value = {'a': RawJSON('{"b": [1, 2]}'), 'c': [RawJSON('1'), 'text', RawJSON('null')]}
+        self.assertEqual(json.loads(dumps(value)), {'a': {'b': [1, 2]}, 'c': [1, 'text', None]})
+        self.assertEqual(dumps(RawJSON('[1,2]')), '[1,2]')
+        self.assertEqual(dumps([RawJSON('{"x":1}')]), '[{"x":1}]')
+
+    def test_dumps_indent(self):
+        value = {'a': RawJSON('{"b":1}')}
+        self.assertEqual(json.loads(dumps(value, indent=2)), {'a': {'b': 1}})
+
+    def test_iterencode(self):
+        value = [RawJSON('{"b":1}'), {'c': RawJSON('2')}]
+        self.assertEqual(json.loads(''.join(iterencode(value))), [{'b': 1}, {'c': 2}])
+
+    def test_unknown_type(self):
+        self.assertRaises(TypeError, dumps, {'a': object()})
+
+
+class RawJSONSerializerTests(unittest.TestCase):
+
+    def test_hook(self):
+        serializer = RawHookSerializer(dict(id=1, payload='{"nested": {"x": 1}}'))
+        self.assertEqual(json.loads(serializer.to_json()), {'id': 1, 'payload': {'nested': {'x': 1}}})
+
+    def test_raw_fragment_cache(self):
+        source = dict(id=1, tag=dict(id=2, name='python'),
+                      tags=[dict(id=3, name='c'), dict(id=2, name='python')],
+                      sorted_tags=[dict(id=3, name='c'), dict(id=4, name='b')])
+        expected = {'id': 1, 'tag': {'id': 2, 'name': 'python'},
+                    'tags': [{'id': 3, 'name': 'c'}, {'id': 2, 'name': 'python'}],
+                    'sorted_tags': [{'id': 4, 'name': 'b'}, {'id': 3, 'name': 'c'}]}
+        first = RawCacheArticleSerializer(source)
+        self.assertIsInstance(first.dump()['tag'], RawJSON)
+        self.assertEqual(json.loads(first.to_json()), expected)
+        second = RawCacheArticleSerializer(source)
+        self.assertIsInstance(second.dump()['tags'][0], RawJSON)
+        self.assertEqual(json.loads(second.to_json()), expected)
+
+    def test_collection_with_raw_cache(self):
+        objects = [dict(id=1, name='one'), dict(id=2, name='two')]
+        RawCacheTagCollection(objects).dump()
+        collection = RawCacheTagCollection(objects)
+        self.assertIsInstance(collection.dump()['items'][0], RawJSON)
+        self.assertEqual(json.loads(collection.to_json())['items'], objects)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+try:
+    import mongoengine
+    import mongomock
+except ImportError:
+    mongoengine = None
+    mongomock = None
+
+SKIPTEST_TEXT = "MongoEngine or mongomock is not installed."
+
+
+def connect():
+    if mongoengine.VERSION >= (0, 27, 0):
+        mongoengine.connect('aserializer_tests', mongo_client_class=mongomock.MongoClient)
+    else:
+        mongoengine.connect('aserializer_tests', host='mongomock://localhost')
+
+
+if mongoengine is not None:
+    connect()
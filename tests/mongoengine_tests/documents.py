@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from tests.mongoengine_tests import mongoengine
+
+if mongoengine is not None:
+
+    class SimpleDocument(mongoengine.Document):
+        name = mongoengine.StringField(max_length=24)
+        code = mongoengine.StringField(max_length=4)
+        number = mongoengine.IntField()
+
+    class AddressDocument(mongoengine.EmbeddedDocument):
+        street = mongoengine.StringField(db_field='s')
+        city = mongoengine.StringField(db_field='c')
+
+    class PersonDocument(mongoengine.Document):
+        name = mongoengine.StringField(db_field='n')
+        age = mongoengine.IntField()
+        address = mongoengine.EmbeddedDocumentField(AddressDocument)
+        addresses = mongoengine.ListField(mongoengine.EmbeddedDocumentField(AddressDocument))
+        simple = mongoengine.ReferenceField(SimpleDocument)
+        simples = mongoengine.ListField(mongoengine.ReferenceField(SimpleDocument))
+
+        @property
+        def title(self):
+            return 'Person {}'.format(self.name)
+
+    class TeamDocument(mongoengine.Document):
+        name = mongoengine.StringField()
+        leader = mongoengine.ReferenceField(PersonDocument)
+        members = mongoengine.ListField(mongoengine.ReferenceField(PersonDocument))
+else:
+    SimpleDocument = None
+    AddressDocument = None
+    PersonDocument = None
+    TeamDocument = None
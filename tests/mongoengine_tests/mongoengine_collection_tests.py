@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from collections import Counter
+from contextlib import contextmanager
+
+from aserializer import Serializer
+from aserializer import fields
+from aserializer.mongoengine import MongoEngineCollectionSerializer
+from aserializer.collection.counting import CachedCount
+from aserializer.utils import cursors
+from tests.mongoengine_tests import mongoengine, SKIPTEST_TEXT
+if mongoengine is not None:
+    from mongoengine.queryset import QuerySetNoCache
+    from mongomock.collection import Collection
+from tests.mongoengine_tests.documents import SimpleDocument, PersonDocument, AddressDocument, TeamDocument
+
+
+class SimpleDocumentSerializer(Serializer):
+    name = fields.StringField(required=True, max_length=24)
+    code = fields.StringField(max_length=4)
+    number = fields.IntegerField(required=True)
+
+
+class SimpleDocumentCollectionSerializer(MongoEngineCollectionSerializer):
+
+    class Meta:
+        serializer = SimpleDocumentSerializer
+
+
+class AddressSerializer(Serializer):
+    street = fields.StringField()
+    city = fields.StringField()
+
+
+class PersonSerializer(Serializer):
+    id = fields.StringField()
+    name = fields.StringField(required=True)
+    age = fields.IntegerField()
+    address = fields.SerializerField(AddressSerializer)
+    addresses = fields.ListSerializerField(AddressSerializer)
+
+
+class PersonCollectionSerializer(MongoEngineCollectionSerializer):
+
+    class Meta:
+        serializer = PersonSerializer
+
+
+class RawPersonCollectionSerializer(MongoEngineCollectionSerializer):
+
+    class Meta:
+        serializer = PersonSerializer
+        as_pymongo = True
+
+    def get_item_serializer(self, obj):
+        serializer = super(RawPersonCollectionSerializer, self).get_item_serializer(obj)
+        self.sources = getattr(self, 'sources', []) + [serializer.parser.obj]
+        return serializer
+
+
+class MongoEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        SimpleDocument(name='One', code='DDDD', number=1).save()
+        SimpleDocument(name='One', code='FFFF', number=1).save()
+        SimpleDocument(name='Two', code='CCCC', number=2).save()
+        SimpleDocument(name='Three', code='BBBB', number=3).save()
+        SimpleDocument(name='Four', code='AAAA', number=4).save()
+
+    def tearDown(self):
+        SimpleDocument.objects.delete()
+
+
+@unittest.skipIf(mongoengine is None, SKIPTEST_TEXT)
+class MongoEngineCollectionSerializerTests(MongoEngineTestCase):
+
+    def test_simple(self):
+        dump = SimpleDocumentCollectionSerializer(SimpleDocument.objects.all(), limit=2, offset=1,
+                                                  sort=['-number']).dump()
+        self.assertDictEqual(dump['_metadata'], {'totalCount': 5, 'offset': 1, 'limit': 2})
+        self.assertListEqual(dump['items'], [{'name': 'Three', 'code': 'BBBB', 'number': 3},
+                                             {'name': 'Two', 'code': 'CCCC', 'number': 2}])
+
+
+@unittest.skipIf(mongoengine is None, SKIPTEST_TEXT)
+class MongoEngineCountStrategyTests(MongoEngineTestCase):
+
+    def get_collection_cls(self, strategy):
+        class MyCollection(MongoEngineCollectionSerializer):
+            class Meta:
+                serializer = SimpleDocumentSerializer
+                count_strategy = strategy
+        return MyCollection
+
+    def test_cached(self):
+        collection_cls = self.get_collection_cls(CachedCount(ttl=60))
+        self.assertEqual(collection_cls(SimpleDocument.objects.all()).dump()['_metadata']['totalCount'], 5)
+        SimpleDocument(name='Five', code='EEEE', number=5).save()
+        self.assertEqual(collection_cls(SimpleDocument.objects.all()).dump()['_metadata']['totalCount'], 5)
+        dump = collection_cls(SimpleDocument.objects.filter(number__gte=3)).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 3)
+
+    def test_estimated(self):
+        collection_cls = self.get_collection_cls('estimated')
+        self.assertEqual(collection_cls(SimpleDocument.objects.all()).dump()['_metadata']['totalCount'], 5)
+        dump = collection_cls(SimpleDocument.objects.filter(number__gte=3)).dump()
+        self.assertEqual(dump['_metadata']['totalCount'], 2)
+
+    def test_has_more(self):
+        collection_cls = self.get_collection_cls('has_more')
+        dump = collection_cls(SimpleDocument.objects.all(), limit=2, offset=2, sort=['number']).dump()
+        self.assertDictEqual(dump['_metadata'], {'offset': 2, 'limit': 2, 'hasMore': True})
+        self.assertListEqual([item['number'] for item in dump['items']], [2, 3])
+        dump = collection_cls(SimpleDocument.objects.all(), limit=2, offset=3).dump()
+        self.assertDictEqual(dump['_metadata'], {'offset': 3, 'limit': 2, 'hasMore': False})
+
+
+@unittest.skipIf(mongoengine is None, SKIPTEST_TEXT)
+class MongoEngineProjectionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.simple = SimpleDocument(name='Simple', code='C', number=1).save()
+        for i in range(3):
+            PersonDocument(name='Person{}'.format(i), age=20 + i, simple=self.simple,
+                           address=AddressDocument(street='Street{}'.format(i), city='City'),
+                           addresses=[AddressDocument(street='Other', city='Town')]).save()
+
+    def tearDown(self):
+        PersonDocument.objects.delete()
+        SimpleDocument.objects.delete()
+
+    def test_only(self):
+        collection = PersonCollectionSerializer(PersonDocument.objects.all(), fields=['name', 'address'])
+        objects = collection.optimize(PersonDocument.objects.all())
+        self.assertEqual(sorted(objects._loaded_fields.as_dict().keys()), ['address', 'n'])
+        person = objects.first()
+        self.assertIsNone(person.age)
+        self.assertEqual(person.address.street, 'Street0')
+        dump = collection.dump()
+        self.assertEqual(dump['items'][0]['name'], 'Person0')
+        self.assertNotIn('age', dump['items'][0])
+
+    def test_only_exclude(self):
+        collection = PersonCollectionSerializer(PersonDocument.objects.all(), exclude=['address', 'addresses'])
+        objects = collection.optimize(PersonDocument.objects.all(), sort_fields=['age'])
+        self.assertEqual(sorted(objects._loaded_fields.as_dict().keys()), ['_id', 'age', 'n'])
+
+    def test_only_without_projection(self):
+        objects = PersonCollectionSerializer(PersonDocument.objects.all()).optimize(PersonDocument.objects.all())
+        self.assertFalse(objects._loaded_fields)
+
+    def test_only_property(self):
+        class TitleSerializer(Serializer):
+            name = fields.StringField()
+            title = fields.StringField()
+
+        class TitleCollectionSerializer(MongoEngineCollectionSerializer):
+            class Meta:
+                serializer = TitleSerializer
+                as_pymongo = True
+
+        collection = TitleCollectionSerializer(PersonDocument.objects.all(), fields=['title'], sort=['name'])
+        # The property reads unknown fields of the document.
+        self.assertFalse(collection.optimize(PersonDocument.objects.all())._loaded_fields)
+        self.assertEqual(collection.dump()['items'][0]['title'], 'Person Person0')
+
+    def test_as_pymongo(self):
+        collection = RawPersonCollectionSerializer(PersonDocument.objects.all(), sort=['age'])
+        dump = collection.dump()
+        self.assertTrue(all(isinstance(source, dict) for source in collection.sources))
+        expected = PersonCollectionSerializer(PersonDocument.objects.all(), sort=['age']).dump()
+        self.assertListEqual(dump['items'], expected['items'])
+        self.assertDictEqual(dump['items'][1]['address'], {'street': 'Street1', 'city': 'City'})
+        self.assertListEqual(dump['items'][1]['addresses'], [{'street': 'Other', 'city': 'Town'}])
+        self.assertEqual(dump['_metadata']['totalCount'], 3)
+
+    def test_as_pymongo_only(self):
+        collection = RawPersonCollectionSerializer(PersonDocument.objects.all(), fields=['name'], sort=['-age'])
+        dump = collection.dump()
+        # The sort field is loaded too.
+        self.assertEqual(sorted(collection.sources[0].keys()), ['age', 'id', 'name'])
+        self.assertListEqual([item['name'] for item in dump['items']], ['Person2', 'Person1', 'Person0'])
+
+    def test_as_pymongo_reference(self):
+        class SimpleSerializer(Serializer):
+            name = fields.StringField()
+
+        class ReferenceSerializer(Serializer):
+            name = fields.StringField()
+            simple = fields.SerializerField(SimpleSerializer)
+
+        class ReferenceCollectionSerializer(MongoEngineCollectionSerializer):
+            class Meta:
+                serializer = ReferenceSerializer
+                as_pymongo = True
+
+        # The references are dereferenced by the documents.
+        dump = ReferenceCollectionSerializer(PersonDocument.objects.all()).dump()
+        self.assertDictEqual(dump['items'][0]['simple'], {'name': 'Simple'})
+
+
+@unittest.skipIf(mongoengine is None, SKIPTEST_TEXT)
+class MongoEngineKeysetPaginationTests(MongoEngineTestCase):
+
+    def get_collection_cls(self, **options):
+        meta = type('Meta', (object,), dict(serializer=SimpleDocumentSerializer, keyset_pagination=True, **options))
+
+        class MyCollection(MongoEngineCollectionSerializer):
+            Meta = meta
+
+            def get_cursor(self, objects):
+                objects = super(MyCollection, self).get_cursor(objects)
+                self.cursors = getattr(self, 'cursors', []) + [objects]
+                return objects
+
+        return MyCollection
+
+    def get_pages(self, collection_cls, **kwargs):
+        pages = []
+        after = None
+        while True:
+            collection = collection_cls(SimpleDocument.objects.all(), after=after, **kwargs)
+            dump = collection.dump()
+            pages.append(dump)
+            after = dump['_metadata'].get('next', None)
+            if after is None:
+                return pages
+
+    def test_pages(self):
+        collection_cls = self.get_collection_cls()
+        pages = self.get_pages(collection_cls, limit=2, sort=['-number'])
+        self.assertEqual(len(pages), 3)
+        codes = [item['code'] for page in pages for item in page['items']]
+        # The documents with the same number are ordered by the id.
+        self.assertListEqual(codes, ['AAAA', 'BBBB', 'CCCC', 'DDDD', 'FFFF'])
+        self.assertDictEqual(pages[0]['_metadata'],
+                             {'limit': 2, 'totalCount': 5, 'next': pages[0]['_metadata']['next']})
+        self.assertNotIn('next', pages[2]['_metadata'])
+        self.assertIn('prev', pages[2]['_metadata'])
+
+    def test_prev(self):
+        collection_cls = self.get_collection_cls()
+        pages = self.get_pages(collection_cls, limit=2, sort=['name'])
+        dump = collection_cls(SimpleDocument.objects.all(), before=pages[2]['_metadata']['prev'], limit=2,
+                              sort=['name']).dump()
+        self.assertListEqual(dump['items'], pages[1]['items'])
+        self.assertIn('next', dump['_metadata'])
+        self.assertIn('prev', dump['_metadata'])
+
+    def test_no_skip(self):
+        collection_cls = self.get_collection_cls()
+        after = collection_cls(SimpleDocument.objects.all(), limit=2, sort=['number']).dump()['_metadata']['next']
+        collection = collection_cls(SimpleDocument.objects.all(), limit=2, sort=['number'], after=after)
+        self.assertListEqual([item['number'] for item in collection.dump()['items']], [2, 3])
+        cursor = collection.cursors[0]
+        self.assertIsNone(cursor._skip)
+        self.assertEqual(cursor._limit, 3)
+
+    def test_null_values(self):
+        SimpleDocument(name='Missing', number=5).save()
+        SimpleDocument._get_collection().insert_one({'name': 'Null', 'code': None, 'number': 6})
+        SimpleDocument(name='Other', code='AAAA', number=7).save()
+        collection_cls = self.get_collection_cls()
+        for sort in (['code'], ['-code']):
+            expected = [item['name'] for item in SimpleDocumentCollectionSerializer(
+                SimpleDocument.objects.order_by(*(sort + ['id'])), limit=20).dump()['items']]
+            if (expected[:2] if sort == ['code'] else expected[-2:]) != ['Missing', 'Null']:
+                # MongoDB sorts null and missing values as equal, older mongomock versions do not.
+                self.skipTest('mongomock does not sort null and missing values as equal.')
+            for limit in (1, 2, 3):
+                pages = self.get_pages(collection_cls, limit=limit, sort=sort)
+                self.assertListEqual([item['name'] for page in pages for item in page['items']], expected)
+                dump = collection_cls(SimpleDocument.objects.all(), before=pages[-1]['_metadata']['prev'],
+                                      limit=limit, sort=sort).dump()
+                self.assertListEqual(dump['items'], pages[-2]['items'])
+
+    def test_invalid_cursor(self):
+        collection_cls = self.get_collection_cls()
+        for after in ('invalid', cursors.encode_cursor([1])):
+            dump = collection_cls(SimpleDocument.objects.all(), limit=2, sort=['number'], after=after).dump()
+            self.assertListEqual([item['number'] for item in dump['items']], [1, 1])
+
+    def test_has_more(self):
+        collection_cls = self.get_collection_cls(count_strategy='has_more')
+        dump = collection_cls(SimpleDocument.objects.all(), limit=3, sort=['number']).dump()
+        self.assertTrue(dump['_metadata']['hasMore'])
+        dump = collection_cls(SimpleDocument.objects.all(), limit=3, sort=['number'],
+                              after=dump['_metadata']['next']).dump()
+        self.assertFalse(dump['_metadata']['hasMore'])
+        self.assertListEqual([item['number'] for item in dump['items']], [3, 4])
+
+    def test_as_pymongo(self):
+        pages = self.get_pages(self.get_collection_cls(as_pymongo=True), limit=2, sort=['-number'])
+        expected = self.get_pages(self.get_collection_cls(), limit=2, sort=['-number'])
+        self.assertListEqual([page['items'] for page in pages], [page['items'] for page in expected])
+
+    def test_cursor_options(self):
+        collection = self.get_collection_cls(cursor_batch_size=2)(SimpleDocument.objects.all(), limit=10)
+        items = list(collection.iter_dump())
+        self.assertEqual(len(items), 5)
+        self.assertEqual(collection.cursors[0]._batch_size, 2)
+        cursor = collection.get_cursor(SimpleDocument.objects.all())
+        self.assertIsInstance(cursor, QuerySetNoCache)
+        collection = self.get_collection_cls(no_cache=False)(SimpleDocument.objects.all())
+        self.assertNotIsInstance(collection.get_cursor(SimpleDocument.objects.all()), QuerySetNoCache)
+
+    def test_object_id_cursor(self):
+        document = SimpleDocument.objects.first()
+        self.assertEqual(cursors.decode_cursor(cursors.encode_cursor([document.id])), [document.id])
+        with self.assertRaises(cursors.InvalidCursor):
+            cursors.decode_cursor(cursors.encode_cursor([{'$oid': 'invalid'}]))
+
+
+@contextmanager
+def count_queries():
+    """
+    Counts the find and the aggregate queries per collection name. The finds of the mongomock aggregation are not
+    counted.
+    """
+    counter = Counter()
+    methods = dict((name, getattr(Collection, name)) for name in ('find', 'aggregate'))
+    running = []
+
+    def get_counting(method):
+        def counting(self, *args, **kwargs):
+            if not running:
+                counter[self.name] += 1
+            running.append(self)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                running.pop()
+        return counting
+
+    for name, method in methods.items():
+        setattr(Collection, name, get_counting(method))
+    try:
+        yield counter
+    finally:
+        for name, method in methods.items():
+            setattr(Collection, name, method)
+
+
+class SimpleNameSerializer(Serializer):
+    name = fields.StringField()
+
+
+class PersonReferenceSerializer(Serializer):
+    name = fields.StringField()
+    simple = fields.SerializerField(SimpleNameSerializer)
+    simples = fields.ListSerializerField(SimpleNameSerializer)
+
+
+class TeamSerializer(Serializer):
+    name = fields.StringField()
+    leader = fields.SerializerField(PersonReferenceSerializer)
+    members = fields.ListSerializerField(PersonReferenceSerializer)
+
+
+class PersonReferenceCollectionSerializer(MongoEngineCollectionSerializer):
+
+    class Meta:
+        serializer = PersonReferenceSerializer
+        optimize_queryset = True
+
+
+class TeamCollectionSerializer(MongoEngineCollectionSerializer):
+
+    class Meta:
+        serializer = TeamSerializer
+        optimize_queryset = True
+
+
+@unittest.skipIf(mongoengine is None, SKIPTEST_TEXT)
+class MongoEngineDereferenceTests(unittest.TestCase):
+
+    def setUp(self):
+        simples = [SimpleDocument(name='Simple{}'.format(i), code='C', number=i).save() for i in range(4)]
+        self.persons = []
+        for i in range(6):
+            self.persons.append(PersonDocument(name='Person{}'.format(i), age=i, simple=simples[i % 4],
+                                               simples=[simples[(i + 1) % 4], simples[(i + 2) % 4]]).save())
+        for i in range(3):
+            TeamDocument(name='Team{}'.format(i), leader=self.persons[i],
+                         members=[self.persons[i], self.persons[i + 3]]).save()
+
+    def tearDown(self):
+        TeamDocument.objects.delete()
+        PersonDocument.objects.delete()
+        SimpleDocument.objects.delete()
+
+    def test_references(self):
+        with count_queries() as counter:
+            dump = PersonReferenceCollectionSerializer(PersonDocument.objects.all(), sort=['name']).dump()
+        # The count, the page and one query for the references of all the persons.
+        self.assertDictEqual(dict(counter), {'person_document': 2, 'simple_document': 1})
+        self.assertDictEqual(dump['items'][1], {'name': 'Person1', 'simple': {'name': 'Simple1'},
+                                                'simples': [{'name': 'Simple2'}, {'name': 'Simple3'}]})
+
+    def test_not_optimized(self):
+        class NotOptimizedCollectionSerializer(MongoEngineCollectionSerializer):
+            class Meta:
+                serializer = PersonReferenceSerializer
+                optimize_queryset = False
+
+        expected = PersonReferenceCollectionSerializer(PersonDocument.objects.all(), sort=['name']).dump()
+        with count_queries() as counter:
+            dump = NotOptimizedCollectionSerializer(PersonDocument.objects.all(), sort=['name']).dump()
+        self.assertGreater(counter['simple_document'], 1)
+        self.assertListEqual(dump['items'], expected['items'])
+
+    def test_nested_references(self):
+        with count_queries() as counter:
+            dump = TeamCollectionSerializer(TeamDocument.objects.all(), sort=['name']).dump()
+        self.assertDictEqual(dict(counter), {'team_document': 2, 'person_document': 1, 'simple_document': 1})
+        self.assertEqual(dump['items'][2]['leader']['simple'], {'name': 'Simple2'})
+        self.assertListEqual([member['name'] for member in dump['items'][2]['members']], ['Person2', 'Person5'])
+        self.assertEqual(dump['items'][2]['members'][1]['simples'], [{'name': 'Simple2'}, {'name': 'Simple3'}])
+
+    def test_projection(self):
+        with count_queries() as counter:
+            dump = TeamCollectionSerializer(TeamDocument.objects.all(), fields=['name', 'members.name']).dump()
+        # The references of the members are not serialized.
+        self.assertDictEqual(dict(counter), {'team_document': 2, 'person_document': 1})
+        self.assertDictEqual(dump['items'][0], {'name': 'Team0', 'members': [{'name': 'Person0'},
+                                                                             {'name': 'Person3'}]})
+
+    def test_keyset_and_missing_reference(self):
+        class KeysetCollectionSerializer(MongoEngineCollectionSerializer):
+            class Meta:
+                serializer = TeamSerializer
+                keyset_pagination = True
+                optimize_queryset = True
+                count_strategy = 'has_more'
+
+        self.persons[3].delete()
+        with count_queries() as counter:
+            dump = KeysetCollectionSerializer(TeamDocument.objects.all(), limit=2, sort=['name']).dump()
+        self.assertEqual(counter['person_document'], 1)
+        self.assertTrue(dump['_metadata']['hasMore'])
+        # A missing reference stays unresolved as by the dereferencing of mongoengine.
+        self.assertEqual(dump['items'][0]['members'][0]['name'], 'Person0')
+        self.assertEqual(len(dump['items'][0]['members']), 2)
+
+
+@unittest.skipIf(mongoengine is None, SKIPTEST_TEXT)
+class MongoEngineFacetPaginationTests(MongoEngineTestCase):
+
+    def get_collection_cls(self, **options):
+        meta = type('Meta', (object,), dict(serializer=SimpleDocumentSerializer, facet_pagination=True, **options))
+        return type('FacetCollection', (MongoEngineCollectionSerializer,), {'Meta': meta})
+
+    def test_single_roundtrip(self):
+        collection_cls = self.get_collection_cls()
+        with count_queries() as counter:
+            dump = collection_cls(SimpleDocument.objects.all(), limit=2, offset=1, sort=['-number']).dump()
+        self.assertDictEqual(dict(counter), {'simple_document': 1})
+        expected = SimpleDocumentCollectionSerializer(SimpleDocument.objects.all(), limit=2, offset=1,
+                                                      sort=['-number']).dump()
+        self.assertDictEqual(dump, expected)
+
+    def test_pipeline(self):
+        collection = self.get_collection_cls()(SimpleDocument.objects.filter(number__gte=2), limit=2, offset=1,
+                                               sort=['-number'], fields=['name'])
+        pipeline = collection.get_facet_pipeline(collection.objects)
+        self.assertEqual(pipeline[0], {'$match': {'number': {'$gte': 2}}})
+        self.assertEqual(list(pipeline[1]['$sort'].items()), [('number', -1), ('_id', 1)])
+        self.assertEqual(pipeline[2], {'$facet': {'items': [{'$skip': 1}, {'$limit': 2}, {'$project': {'name': 1}}],
+                                                  'total': [{'$count': 'count'}]}})
+        dump = collection.dump()
+        self.assertDictEqual(dump['_metadata'], {'totalCount': 3, 'offset': 1, 'limit': 2})
+        self.assertListEqual(dump['items'], [{'name': 'Three'}, {'name': 'Two'}])
+
+    def test_string_offset_limit(self):
+        collection = self.get_collection_cls()(SimpleDocument.objects.all(), limit='2', offset='1', sort=['number'])
+        pipeline = collection.get_facet_pipeline(collection.objects)
+        self.assertEqual(pipeline[1]['$facet']['items'], [{'$skip': 1}, {'$limit': 2}])
+        self.assertListEqual([item['number'] for item in collection.dump()['items']], [1, 2])
+        collection = self.get_collection_cls()(SimpleDocument.objects.all(), limit='all')
+        self.assertEqual(collection.get_facet_pipeline(collection.objects)[0]['$facet']['items'], [{'$limit': 10}])
+
+    def test_empty(self):
+        dump = self.get_collection_cls()(SimpleDocument.objects.filter(number__gte=10)).dump()
+        self.assertDictEqual(dump['_metadata'], {'totalCount': 0, 'offset': 0, 'limit': 10})
+        self.assertListEqual(dump['items'], [])
+
+    def test_as_pymongo(self):
+        collection_cls = self.get_collection_cls(as_pymongo=True)
+        dump = collection_cls(SimpleDocument.objects.all(), sort=['name']).dump()
+        self.assertListEqual([item['name'] for item in dump['items']], ['Four', 'One', 'One', 'Three', 'Two'])
+        self.assertEqual(dump['_metadata']['totalCount'], 5)
+
+    def test_iter_json(self):
+        collection = self.get_collection_cls()(SimpleDocument.objects.all(), limit=1, sort=['code'])
+        data = json.loads(''.join(collection.iter_json()))
+        self.assertDictEqual(data['_metadata'], {'totalCount': 5, 'offset': 0, 'limit': 1})
+        self.assertEqual(data['items'][0]['code'], 'AAAA')
+
+    def test_other_strategies(self):
+        collection = self.get_collection_cls(count_strategy='has_more')(SimpleDocument.objects.all(), limit=2)
+        self.assertFalse(collection.use_facet())
+        self.assertTrue(collection.dump()['_metadata']['hasMore'])
+        collection = self.get_collection_cls()(SimpleDocument.objects.all(), after='cursor')
+        self.assertFalse(collection.use_facet())
+
+    def test_references(self):
+        PersonDocument(name='Person', simple=SimpleDocument.objects.first()).save()
+        meta = type('Meta', (object,), dict(serializer=PersonReferenceSerializer, facet_pagination=True))
+        collection_cls = type('FacetCollection', (MongoEngineCollectionSerializer,), {'Meta': meta})
+        try:
+            with count_queries() as counter:
+                dump = collection_cls(PersonDocument.objects.all()).dump()
+        finally:
+            PersonDocument.objects.delete()
+        # The aggregation of the page and the count and one query for the references.
+        self.assertDictEqual(dict(counter), {'person_document': 1, 'simple_document': 1})
+        self.assertDictEqual(dump['items'][0]['simple'], {'name': 'One'})
@@ -21,6 +21,7 @@ from aserializer.fields import (IntegerField,
                                 SerializerField,
                                 ListSerializerField,
                                 DecimalField,)
+from aserializer.fields import validators
 from aserializer.utils.registry import SerializerNotRegistered
 from aserializer import Serializer, SerializerFieldValueError
 
@@ -794,7 +795,9 @@ class SerializerWithListTestCase(unittest.TestCase):
         serializer = ASerializer(source=test_obj)
         self.assertFalse(serializer.is_valid())
         self.assertIn('objects', serializer.errors)
-        self.assertEqual(len(serializer.errors['objects']), 1)
+        self.assertEqual(len(serializer.errors['objects']), 2)
+        self.assertIn('code', serializer.errors['objects'][0])
+        self.assertEqual(serializer.errors['objects'][1], {})
 
         # invalid uuid
         test_obj = TestObject()
@@ -805,7 +808,9 @@ class SerializerWithListTestCase(unittest.TestCase):
         self.assertEqual(len(serializer.errors), 1)
         self.assertFalse(serializer.is_valid())
         self.assertIn('objects', serializer.errors)
-        self.assertEqual(len(serializer.errors['objects']), 1)
+        self.assertEqual(len(serializer.errors['objects']), 2)
+        self.assertEqual(serializer.errors['objects'][0], {})
+        self.assertIn('code', serializer.errors['objects'][1])
 
 
 class UnknownFieldError(unittest.TestCase):
@@ -1006,5 +1011,78 @@ class MetaOptionsSerializerTests(unittest.TestCase):
         self.assertDictEqual(serializer.to_dict(), to_dict)
 
 
+class SetValidator(validators.BatchValidator):
+
+    def __init__(self, valid_values):
+        self.valid_values = valid_values
+        self.calls = []
+
+    def check_values(self, values):
+        self.calls.append(sorted(values))
+        return set(values) & self.valid_values
+
+
+class BatchValidatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.validator = SetValidator({1, 2, 3, 4})
+
+        class ItemSerializer(Serializer):
+            number = IntegerField(required=True, validators=[self.validator])
+
+        class ListSerializer(Serializer):
+            items = ListSerializerField(ItemSerializer, required=True)
+
+        self.item_serializer_cls = ItemSerializer
+        self.list_serializer_cls = ListSerializer
+
+    def test_single_check(self):
+        serializer = self.item_serializer_cls({'number': 5})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('number', serializer.errors)
+        self.assertEqual(self.validator.calls, [[5]])
+
+    def test_list_check(self):
+        serializer = self.list_serializer_cls({'items': [{'number': i} for i in (1, 2, 3, 4, 2)]})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(self.validator.calls, [[1, 2, 3, 4]])
+
+    def test_list_errors(self):
+        serializer = self.list_serializer_cls({'items': [{'number': i} for i in (1, 6, 3, 7)]})
+        self.assertFalse(serializer.is_valid())
+        # One entry per item, the errors are at the index of the failed items.
+        self.assertEqual([bool(errors) for errors in serializer.errors['items']], [False, True, False, True])
+        self.assertIn('number', serializer.errors['items'][3])
+        self.assertEqual(len(self.validator.calls), 1)
+
+    def test_unhashable_value(self):
+        batch = validators.ValidationBatch()
+        batch.add(self.validator, {'id': 1})
+        batch.add(self.validator, 2)
+        batch.check()
+        self.assertEqual(self.validator.calls, [[2]])
+        self.assertFalse(batch.is_checked(self.validator, {'id': 1}))
+
+    def test_validation_batch(self):
+        serializers = [self.item_serializer_cls({'number': i}) for i in range(5)]
+        with validators.validation_batch(serializers):
+            self.assertEqual([serializer.is_valid() for serializer in serializers], [False, True, True, True, True])
+        self.assertEqual(self.validator.calls, [[0, 1, 2, 3, 4]])
+
+    def test_validation_batch_error(self):
+        def check_values(values):
+            raise RuntimeError('The check failed.')
+
+        serializers = [self.item_serializer_cls({'number': i}) for i in range(5)]
+        self.validator.check_values = check_values
+        with self.assertRaises(RuntimeError):
+            with validators.validation_batch(serializers):
+                pass
+        self.assertIsNone(validators.get_validation_batch())
+        del self.validator.check_values
+        self.assertTrue(serializers[1].is_valid())
+        self.assertEqual(self.validator.calls, [[1]])
+
+
 if __name__ == '__main__':
     unittest.main()